@@ -4,17 +4,19 @@ EatWise AI - Interim Version
 
 import streamlit as st
 from datetime import datetime
-from PIL import Image
-import io
-import re
 import sys
+import threading
 from pathlib import Path
 
 # Add src directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
-from nutrition_analyzer import NutritionAnalyzer
-from config import APP_NAME, OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_DEPLOYMENT, AZURE_OPENAI_API_VERSION
+from nutrition_analyzer import NutritionAnalyzer, get_shared_analyzer
+from rate_limiter import GatewayBusyError
+from image_preprocessing import PreparedImage, prepare_image
+from meal_analysis import MAX_RATING, AnalysisStream, MealAnalysis
+from health_score import MealScorer, get_nutrition_targets
+from config import ANALYSIS_BUDGET_SECONDS, APP_NAME, OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_DEPLOYMENT, AZURE_OPENAI_API_VERSION, LOCAL_SCORING, SINGLE_CALL_ANALYSIS
 
 # ===========================
 # API Configuration (Override with Streamlit secrets if available)
@@ -63,6 +65,27 @@ print(f"DEBUG APP: Endpoint: {endpoint}", file=sys.stderr)
 print(f"DEBUG APP: API Version: {api_version}", file=sys.stderr)
 print(f"DEBUG APP: Deployment: {deployment}", file=sys.stderr)
 
+# ===========================
+# Shared Analyzer (one per server process)
+# ===========================
+
+@st.cache_resource(show_spinner=False)
+def get_analyzer(api_key: str, endpoint: str, deployment: str, api_version: str) -> NutritionAnalyzer:
+    """Create the process-wide analyzer once and warm its connection pool"""
+    analyzer = get_shared_analyzer(api_key, endpoint, deployment, api_version)
+    threading.Thread(target=analyzer.warm_up, daemon=True).start()
+    return analyzer
+
+
+# Built on the first script run, so the pool is warm before the first click
+analyzer = get_analyzer(api_key, endpoint, deployment, api_version)
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def prepare_uploaded_image(image_data: bytes) -> PreparedImage:
+    """Decode, orient and downsample an uploaded photo once per distinct file"""
+    return prepare_image(image_data)
+
 # ===========================
 # Page Configuration
 # ===========================
@@ -148,187 +171,101 @@ def init_session_state():
     
     if "analysis_method" not in st.session_state:
         st.session_state.analysis_method = "text"
+    
+    if "analysis_mode" not in st.session_state:
+        if LOCAL_SCORING:
+            st.session_state.analysis_mode = "instant"
+        elif SINGLE_CALL_ANALYSIS:
+            st.session_state.analysis_mode = "fast"
+        else:
+            st.session_state.analysis_mode = "detailed"
 
 init_session_state()
 
 # ===========================
-# Nutrition Targets Helper
+# Analysis Modes
 # ===========================
 
-def get_nutrition_targets(profile: dict) -> dict:
-    """Calculate personalized nutrition targets based on profile (gender + health goal)"""
-    health_goal = profile.get("health_goal", "General wellness")
-    gender = profile.get("gender", "Not selected")
-    
-    # Base targets by health goal
-    base_targets = {
-        "General wellness": {"calories": 2000, "protein": 50, "carbs": 225, "fat": 65, "fiber": 25, "sodium": 2300},
-        "Weight loss": {"calories": 1500, "protein": 120, "carbs": 150, "fat": 50, "fiber": 30, "sodium": 2000},
-        "Muscle gain": {"calories": 2500, "protein": 150, "carbs": 300, "fat": 85, "fiber": 25, "sodium": 2300},
-        "Energy boost": {"calories": 2200, "protein": 70, "carbs": 275, "fat": 70, "fiber": 28, "sodium": 2300},
-        "Heart health": {"calories": 1800, "protein": 60, "carbs": 200, "fat": 50, "fiber": 35, "sodium": 1500},
-    }
-    
-    targets = base_targets.get(health_goal, base_targets["General wellness"])
-    
-    # Adjust for gender (standard nutritional guidelines)
-    if gender == "Female":
-        # Women typically need 10-15% fewer calories
-        targets["calories"] = int(targets["calories"] * 0.85)
-        # Protein adjusted proportionally (0.8g per lb bodyweight for women)
-        targets["protein"] = int(targets["protein"] * 0.85)
-    elif gender == "Male":
-        # Men typically need 10-15% more calories
-        targets["calories"] = int(targets["calories"] * 1.1)
-        # Protein adjusted proportionally
-        targets["protein"] = int(targets["protein"] * 1.1)
-    
-    return targets
+# Analyzer options of each sidebar analysis mode
+ANALYSIS_MODES = {
+    "detailed": {"single_call": False, "local_scoring": False},
+    "fast": {"single_call": True, "local_scoring": False},
+    "instant": {"single_call": False, "local_scoring": True},
+}
+ANALYSIS_MODE_LABELS = {"detailed": "🧠 Detailed", "fast": "⚡ Fast", "instant": "🚀 Instant"}
 
 # ===========================
 # Analysis Display Helper with Advanced Styling
 # ===========================
 
-def extract_nutrition_numbers(text: str) -> dict:
-    """Extract nutrition information from the analysis text"""
-    nutrition = {}
-    
-    # More flexible pattern matching for nutrition data (including decimals)
-    patterns = {
-        'calories': [
-            r'\*\*calories?\*\*:?\s*(\d+(?:\.\d+)?)',
-            r'calories?:?\s*(\d+(?:\.\d+)?)\s*(?:cal|kcal)',
-            r'(?:approximately?|about)?\s*(\d+(?:\.\d+)?)\s*(?:calories?|kcal|cal)',
-        ],
-        'protein': [
-            r'\*\*protein\*\*:?\s*(\d+(?:\.\d+)?)\s*g',
-            r'protein:?\s*(\d+(?:\.\d+)?)\s*g',
-        ],
-        'carbs': [
-            r'\*\*carbs?(?:ohydrate)?s?\*\*:?\s*(\d+(?:\.\d+)?)\s*g',
-            r'carbs?(?:ohydrate)?s?:?\s*(\d+(?:\.\d+)?)\s*g',
-        ],
-        'fat': [
-            r'\*\*fat\*\*:?\s*(\d+(?:\.\d+)?)\s*g',
-            r'fat:?\s*(\d+(?:\.\d+)?)\s*g',
-        ],
-        'fiber': [
-            r'\*\*fiber\*\*:?\s*(\d+(?:\.\d+)?)\s*g',
-            r'fiber:?\s*(\d+(?:\.\d+)?)\s*g',
-        ],
-        'sodium': [
-            r'\*\*sodium\*\*:?\s*(\d+(?:\.\d+)?)\s*mg',
-            r'sodium:?\s*(\d+(?:\.\d+)?)\s*mg',
-        ],
-        'sugar': [
-            r'\*\*sugar\*\*:?\s*(\d+(?:\.\d+)?)\s*g',
-            r'sugar:?\s*(\d+(?:\.\d+)?)\s*g',
-        ]
+def display_nutrition_cards(nutrition_data: dict):
+    """Display nutrition values as a grid of cards"""
+    nutrition_icons = {
+        'calories': '🔥',
+        'protein': '💪',
+        'carbs': '🌾',
+        'fat': '🥑',
+        'fiber': '🥗',
+        'sodium': '🧂',
+        'sugar': '🍬'
     }
     
-    text_lower = text.lower()
-    
-    for key, pattern_list in patterns.items():
-        for pattern in pattern_list:
-            match = re.search(pattern, text_lower, re.IGNORECASE)
-            if match:
-                value = match.group(1).strip()
-                
-                # Add unit
-                if key == 'calories':
-                    nutrition[key] = f"{value} cal"
-                elif key == 'sodium':
-                    nutrition[key] = f"{value} mg"
-                else:
-                    nutrition[key] = f"{value} g"
-                break  # Found match for this nutrient, move to next
-    
-    return nutrition
-
-def extract_rating(text: str) -> tuple:
-    """Extract health rating score and max score"""
-    # Look for patterns like "Health Rating: 7/10", "7/10", "7 out of 10"
-    patterns = [
-        r'\*\*health\s+rating\*\*:?\s*(\d+)\s*(?:/|out\s*of)\s*(\d+)',
-        r'health\s+rating\s*:\s*(\d+)\s*(?:/|out\s*of)\s*(\d+)',
-        r'rating\s*:\s*(\d+)\s*(?:/|out\s*of)\s*(\d+)',
-        r'(\d+)\s*(?:/|out\s*of)\s*(\d+)\s*(?:for\s+health|health\s+rating)',
-        r'(?:health\s+)?(?:rating[:\s]+)?(\d+)\s*(?:/|out\s*of)\s*(\d+)',
-    ]
-    
-    text_lower = text.lower()
-    for pattern in patterns:
-        match = re.search(pattern, text_lower)
-        if match:
-            try:
-                score = int(match.group(1))
-                max_score = int(match.group(2))
-                if 0 < score <= max_score:  # Score must be positive
-                    return score, max_score
-            except (ValueError, IndexError):
-                continue
+    # Create a responsive grid layout (3 columns)
+    nutrition_items = list(nutrition_data.items())
+    cols_per_row = 3
     
-    return None, None
+    for row_idx in range(0, len(nutrition_items), cols_per_row):
+        cols = st.columns(cols_per_row, gap="small")
+        row_items = nutrition_items[row_idx:row_idx + cols_per_row]
+        
+        for col_idx, (key, value) in enumerate(row_items):
+            icon = nutrition_icons.get(key, '📌')
+            with cols[col_idx]:
+                st.markdown(
+                    f'''<div class="nutrition-card">
+                        <div style="font-size: 1.3em; margin-bottom: 0.5em;">{icon} {key.capitalize()}</div>
+                        <div class="nutrition-card-value">{value}</div>
+                    </div>''',
+                    unsafe_allow_html=True
+                )
 
-def generate_quick_tips(nutrition_data: dict, profile: dict) -> list:
-    """Generate contextual quick tips based on detected nutrients vs targets"""
-    tips = []
-    
-    # Get targets for the user's health goal
-    targets = get_nutrition_targets(profile)
-    
-    # Extract numeric values from nutrition data
-    def get_numeric_value(value_str):
-        """Extract numeric value from strings like '450 cal' or '25 g'"""
-        if not value_str:
-            return 0
-        import re
-        match = re.search(r'(\d+)', str(value_str))
-        return int(match.group(1)) if match else 0
-    
-    # Check protein intake
-    protein_val = get_numeric_value(nutrition_data.get('protein', '0'))
-    protein_target = targets.get('protein', 50)
-    if protein_val >= protein_target * 0.9:
-        tips.append("💪 Excellent protein intake!")
-    elif protein_val < protein_target * 0.3:
-        tips.append("💪 Consider adding more protein-rich foods")
-    
-    # Check fiber intake
-    fiber_val = get_numeric_value(nutrition_data.get('fiber', '0'))
-    fiber_target = targets.get('fiber', 25)
-    if fiber_val >= fiber_target * 0.8:
-        tips.append("🥗 Great fiber content!")
-    elif fiber_val < fiber_target * 0.3:
-        tips.append("🥗 Add more fiber with whole grains and vegetables")
-    
-    # Check sodium intake
-    sodium_val = get_numeric_value(nutrition_data.get('sodium', '0'))
-    sodium_target = targets.get('sodium', 2300)
-    if sodium_val > sodium_target * 0.8:
-        tips.append("🧂 Watch the sodium intake in this meal")
-    
-    # Check calorie balance
-    calories_val = get_numeric_value(nutrition_data.get('calories', '0'))
-    calories_target = targets.get('calories', 2000)
-    if calories_val > calories_target * 1.2:
-        tips.append("🔥 This meal is calorie-dense for the daily target")
-    elif calories_val < calories_target * 0.3 and calories_val > 50:
-        tips.append("🔥 Light meal - consider pairing with other foods")
-    
-    # Check carbs
-    carbs_val = get_numeric_value(nutrition_data.get('carbs', '0'))
-    protein_ratio = (protein_val / (carbs_val + 1)) * 100
-    if protein_ratio > 50:
-        tips.append("⚡ High protein-to-carb ratio - good balance")
-    
-    # Add a positive note if everything looks good
-    if not tips:
-        tips.append("✅ Balanced meal composition")
+def nutrition_card_values(nutrition: dict) -> dict:
+    """Format nutrition totals as card values ("450 cal", "25.0 g")"""
+    values = {}
+    for key, value in nutrition.items():
+        if key == 'calories':
+            values[key] = f"{int(value)} cal"
+        elif key == 'sodium':
+            values[key] = f"{int(value)} mg"
+        else:
+            values[key] = f"{value} g"
+    return values
+
+def stream_meal_analysis(stream: AnalysisStream) -> MealAnalysis:
+    """Show the locally computed Nutrition Facts first, then the analysis as it streams in"""
+    live = st.empty()
+    with live.container():
+        st.markdown('<div class="section-header">📊 Nutrition Breakdown</div>', unsafe_allow_html=True)
+        display_nutrition_cards(nutrition_card_values(stream.nutrition))
+        st.write_stream(stream)
     
-    return tips[:3]  # Return top 3 tips
+    # Replace the live view with the full structured layout
+    live.empty()
+    return stream.result
 
-def display_meal_analysis(analysis_text: str):
+def add_to_history(analysis: MealAnalysis, food: str):
+    """Keep the analysis object in the session history (last 5)"""
+    history_entry = {
+        "timestamp": datetime.now().strftime("%H:%M:%S"),
+        "food": food[:100],
+        "rating": f"{analysis.rating}/{MAX_RATING}" if analysis.rating else "N/A",
+        "analysis": analysis
+    }
+    st.session_state.analysis_history.insert(0, history_entry)
+    if len(st.session_state.analysis_history) > 5:
+        st.session_state.analysis_history = st.session_state.analysis_history[:5]
+
+def display_meal_analysis(analysis: MealAnalysis):
     """Display meal analysis with beautiful, well-organized sections"""
     
     # Custom CSS for better styling with proper contrast
@@ -444,58 +381,34 @@ def display_meal_analysis(analysis_text: str):
     </style>
     """, unsafe_allow_html=True)
     
-    # Split analysis into sentences for better parsing
-    sentences = [s.strip() for s in analysis_text.split('.') if s.strip()]
-    
-    # Initialize containers
-    food_description = ""
-    nutrition_data = {}
-    rating_score = None
-    max_rating = None
-    advice_list = []
-    
-    # Parse the analysis - collect all info
-    full_text = analysis_text.lower()
-    
-    # Extract food description (usually first sentence)
-    if sentences:
-        food_description = sentences[0]
-    
-    # Extract nutrition data - search entire text
-    nutrition_data = extract_nutrition_numbers(analysis_text)
-    
-    # Extract rating
-    for sentence in sentences:
-        score, max_s = extract_rating(sentence)
-        if score:
-            rating_score = score
-            max_rating = max_s
-            break
+    nutrition_data = nutrition_card_values(analysis.nutrition)
+    rating_score = analysis.rating
     
-    # Extract advice - sentences with recommendation keywords
-    for sentence in sentences:
-        sentence_lower = sentence.lower()
-        if any(word in sentence_lower for word in ['consider', 'recommend', 'suggest', 'try', 'opt for', 'balance', 'incorporate', 'avoid', 'reduce', 'increase', 'prefer']):
-            if len(sentence) > 15:  # Filter out very short sentences
-                advice_list.append(sentence)
+    if analysis.degraded:
+        st.warning(f"⏱️ Quick estimate: the full AI analysis did not finish within {ANALYSIS_BUDGET_SECONDS:g} seconds, "
+                   "so the rating and tips were computed from our nutrition database.")
+    if analysis.partial:
+        st.info("Only part of this meal could be read in time; the totals cover the items listed below.")
     
     # DISPLAY SECTION 1: Food Items (Top Left)
     col1, col2 = st.columns([1.2, 1])
     
     with col1:
         st.markdown('<div class="section-header">🍽️ Your Meal</div>', unsafe_allow_html=True)
-        if food_description:
-            st.markdown(f'<div class="food-item">{food_description}</div>', unsafe_allow_html=True)
+        if analysis.meal_description:
+            st.markdown(f'<div class="food-item">{analysis.meal_description}</div>', unsafe_allow_html=True)
         else:
             st.info("Food identification in progress...")
+        if analysis.narrative:
+            st.markdown(analysis.narrative)
     
     with col2:
         st.markdown('<div class="section-header">💪 Health Rating</div>', unsafe_allow_html=True)
-        if rating_score and max_rating:
-            st.markdown(f'<div class="rating-score">{rating_score}/{max_rating}</div>', unsafe_allow_html=True)
+        if rating_score:
+            st.markdown(f'<div class="rating-score">{rating_score}/{MAX_RATING}</div>', unsafe_allow_html=True)
             
             # Custom progress bar
-            progress_pct = (rating_score / max_rating) * 100
+            progress_pct = (rating_score / MAX_RATING) * 100
             st.markdown(f'''
             <div class="progress-bar">
                 <div style="width: {progress_pct}%; height: 100%; background: linear-gradient(90deg, #667eea, #764ba2); border-radius: 10px;"></div>
@@ -523,42 +436,16 @@ def display_meal_analysis(analysis_text: str):
     st.markdown('<div class="section-header">📊 Nutrition Breakdown</div>', unsafe_allow_html=True)
     
     if nutrition_data:
-        nutrition_icons = {
-            'calories': '🔥',
-            'protein': '💪',
-            'carbs': '🌾',
-            'fat': '🥑',
-            'fiber': '🥗',
-            'sodium': '🧂',
-            'sugar': '🍬'
-        }
-        
-        # Create a responsive grid layout (3 columns)
-        nutrition_items = list(nutrition_data.items())
-        cols_per_row = 3
-        
-        for row_idx in range(0, len(nutrition_items), cols_per_row):
-            cols = st.columns(cols_per_row, gap="small")
-            row_items = nutrition_items[row_idx:row_idx + cols_per_row]
-            
-            for col_idx, (key, value) in enumerate(row_items):
-                icon = nutrition_icons.get(key, '📌')
-                with cols[col_idx]:
-                    st.markdown(
-                        f'''<div class="nutrition-card">
-                            <div style="font-size: 1.3em; margin-bottom: 0.5em;">{icon} {key.capitalize()}</div>
-                            <div class="nutrition-card-value">{value}</div>
-                        </div>''',
-                        unsafe_allow_html=True
-                    )
+        display_nutrition_cards(nutrition_data)
     else:
         st.info("📊 Nutritional details being extracted...")
     
     st.divider()
     
-    # DISPLAY SECTION 2.5: Quick Tips
-    if nutrition_data and "age_group" in st.session_state.profile and st.session_state.profile.get("age_group") != "Not selected":
-        quick_tips = generate_quick_tips(nutrition_data, st.session_state.profile)
+    # DISPLAY SECTION 2.5: Quick Tips (already the advice below in instant mode or a quick estimate)
+    if (nutrition_data and st.session_state.analysis_mode != "instant" and not analysis.degraded
+            and st.session_state.profile.get("age_group", "Not selected") != "Not selected"):
+        quick_tips = MealScorer(st.session_state.profile).score(analysis.nutrition, analysis.items).advice[:3]
         if quick_tips:
             st.markdown('<div class="section-header">⚡ Quick Tips</div>', unsafe_allow_html=True)
             for tip in quick_tips:
@@ -568,14 +455,9 @@ def display_meal_analysis(analysis_text: str):
     # DISPLAY SECTION 3: Personalized Advice (Full Width)
     st.markdown('<div class="section-header">💡 Personalized Advice</div>', unsafe_allow_html=True)
     
-    if advice_list:
-        # Combine all advice into a single paragraph and strip markdown
-        combined_advice = " ".join(advice_list)
-        # Remove markdown formatting (**, *, etc.)
-        combined_advice = re.sub(r'\*\*(.+?)\*\*', r'\1', combined_advice)  # Remove bold
-        combined_advice = re.sub(r'\*(.+?)\*', r'\1', combined_advice)  # Remove italics
-        combined_advice = re.sub(r'_(.+?)_', r'\1', combined_advice)  # Remove underscores
-        st.markdown(f'<div class="advice-item">✨ {combined_advice}</div>', unsafe_allow_html=True)
+    if analysis.advice:
+        for tip in analysis.advice:
+            st.markdown(f'<div class="advice-item">✨ {tip}</div>', unsafe_allow_html=True)
     else:
         # Fallback: show informational message
         st.info("💡 Personalized recommendations will appear here based on your profile and the meal analysis...")
@@ -788,6 +670,18 @@ with st.sidebar:
         ["Vegetarian", "Vegan", "Gluten-Free", "Low-Carb", "Keto"],
         default=st.session_state.profile["dietary_preferences"]
     )
+    
+    st.markdown("## ⚙️ Analysis")
+    st.session_state.analysis_mode = st.radio(
+        "Analysis mode",
+        list(ANALYSIS_MODES),
+        index=list(ANALYSIS_MODES).index(st.session_state.analysis_mode),
+        format_func=ANALYSIS_MODE_LABELS.get,
+        help="Detailed: two AI requests, advice written from the Nutrition Facts. "
+             "Fast: one AI request, about twice as fast, but the advice is written without seeing the Nutrition Facts. "
+             "Instant: rating and advice computed on the spot from the Nutrition Facts and your profile; "
+             "AI only reads the meal, and simple descriptions like \"150g chicken breast, 1 cup rice\" need none."
+    )
 
 # ===========================
 # Main Content - App Header
@@ -853,8 +747,9 @@ with tab1:
             
             with col1:
                 st.markdown("#### 📷 Your Photo")
-                image = Image.open(uploaded_file)
-                st.image(image, use_container_width=True)
+                # Decoded once: oriented, downsampled photo used for display and analysis
+                prepared_image = prepare_uploaded_image(uploaded_file.getvalue())
+                st.image(prepared_image.data, use_container_width=True)
             
             with col2:
                 st.markdown("#### 📊 Ready to Analyze")
@@ -869,51 +764,32 @@ with tab1:
                 clear_clicked = st.button("🗑️ Clear", use_container_width=True)
             
             if analyze_clicked:
-                with st.spinner("🔍 Analyzing your meal photo..."):
-                    analyzer = NutritionAnalyzer(
-                        api_key,
-                        endpoint,
-                        deployment,
-                        api_version
-                    )
+                try:
+                    with st.spinner("🔍 Analyzing your meal photo..."):
+                        stream = analyzer.detect_food_from_image_stream(
+                            prepared_image,
+                            st.session_state.profile,
+                            **ANALYSIS_MODES[st.session_state.analysis_mode]
+                        )
                     
-                    # Convert image to bytes
-                    image_bytes = io.BytesIO()
-                    image.save(image_bytes, format="PNG")
-                    image_bytes.seek(0)
-                    image_base64 = io.BytesIO(uploaded_file.getvalue()).read()
+                    # Nutrition Facts first, then the analysis token by token
+                    analysis = stream_meal_analysis(stream)
                     
-                    try:
-                        analysis = analyzer.detect_food_from_image(
-                            image_base64,
-                            st.session_state.profile
-                        )
-                        
-                        st.session_state.current_analysis = analysis
-                        
-                        # Show success notification
-                        st.success("✅ Analysis complete!", icon="✅")
-                        
-                        display_meal_analysis(analysis)
+                    st.session_state.current_analysis = analysis
+                    
+                    # Show success notification
+                    st.success("✅ Analysis complete!", icon="✅")
+                    
+                    display_meal_analysis(analysis)
+                    
+                    # Add to history (keep last 5)
+                    add_to_history(analysis, analysis.meal_description or "Meal photo")
                         
-                        # Add to history (keep last 5)
-                        from datetime import datetime
-                        rating_score, rating_max = extract_rating(analysis)
-                        # Extract food from analysis (first sentence usually contains food name)
-                        food_name = analysis.split('.')[0] if '.' in analysis else analysis[:100]
-                        history_entry = {
-                            "timestamp": datetime.now().strftime("%H:%M:%S"),
-                            "food": food_name[:100],
-                            "rating": f"{rating_score}/{rating_max}" if rating_score else "N/A",
-                            "analysis": analysis
-                        }
-                        st.session_state.analysis_history.insert(0, history_entry)
-                        if len(st.session_state.analysis_history) > 5:
-                            st.session_state.analysis_history = st.session_state.analysis_history[:5]
-                            
-                    except Exception as e:
-                        st.error(f"❌ Error analyzing image: {str(e)}")
-                        st.info("Make sure your Azure OpenAI API key is correct in .env file")
+                except GatewayBusyError as e:
+                    st.warning(f"⏳ {str(e)}")
+                except Exception as e:
+                    st.error(f"❌ Error analyzing image: {str(e)}")
+                    st.info("Make sure your Azure OpenAI API key is correct in .env file")
     
     elif st.session_state.analysis_method == "text":  # Describe Meal
         st.markdown("### 📝 Describe Your Meal")
@@ -934,43 +810,32 @@ with tab1:
         
         if analyze_clicked:
             if meal_description.strip():
-                with st.spinner("📊 Analyzing your meal..."):
-                    analyzer = NutritionAnalyzer(
-                        api_key,
-                        endpoint,
-                        deployment,
-                        api_version
-                    )
-                    
-                    try:
-                        analysis = analyzer.analyze_text_meal(
+                try:
+                    with st.spinner("📊 Analyzing your meal..."):
+                        stream = analyzer.analyze_text_meal_stream(
                             meal_description,
-                            st.session_state.profile
+                            st.session_state.profile,
+                            **ANALYSIS_MODES[st.session_state.analysis_mode]
                         )
-                        
-                        st.session_state.current_analysis = analysis
-                        
-                        # Show success notification
-                        st.success("✅ Analysis complete!", icon="✅")
-                        
-                        display_meal_analysis(analysis)
-                        
-                        # Add to history (keep last 5)
-                        from datetime import datetime
-                        rating_score, rating_max = extract_rating(analysis)
-                        history_entry = {
-                            "timestamp": datetime.now().strftime("%H:%M:%S"),
-                            "food": meal_description[:100],
-                            "rating": f"{rating_score}/{rating_max}" if rating_score else "N/A",
-                            "analysis": analysis
-                        }
-                        st.session_state.analysis_history.insert(0, history_entry)
-                        if len(st.session_state.analysis_history) > 5:
-                            st.session_state.analysis_history = st.session_state.analysis_history[:5]
-                        
-                    except Exception as e:
-                        st.error(f"❌ Error analyzing meal: {str(e)}")
-                        st.info("Make sure your Azure OpenAI API key is correct in .env file")
+                    
+                    # Nutrition Facts first, then the analysis token by token
+                    analysis = stream_meal_analysis(stream)
+                    
+                    st.session_state.current_analysis = analysis
+                    
+                    # Show success notification
+                    st.success("✅ Analysis complete!", icon="✅")
+                    
+                    display_meal_analysis(analysis)
+                    
+                    # Add to history (keep last 5)
+                    add_to_history(analysis, meal_description)
+                    
+                except GatewayBusyError as e:
+                    st.warning(f"⏳ {str(e)}")
+                except Exception as e:
+                    st.error(f"❌ Error analyzing meal: {str(e)}")
+                    st.info("Make sure your Azure OpenAI API key is correct in .env file")
             else:
                 st.warning("Please describe your meal first!")
         
@@ -1155,13 +1020,6 @@ with tab3:
         
         if st.button("💡 Get Coaching Tips", use_container_width=True, type="primary"):
             with st.spinner("✨ Generating personalized tips..."):
-                analyzer = NutritionAnalyzer(
-                    api_key,
-                    endpoint,
-                    deployment,
-                    api_version
-                )
-                
                 try:
                     coaching = analyzer.get_personalized_coaching(
                         coaching_topic,
@@ -1176,6 +1034,8 @@ with tab3:
                     st.markdown("### Your Personalized Tips")
                     st.markdown(f'<div class="advice-item">💡 {coaching}</div>', unsafe_allow_html=True)
                     
+                except GatewayBusyError as e:
+                    st.warning(f"⏳ {str(e)}")
                 except Exception as e:
                     st.error(f"❌ Error generating coaching: {str(e)}")
                     st.info("Make sure your Azure OpenAI API key is correct in .env file")
@@ -1188,12 +1048,16 @@ st.divider()
 st.markdown('<div class="section-header">📋 Analysis History (Last 5)</div>', unsafe_allow_html=True)
 
 if st.session_state.analysis_history:
+    # Re-scored locally on every run, so past meals follow profile changes
+    scorer = MealScorer(st.session_state.profile)
     for idx, record in enumerate(st.session_state.analysis_history, 1):
+        analysis = record['analysis']
         with st.expander(f"📌 {idx}. {record['food'][:40]}... ({record['timestamp']}) - Rating: {record['rating']}"):
             st.markdown(f"**Food Analyzed:** {record['food']}")
             st.markdown(f"**Health Rating:** {record['rating']}")
+            st.markdown(f"**Score for your current profile:** {scorer.score(analysis.nutrition, analysis.items).rating}/{MAX_RATING}")
             st.markdown(f"**Full Analysis:**")
-            st.markdown(record['analysis'])
+            st.markdown(analysis.to_markdown())
 else:
     st.info("🍽️ No analysis history yet. Start by analyzing a meal to see your past records here!")
 
@@ -0,0 +1,336 @@
+"""
+EatWise AI - Compiled Catalog File
+Memory-mapped binary format for large (USDA-scale) nutrition catalogs
+
+The file holds everything a FoodCatalog needs, laid out so that opening it is
+just an mmap plus a few zero-copy NumPy views:
+
+- a float32 nutrient matrix (foods x nutrients)
+- a names table (offsets + UTF-8 blob) with an open-addressing hash index
+- the n-gram index of FoodIndex: a grams table plus uint32 posting lists
+
+Pages are read lazily and shared through the OS page cache, so every
+Streamlit process opening the same file shares one copy in memory.
+
+Compile a catalog from CSV (columns: name + one column per nutrient):
+    python src/catalog_file.py foods.csv nutrition_catalog.bin
+"""
+
+import csv
+import mmap
+import struct
+import sys
+import zlib
+from collections.abc import Sequence
+from typing import Dict, List, Set
+
+import numpy as np
+
+from food_catalog import NUTRIENTS, FoodCatalog
+from food_index import FoodIndex
+
+MAGIC = b"EWCATLG\x00"
+VERSION = 1
+
+_SECTIONS = (
+    "nutrients",        # Comma-separated nutrient column names
+    "matrix",           # float32[n_foods, n_nutrients]
+    "name_offsets",     # uint64[n_foods + 1] into name_blob
+    "name_blob",        # NUL-terminated UTF-8 names, in row order
+    "name_slots",       # uint32 hash slots, row + 1 (0 = empty)
+    "name_lengths",     # uint32 distinct name lengths (in characters), sorted
+    "gram_offsets",     # uint64[n_grams + 1] into gram_blob
+    "gram_blob",        # NUL-terminated UTF-8 grams
+    "gram_slots",       # uint32 hash slots, gram + 1 (0 = empty)
+    "posting_offsets",  # uint64[n_grams + 1] into postings
+    "postings",         # uint32 rows per gram, ascending
+)
+_HEADER = struct.Struct("<8sII")
+_SECTION = struct.Struct("<QQ")
+_ALIGN = 64
+
+
+class _StringTable(Sequence):
+    """Read-only table of strings stored in the catalog file, with hash lookup"""
+
+    def __init__(self, mm: mmap.mmap, base: int, size: int, offsets: np.ndarray, slots: np.ndarray):
+        self._mm = mm
+        self._base = base
+        self._end = base + size
+        self._offsets = offsets
+        self._slots = slots
+        self._mask = len(slots) - 1
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.raw(i).decode("utf-8")
+
+    def raw(self, i: int) -> bytes:
+        """Encoded bytes of entry i"""
+        if not -len(self) <= i < len(self):
+            raise IndexError(i)
+        i %= len(self)
+        start = self._base + int(self._offsets[i])
+        end = self._base + int(self._offsets[i + 1]) - 1  # Drop the NUL terminator
+        return self._mm[start:end]
+
+    def find(self, key: bytes) -> int:
+        """Position of an exact entry, or -1 if absent"""
+        slot = zlib.crc32(key) & self._mask
+        while True:
+            entry = int(self._slots[slot])
+            if entry == 0:
+                return -1
+            if self.raw(entry - 1) == key:
+                return entry - 1
+            slot = (slot + 1) & self._mask
+
+    def rows_containing(self, needle: bytes) -> Set[int]:
+        """Entries containing a byte string, found by scanning the blob"""
+        positions = []
+        pos = self._mm.find(needle, self._base, self._end)
+        while pos != -1:
+            positions.append(pos - self._base)
+            pos = self._mm.find(needle, pos + 1, self._end)
+        if not positions:
+            return set()
+        # NUL terminators keep matches from spanning two entries
+        rows = np.searchsorted(self._offsets, positions, side="right") - 1
+        return set(rows.tolist())
+
+    def first_containing(self, needle: bytes) -> int:
+        """Earliest entry containing a byte string, or -1"""
+        pos = self._mm.find(needle, self._base, self._end)
+        if pos == -1:
+            return -1
+        return int(np.searchsorted(self._offsets, pos - self._base, side="right")) - 1
+
+
+class MappedFoodIndex(FoodIndex):
+    """FoodIndex whose names, hash index and posting lists live in a catalog file"""
+
+    def __init__(self, names: _StringTable, name_lengths: np.ndarray, grams: _StringTable,
+                 posting_offsets: np.ndarray, postings: np.ndarray):
+        # Nothing is built here; every structure is a view into the mapping
+        self.names = names
+        self._name_lengths = name_lengths.tolist()
+        self._grams = grams
+        self._posting_offsets = posting_offsets
+        self._postings_array = postings
+        self._linear = False  # Compiled catalogs always carry their posting lists
+
+    def row_of(self, name: str) -> int:
+        """Return the catalog row of an exact name, or -1 if absent"""
+        return self.names.find(name.encode("utf-8"))
+
+    def _gram_candidates(self, query: str) -> List[int]:
+        """Rows containing every n-gram of the query, ascending"""
+        size = self.GRAM_SIZE
+        postings = []
+        for gram in {query[start:start + size] for start in range(len(query) - size + 1)}:
+            position = self._grams.find(gram.encode("utf-8"))
+            if position < 0:
+                return []
+            start, end = self._posting_offsets[position], self._posting_offsets[position + 1]
+            postings.append(self._postings_array[start:end])
+
+        # Posting lists are sorted and unique: keep the smallest and probe
+        # the others with binary search
+        postings.sort(key=len)
+        rows = postings[0]
+        for posting in postings[1:]:
+            found = np.searchsorted(posting, rows)
+            found[found == len(posting)] = 0
+            rows = rows[posting[found] == rows]
+            if not len(rows):
+                return []
+        return rows.tolist()
+
+    def _scan_containing(self, query: str) -> Set[int]:
+        """Rows whose name contains the query, by scanning the names blob"""
+        return self.names.rows_containing(query.encode("utf-8"))
+
+    def _scan_first(self, query: str) -> int:
+        """Earliest row whose name contains the query, by scanning the names blob"""
+        return self.names.first_containing(query.encode("utf-8"))
+
+    def _names_within(self, query: str) -> Set[int]:
+        """Rows whose name is a substring of the query (name in query)"""
+        rows = set()
+        for length in self._name_lengths:
+            if length > len(query):
+                break
+            for start in range(len(query) - length + 1):
+                row = self.names.find(query[start:start + length].encode("utf-8"))
+                if row >= 0:
+                    rows.add(row)
+        return rows
+
+
+def _string_table(keys: List[bytes]) -> Dict[str, bytes]:
+    """Encode offsets, blob and hash slots for a list of unique byte strings"""
+    offsets = np.zeros(len(keys) + 1, dtype="<u8")
+    offsets[1:] = np.cumsum([len(key) + 1 for key in keys])
+    blob = b"".join(key + b"\0" for key in keys)
+
+    capacity = 8
+    while capacity < 2 * len(keys):
+        capacity *= 2
+    slots = np.zeros(capacity, dtype="<u4")
+    mask = capacity - 1
+    for i, key in enumerate(keys):
+        slot = zlib.crc32(key) & mask
+        while slots[slot]:
+            slot = (slot + 1) & mask
+        slots[slot] = i + 1
+
+    return {"offsets": offsets.tobytes(), "blob": blob, "slots": slots.tobytes()}
+
+
+def write_catalog(catalog: FoodCatalog, path: str) -> None:
+    """
+    Compile a catalog into the memory-mappable file format.
+
+    Args:
+        catalog: Catalog to write (names must be unique)
+        path: Destination file
+    """
+    names = [str(name) for name in catalog.names]
+    if len(set(names)) != len(names):
+        raise ValueError("Catalog names must be unique")
+
+    # n-gram postings, rows ascending within each gram
+    size = FoodIndex.GRAM_SIZE
+    grams: Dict[str, List[int]] = {}
+    for row, name in enumerate(names):
+        for gram in {name[start:start + size] for start in range(len(name) - size + 1)}:
+            grams.setdefault(gram, []).append(row)
+    gram_keys = list(grams)
+    posting_offsets = np.zeros(len(gram_keys) + 1, dtype="<u8")
+    posting_offsets[1:] = np.cumsum([len(grams[gram]) for gram in gram_keys])
+    postings = np.fromiter(
+        (row for gram in gram_keys for row in grams[gram]), dtype="<u4", count=int(posting_offsets[-1])
+    )
+
+    name_table = _string_table([name.encode("utf-8") for name in names])
+    gram_table = _string_table([gram.encode("utf-8") for gram in gram_keys])
+    sections = {
+        "nutrients": ",".join(NUTRIENTS).encode("utf-8"),
+        "matrix": np.ascontiguousarray(catalog.matrix, dtype="<f4").tobytes(),
+        "name_offsets": name_table["offsets"],
+        "name_blob": name_table["blob"],
+        "name_slots": name_table["slots"],
+        "name_lengths": np.array(sorted({len(name) for name in names}), dtype="<u4").tobytes(),
+        "gram_offsets": gram_table["offsets"],
+        "gram_blob": gram_table["blob"],
+        "gram_slots": gram_table["slots"],
+        "posting_offsets": posting_offsets.tobytes(),
+        "postings": postings.tobytes(),
+    }
+
+    # Header and table of contents, then each section aligned for zero-copy views
+    position = _HEADER.size + _SECTION.size * len(_SECTIONS)
+    layout = []
+    for name in _SECTIONS:
+        position = -(-position // _ALIGN) * _ALIGN
+        layout.append((position, len(sections[name])))
+        position += len(sections[name])
+
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(_SECTIONS)))
+        for offset, length in layout:
+            f.write(_SECTION.pack(offset, length))
+        for name, (offset, _) in zip(_SECTIONS, layout):
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(sections[name])
+
+
+def open_catalog(path: str) -> FoodCatalog:
+    """
+    Open a compiled catalog file with mmap.
+
+    No parsing or index building happens here: the matrix, names and
+    posting lists are views into the mapping, read on demand.
+
+    Args:
+        path: Catalog file written by write_catalog
+
+    Returns:
+        FoodCatalog backed by the file
+    """
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, count = _HEADER.unpack_from(mm, 0)
+    if magic != MAGIC or version != VERSION or count != len(_SECTIONS):
+        raise ValueError(f"{path} is not an EatWise catalog file (version {VERSION})")
+
+    layout = {
+        name: _SECTION.unpack_from(mm, _HEADER.size + i * _SECTION.size)
+        for i, name in enumerate(_SECTIONS)
+    }
+
+    def view(name: str, dtype: str) -> np.ndarray:
+        offset, length = layout[name]
+        itemsize = np.dtype(dtype).itemsize
+        return np.frombuffer(mm, dtype=dtype, count=length // itemsize, offset=offset)
+
+    offset, length = layout["nutrients"]
+    nutrients = tuple(mm[offset:offset + length].decode("utf-8").split(","))
+    if nutrients != NUTRIENTS:
+        raise ValueError(f"{path} has nutrient columns {nutrients}, expected {NUTRIENTS}")
+
+    names = _StringTable(mm, *layout["name_blob"], view("name_offsets", "<u8"), view("name_slots", "<u4"))
+    grams = _StringTable(mm, *layout["gram_blob"], view("gram_offsets", "<u8"), view("gram_slots", "<u4"))
+    index = MappedFoodIndex(
+        names,
+        view("name_lengths", "<u4"),
+        grams,
+        view("posting_offsets", "<u8"),
+        view("postings", "<u4"),
+    )
+    matrix = view("matrix", "<f4").reshape(len(names), len(NUTRIENTS))
+    return FoodCatalog(names, matrix, index=index)
+
+
+def read_catalog_csv(path: str) -> Dict[str, dict]:
+    """
+    Read a catalog CSV into a {food_name: {nutrient: value}} mapping.
+
+    Args:
+        path: CSV with a "name" column and one column per nutrient (per 100g)
+
+    Returns:
+        Foods keyed by lowercased name; the first row wins for duplicates
+    """
+    foods = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for record in csv.DictReader(f):
+            name = (record.get("name") or "").lower().strip()
+            if name and name not in foods:
+                foods[name] = {n: float(record.get(n) or 0) for n in NUTRIENTS}
+    return foods
+
+
+def main(argv: List[str]) -> int:
+    """Compile a CSV (plus the built-in database) into a catalog file"""
+    if len(argv) != 2:
+        print("Usage: python src/catalog_file.py <foods.csv> <output.bin>", file=sys.stderr)
+        return 2
+
+    from nutrition_database import NUTRITION_DATABASE
+
+    # Curated built-in foods come first so they win substring lookups
+    foods = dict(NUTRITION_DATABASE)
+    for name, data in read_catalog_csv(argv[0]).items():
+        foods.setdefault(name, data)
+
+    write_catalog(FoodCatalog.from_dict(foods), argv[1])
+    print(f"Wrote {len(foods):,} foods to {argv[1]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
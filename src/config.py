@@ -15,6 +15,10 @@ load_dotenv()
 APP_NAME = "EatWise AI"
 APP_VERSION = "1.0.0-interim"
 
+# Local files the app writes (caches); not the current working directory, so
+# every way of starting the app finds the same files
+DATA_DIR = os.getenv("EATWISE_DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"))
+
 # ===========================
 # Azure OpenAI Configuration (HKUST - works in Hong Kong)
 # For local dev: use .env file
@@ -25,3 +29,177 @@ OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
 AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT", "https://hkust.azure-api.net/")
 AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4o")
 AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2023-05-15")
+
+# ===========================
+# Per-Stage Deployments
+# Optional deployment for a single pipeline stage, e.g. a small, fast model
+# for the JSON extraction: AZURE_OPENAI_EXTRACTION_DEPLOYMENT=gpt-4o-mini.
+# Stages left unset use AZURE_OPENAI_DEPLOYMENT; a call that fails on its
+# stage deployment is sent again to AZURE_OPENAI_DEPLOYMENT.
+# ===========================
+
+PIPELINE_STAGES = ("extraction", "detection", "analysis", "single_call", "coaching")
+STAGE_DEPLOYMENTS = {
+    stage: os.getenv(f"AZURE_OPENAI_{stage.upper()}_DEPLOYMENT")
+    for stage in PIPELINE_STAGES
+    if os.getenv(f"AZURE_OPENAI_{stage.upper()}_DEPLOYMENT")
+}
+
+# ===========================
+# Nutrition Catalog
+# Optional compiled catalog file (see src/catalog_file.py). When unset the
+# built-in NUTRITION_DATABASE is used.
+# ===========================
+
+NUTRITION_CATALOG_PATH = os.getenv("NUTRITION_CATALOG_PATH")
+
+# Lookup backend: "catalog" (in-process catalog above) or "sqlite" (FTS5 food
+# store in src/food_store.py, seeded from the built-in database when empty;
+# its file lives in DATA_DIR unless NUTRITION_SQLITE_PATH says otherwise)
+NUTRITION_BACKEND = os.getenv("NUTRITION_BACKEND", "catalog")
+NUTRITION_SQLITE_PATH = os.getenv("NUTRITION_SQLITE_PATH", os.path.join(DATA_DIR, "nutrition.db"))
+
+# Fuzzy fallback for misspelled names that miss exact/substring matching, or
+# only match a small part of a known name (see src/fuzzy_matcher.py); threshold is a trigram cosine similarity 0-1
+FUZZY_MATCHING = os.getenv("FUZZY_MATCHING", "true").lower() == "true"
+FUZZY_MATCH_THRESHOLD = float(os.getenv("FUZZY_MATCH_THRESHOLD", "0.5"))
+# A substring match covering less of the name than this share ("potato" in
+# "sweet potatos") competes with the fuzzy match, and loses to a higher score
+FUZZY_WEAK_SUBSTRING_COVERAGE = float(os.getenv("FUZZY_WEAK_SUBSTRING_COVERAGE", "0.6"))
+
+# ===========================
+# HTTP Connection Pool
+# One async pool per event loop, shared by every NutritionAnalyzer on it, so
+# warm requests reuse open TLS connections to the Azure endpoint. Blocking
+# calls all run on the process's shared event loop, i.e. one pool in practice.
+# ===========================
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "10"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "5"))
+# Seconds an idle connection is kept open (httpx closes them after 5s by default)
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "120"))
+
+# Meals analyzed at once by NutritionAnalyzer.analyze_meals (bulk back-fills).
+# Raise it with the Azure quota; requests beyond HTTP_MAX_CONNECTIONS queue
+# for a pooled connection.
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+# ===========================
+# Resilience
+# Completion calls are retried with jittered exponential backoff (honoring
+# Retry-After), duplicated ("hedged") when slower than the given latency
+# percentile, and short-circuited while the endpoint keeps failing
+# ===========================
+
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+# Longest wait between attempts; a longer Retry-After fails the call instead
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "8"))
+# 0 disables hedging; only non-streaming calls are hedged
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+# At most this fraction of calls may send a duplicate request
+HEDGE_MAX_RATIO = float(os.getenv("HEDGE_MAX_RATIO", "0.1"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+# ===========================
+# Gateway Rate Limiting
+# One scheduler per process budgets completion calls against the Azure
+# deployment's quota (see src/rate_limiter.py). Set the per-minute limits to
+# the deployment's quota; 0 disables a limit.
+# ===========================
+
+GATEWAY_REQUESTS_PER_MINUTE = float(os.getenv("GATEWAY_REQUESTS_PER_MINUTE", "180"))
+GATEWAY_TOKENS_PER_MINUTE = float(os.getenv("GATEWAY_TOKENS_PER_MINUTE", "30000"))
+# Largest burst admitted at once, in seconds of quota (Azure enforces the
+# per-minute quota over short windows)
+GATEWAY_BURST_SECONDS = float(os.getenv("GATEWAY_BURST_SECONDS", "10"))
+GATEWAY_MAX_QUEUE_DEPTH = int(os.getenv("GATEWAY_MAX_QUEUE_DEPTH", "100"))
+# Longest expected queueing before a request is refused as busy, per lane
+GATEWAY_INTERACTIVE_MAX_WAIT = float(os.getenv("GATEWAY_INTERACTIVE_MAX_WAIT", "15"))
+GATEWAY_BATCH_MAX_WAIT = float(os.getenv("GATEWAY_BATCH_MAX_WAIT", "300"))
+
+# ===========================
+# Latency Budget
+# An interactive analysis must answer within this many seconds, across all
+# of its completion calls (see src/latency_budget.py). When the budget runs
+# out the result is degraded: database nutrition totals with a locally
+# computed rating and summary. 0 disables it; bulk analyses are not budgeted.
+# ===========================
+
+ANALYSIS_BUDGET_SECONDS = float(os.getenv("ANALYSIS_BUDGET_SECONDS", "20"))
+
+# ===========================
+# Request Coalescing
+# Identical text analyses / coaching requests in flight at the same time
+# share one set of completion calls (see src/single_flight.py)
+# ===========================
+
+REQUEST_COALESCING = os.getenv("REQUEST_COALESCING", "true").lower() == "true"
+
+# ===========================
+# Local Meal Parser
+# Simple text meals ("150g chicken breast, 1 cup brown rice") are parsed
+# against the catalog without the extraction completion when the parser's
+# confidence (0-1, see src/meal_parser.py) reaches the threshold
+# ===========================
+
+LOCAL_MEAL_PARSER = os.getenv("LOCAL_MEAL_PARSER", "true").lower() == "true"
+LOCAL_PARSER_MIN_CONFIDENCE = float(os.getenv("LOCAL_PARSER_MIN_CONFIDENCE", "0.8"))
+
+# ===========================
+# Streaming Extraction
+# The extraction completion is streamed, and each item is looked up in the
+# catalog as soon as the model has written it (see ArrayFieldReader in
+# src/meal_analysis.py). Streams are never hedged; set to false for the
+# hedged, non-streaming extraction call.
+# ===========================
+
+STREAMING_EXTRACTION = os.getenv("STREAMING_EXTRACTION", "true").lower() == "true"
+
+# ===========================
+# Extraction Cache
+# Parsed ingredient extractions of repeat meals (see src/extraction_cache.py),
+# stored in DATA_DIR by default. Set EXTRACTION_CACHE_PATH to an empty value
+# to disable.
+# ===========================
+
+EXTRACTION_CACHE_PATH = os.getenv("EXTRACTION_CACHE_PATH", os.path.join(DATA_DIR, "extraction_cache.db"))
+EXTRACTION_CACHE_TTL_DAYS = float(os.getenv("EXTRACTION_CACHE_TTL_DAYS", "30"))
+EXTRACTION_CACHE_MAX_ENTRIES = int(os.getenv("EXTRACTION_CACHE_MAX_ENTRIES", "10000"))
+
+# ===========================
+# Image Detection Cache
+# Vision detections of near-identical photos (see src/image_cache.py).
+# Distance is in bits of a 64-bit perceptual hash; 0 entries disables it.
+# ===========================
+
+IMAGE_CACHE_MAX_ENTRIES = int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "256"))
+IMAGE_CACHE_MAX_DISTANCE = int(os.getenv("IMAGE_CACHE_MAX_DISTANCE", "6"))
+
+# ===========================
+# Image Preprocessing
+# Photos are downsampled to what the vision model actually uses (fit in
+# 2048x2048, short side 768) and re-encoded before upload
+# ===========================
+
+IMAGE_MAX_LONG_SIDE = int(os.getenv("IMAGE_MAX_LONG_SIDE", "2048"))
+IMAGE_MAX_SHORT_SIDE = int(os.getenv("IMAGE_MAX_SHORT_SIDE", "768"))
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "JPEG")  # JPEG or WEBP
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "85"))
+
+# ===========================
+# Analysis Mode
+# Single-call analysis asks for the ingredients and the advice in one model
+# round trip (about half the latency). Nutrition totals are still computed
+# from the database, but the advice is written without seeing them.
+# Local scoring skips the analysis completion entirely: the rating, advice
+# and a templated summary come from src/health_score.py, so a simple text
+# meal needs no model call at all. It takes precedence over single-call.
+# Users can also switch modes per session in the app sidebar.
+# ===========================
+
+SINGLE_CALL_ANALYSIS = os.getenv("SINGLE_CALL_ANALYSIS", "false").lower() == "true"
+LOCAL_SCORING = os.getenv("LOCAL_SCORING", "false").lower() == "true"
@@ -0,0 +1,168 @@
+"""
+EatWise AI - Extraction Cache
+Disk-backed cache of parsed meal extractions, keyed on normalized meal text
+
+Users often log the same meals ("2 eggs, toast and coffee" every morning).
+Caching the parsed extraction JSON lets a repeat meal skip the extraction
+round trip and go straight to the database step.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS extractions (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS extractions_accessed ON extractions(accessed);
+"""
+
+# Separators between the components of a meal description
+_COMPONENT_SPLIT = re.compile(r"[,;&+\n]|\b(?:and|with|plus)\b")
+# Punctuation, except decimal points inside numbers ("1.5 cups")
+_PUNCTUATION = re.compile(r"[^\w\s.]|_|(?<!\d)\.|\.(?!\d)")
+
+
+def normalize_meal_text(meal_description: str) -> str:
+    """
+    Normalize a meal description so trivially different phrasings share a key.
+
+    Case, whitespace and punctuation are ignored, and the meal's components
+    (split on commas, "and", "with", ...) are sorted, so "Toast and 2 eggs"
+    matches "2 eggs, toast". Words inside a component keep their order, so
+    quantities stay attached to their food.
+
+    Args:
+        meal_description: Meal text as entered by the user
+
+    Returns:
+        Normalized text
+    """
+    parts = _COMPONENT_SPLIT.split(meal_description.lower())
+    components = (" ".join(_PUNCTUATION.sub(" ", part).split()) for part in parts)
+    return "|".join(sorted(part for part in components if part))
+
+
+class ExtractionCache:
+    """SQLite cache of extraction results with TTL and LRU eviction.
+
+    Keys combine a namespace (deployment and prompt version, so a model or
+    prompt change never serves stale extractions) with the normalized meal
+    text. Hit and miss counts are kept per process.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 30 * 86400, max_entries: int = 10000):
+        """Open (and if needed create) the cache
+
+        Args:
+            path: SQLite database file
+            ttl_seconds: Entries older than this are treated as missing
+            max_entries: Least recently used entries beyond this are evicted
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    @staticmethod
+    def cache_key(meal_description: str, namespace: str) -> str:
+        """Key for a meal description within a namespace"""
+        normalized = normalize_meal_text(meal_description)
+        return hashlib.sha256(f"{namespace}\x00{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, meal_description: str, namespace: str = "") -> Optional[Dict]:
+        """
+        Look up a cached extraction.
+
+        Args:
+            meal_description: Meal text as entered by the user
+            namespace: Deployment / prompt version the extraction came from
+
+        Returns:
+            The cached extraction dict, or None on a miss or expired entry
+        """
+        key = self.cache_key(meal_description, namespace)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM extractions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    with self._conn:
+                        self._conn.execute("DELETE FROM extractions WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+
+            with self._conn:
+                self._conn.execute("UPDATE extractions SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, meal_description: str, extraction: Dict, namespace: str = "") -> None:
+        """
+        Store an extraction, evicting the least recently used entries if full.
+
+        Args:
+            meal_description: Meal text as entered by the user
+            extraction: Parsed extraction ({"items": [...], "meal_description": ...})
+            namespace: Deployment / prompt version the extraction came from
+        """
+        key = self.cache_key(meal_description, namespace)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO extractions (key, value, created, accessed) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, "
+                "created = excluded.created, accessed = excluded.accessed",
+                (key, json.dumps(extraction), now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM extractions WHERE key IN ("
+                "SELECT key FROM extractions ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        """Remove every entry and reset the counters"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM extractions")
+            self.hits = self.misses = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM extractions").fetchone()[0]
+
+    def stats(self) -> Dict:
+        """Hit/miss counters, hit rate and current number of entries"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": len(self),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
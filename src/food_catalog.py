@@ -0,0 +1,79 @@
+"""
+EatWise AI - Columnar Food Catalog
+Contiguous float32 nutrient matrix (foods x nutrients) with a name index
+"""
+
+from collections.abc import Sequence
+from typing import Dict, Iterable
+
+import numpy as np
+
+from food_index import FoodIndex
+
+# Column order of the nutrient matrix and of every per-100g vector
+NUTRIENTS = ("calories", "protein", "carbs", "fat", "fiber", "sodium", "sugar")
+
+
+class FoodCatalog:
+    """Nutrition catalog stored column-wise for vectorized portion math.
+
+    Row i of `matrix` holds the per-100g values of `names[i]`, in NUTRIENTS
+    order. Name lookups go through a FoodIndex built over the same rows.
+    """
+
+    def __init__(self, names: Iterable[str], matrix: np.ndarray, index: FoodIndex = None):
+        """Wrap an existing names list and nutrient matrix
+
+        Args:
+            names: Food names (lowercased), one per matrix row. Sequences
+                are kept as-is so file-backed name tables stay lazy.
+            matrix: Array of shape (len(names), len(NUTRIENTS))
+            index: Prebuilt FoodIndex over names (built if omitted)
+        """
+        self.names: Sequence = names if isinstance(names, Sequence) else list(names)
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        if self.matrix.shape != (len(self.names), len(NUTRIENTS)):
+            raise ValueError(
+                f"Nutrient matrix shape {self.matrix.shape} does not match "
+                f"{len(self.names)} foods x {len(NUTRIENTS)} nutrients"
+            )
+        self.index = index if index is not None else FoodIndex(self.names)
+
+    @classmethod
+    def from_dict(cls, database: Dict[str, dict]) -> "FoodCatalog":
+        """Build a catalog from a {food_name: {nutrient: value}} mapping"""
+        matrix = np.array(
+            [[data.get(nutrient, 0) for nutrient in NUTRIENTS] for data in database.values()],
+            dtype=np.float32,
+        ).reshape(len(database), len(NUTRIENTS))
+        return cls(database.keys(), matrix)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def resolve_row(self, food_name: str) -> int:
+        """
+        Find the row for a normalized food name.
+
+        Exact matches win; otherwise the first substring match in catalog
+        order is used, mirroring find_food_matches.
+
+        Args:
+            food_name: Lowercased, stripped food name
+
+        Returns:
+            Matrix row, or -1 if nothing matches
+        """
+        row = self.index.row_of(food_name)
+        if row < 0:
+            row = self.index.first_match(food_name)
+        return row
+
+    def food_dict(self, row: int) -> dict:
+        """Per-100g nutrition of a row as a {nutrient: value} dict"""
+        return to_nutrition_dict(self.matrix[row])
+
+
+def to_nutrition_dict(vector: np.ndarray) -> dict:
+    """Convert a nutrient vector into a {nutrient: value} dict rounded to 1 decimal"""
+    return {nutrient: round(float(value), 1) for nutrient, value in zip(NUTRIENTS, vector)}
@@ -0,0 +1,161 @@
+"""
+EatWise AI - Food Name Index
+Inverted character n-gram index for fast food name lookups
+"""
+
+from typing import Dict, Iterable, List, Set
+
+
+class FoodIndex:
+    """Inverted n-gram index over catalog food names.
+
+    Answers the same question as the original substring scan in
+    find_food_matches ("query in name or name in query") without visiting
+    every name in the catalog. Catalogs below LINEAR_SCAN_MAX_NAMES are
+    answered by that scan, which is faster at their size.
+    """
+
+    # Size of the character n-grams stored in the posting lists
+    GRAM_SIZE = 3
+
+    # Catalogs smaller than this are scanned directly: below a few hundred
+    # names one pass over the list costs less than extracting the query's
+    # n-grams and intersecting their posting lists (the built-in database
+    # has under 100 foods)
+    LINEAR_SCAN_MAX_NAMES = 500
+
+    def __init__(self, names: Iterable[str]):
+        """Build the index
+
+        Args:
+            names: Catalog food names (already lowercased), in catalog order
+        """
+        self.names: List[str] = list(names)
+        self._rows: Dict[str, int] = {name: row for row, name in enumerate(self.names)}
+        self._postings: Dict[str, Set[int]] = {}
+        self._name_lengths = sorted({len(name) for name in self.names})
+        self._linear = len(self.names) < self.LINEAR_SCAN_MAX_NAMES
+        if self._linear:
+            return
+
+        postings = self._postings
+        size = self.GRAM_SIZE
+        for row, name in enumerate(self.names):
+            for gram in {name[start:start + size] for start in range(len(name) - size + 1)}:
+                posting = postings.get(gram)
+                if posting is None:
+                    postings[gram] = {row}
+                else:
+                    posting.add(row)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def row_of(self, name: str) -> int:
+        """Return the catalog row of an exact name, or -1 if absent"""
+        return self._rows.get(name, -1)
+
+    def search(self, query: str) -> List[int]:
+        """
+        Find catalog rows whose name contains the query or is contained in it.
+
+        Args:
+            query: Normalized (lowercased, stripped) food name
+
+        Returns:
+            Matching rows in catalog order
+        """
+        if self._linear:
+            return [row for row, name in enumerate(self.names) if query in name or name in query]
+        if not query:
+            # "" is a substring of every name
+            return list(range(len(self.names)))
+
+        rows = self._names_containing(query)
+        rows.update(self._names_within(query))
+        return sorted(rows)
+
+    def first_match(self, query: str) -> int:
+        """
+        Find the earliest catalog row matching the query.
+
+        Args:
+            query: Normalized (lowercased, stripped) food name
+
+        Returns:
+            Row of the first match in catalog order, or -1 if nothing matches
+        """
+        if self._linear:
+            return next((row for row, name in enumerate(self.names) if query in name or name in query), -1)
+        if not query:
+            return 0 if self.names else -1
+
+        rows = self._names_within(query)
+        first = self._first_containing(query)
+        if first >= 0:
+            rows.add(first)
+        return min(rows) if rows else -1
+
+    def _names_containing(self, query: str) -> Set[int]:
+        """Rows whose name contains the query (query in name)"""
+        if len(query) < self.GRAM_SIZE:
+            # Too short to form a gram; such queries match a large share of
+            # the catalog anyway, so a direct scan costs no more than the output
+            return self._scan_containing(query)
+
+        rows = self._gram_candidates(query)
+        # Sharing every n-gram is necessary but not sufficient for a
+        # substring match once the query is longer than one gram
+        if len(query) > self.GRAM_SIZE:
+            return {row for row in rows if query in self.names[row]}
+        return set(rows)
+
+    def _first_containing(self, query: str) -> int:
+        """Earliest row whose name contains the query, or -1"""
+        if len(query) < self.GRAM_SIZE:
+            return self._scan_first(query)
+
+        # Candidates are ascending, so the first verified one is the answer
+        for row in self._gram_candidates(query):
+            if len(query) == self.GRAM_SIZE or query in self.names[row]:
+                return row
+        return -1
+
+    def _gram_candidates(self, query: str) -> List[int]:
+        """Rows containing every n-gram of the query, ascending"""
+        size = self.GRAM_SIZE
+        postings = []
+        for start in range(len(query) - size + 1):
+            posting = self._postings.get(query[start:start + size])
+            if not posting:
+                return []
+            postings.append(posting)
+
+        # Intersect smallest lists first to keep the working set small
+        postings.sort(key=len)
+        rows = set(postings[0])
+        for posting in postings[1:]:
+            rows &= posting
+            if not rows:
+                return []
+        return sorted(rows)
+
+    def _scan_containing(self, query: str) -> Set[int]:
+        """Rows whose name contains the query, by direct scan"""
+        return {row for row, name in enumerate(self.names) if query in name}
+
+    def _scan_first(self, query: str) -> int:
+        """Earliest row whose name contains the query, by direct scan"""
+        return next((row for row, name in enumerate(self.names) if query in name), -1)
+
+    def _names_within(self, query: str) -> Set[int]:
+        """Rows whose name is a substring of the query (name in query)"""
+        rows = set()
+        for length in self._name_lengths:
+            if length > len(query):
+                break
+            for start in range(len(query) - length + 1):
+                row = self._rows.get(query[start:start + length])
+                if row is not None:
+                    rows.add(row)
+        return rows
@@ -0,0 +1,185 @@
+"""
+EatWise AI - SQLite Food Store
+Nutrition catalog kept in a local SQLite file with an FTS5 name index
+
+An alternative nutrition backend (see nutrition_database.set_backend): the
+catalog can be grown or corrected in place without redeploying code, and
+non-exact names are answered by ranked full-text search instead of the
+first substring hit in catalog order.
+
+Import or update foods from CSV (columns: name + one column per nutrient):
+    python src/food_store.py foods.csv nutrition.db
+"""
+
+import os
+import re
+import sqlite3
+import sys
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from food_catalog import NUTRIENTS, to_nutrition_dict
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS foods (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    {", ".join(f"{nutrient} REAL NOT NULL DEFAULT 0" for nutrient in NUTRIENTS)}
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS foods_fts USING fts5(
+    name, content='foods', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS foods_ai AFTER INSERT ON foods BEGIN
+    INSERT INTO foods_fts(rowid, name) VALUES (new.id, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS foods_ad AFTER DELETE ON foods BEGIN
+    INSERT INTO foods_fts(foods_fts, rowid, name) VALUES ('delete', old.id, old.name);
+END;
+CREATE TRIGGER IF NOT EXISTS foods_au AFTER UPDATE OF name ON foods BEGIN
+    INSERT INTO foods_fts(foods_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    INSERT INTO foods_fts(rowid, name) VALUES (new.id, new.name);
+END;
+"""
+
+_COLUMNS = ", ".join(f"foods.{nutrient}" for nutrient in NUTRIENTS)
+
+
+class SQLiteFoodStore:
+    """Nutrition backend on a local SQLite database with FTS5 ranking.
+
+    Each thread gets its own connection (created on first use), so
+    concurrent Streamlit sessions never serialize on a shared handle.
+    Connections of finished threads are closed as new ones are opened.
+    """
+
+    def __init__(self, path: str, max_matches: int = 20):
+        """Open (and if needed create) the store
+
+        Args:
+            path: SQLite database file (its directory is created if missing)
+            max_matches: Maximum number of ranked matches returned per lookup
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_matches = max_matches
+        self._lock = threading.Lock()
+        self._connections: Dict[int, sqlite3.Connection] = {}
+
+        with self._connection() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")  # Readers don't block the writer
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _connection(self) -> sqlite3.Connection:
+        """Connection owned by the calling thread"""
+        ident = threading.get_ident()
+        conn = self._connections.get(ident)
+        if conn is None:
+            with self._lock:
+                alive = {thread.ident for thread in threading.enumerate()}
+                for dead in [i for i in self._connections if i not in alive]:
+                    self._connections.pop(dead).close()
+                conn = self._connections[ident] = self._connect()
+        return conn
+
+    def close(self) -> None:
+        """Close every pooled connection"""
+        with self._lock:
+            for conn in self._connections.values():
+                conn.close()
+            self._connections.clear()
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM foods").fetchone()[0]
+
+    # ----- Writes -----
+
+    def upsert_foods(self, foods: Dict[str, dict]) -> None:
+        """
+        Insert new foods or update existing ones in a single transaction.
+
+        Args:
+            foods: {food_name: {nutrient: value per 100g}}
+        """
+        rows = [
+            (name.lower().strip(), *(float(data.get(n, 0)) for n in NUTRIENTS))
+            for name, data in foods.items()
+        ]
+        updates = ", ".join(f"{n} = excluded.{n}" for n in NUTRIENTS)
+        with self._connection() as conn:
+            conn.executemany(
+                f"INSERT INTO foods (name, {', '.join(NUTRIENTS)}) "
+                f"VALUES (?{', ?' * len(NUTRIENTS)}) "
+                f"ON CONFLICT(name) DO UPDATE SET {updates}",
+                rows,
+            )
+
+    def remove_food(self, food_name: str) -> bool:
+        """Delete a food; returns True if it existed"""
+        with self._connection() as conn:
+            cursor = conn.execute("DELETE FROM foods WHERE name = ?", (food_name.lower().strip(),))
+        return cursor.rowcount > 0
+
+    # ----- Lookups (backend interface) -----
+
+    def _ranked(self, food_name: str, limit: int) -> List[Tuple]:
+        """Exact match, else FTS5 matches ranked by bm25 (best first)"""
+        conn = self._connection()
+        row = conn.execute(
+            f"SELECT foods.name, {_COLUMNS} FROM foods WHERE foods.name = ?", (food_name,)
+        ).fetchone()
+        if row is not None:
+            return [row]
+
+        # Quote each word so user text can't inject FTS5 query syntax
+        terms = re.findall(r"\w+", food_name)
+        if not terms:
+            return []
+        query = " OR ".join(f'"{term}"' for term in terms)
+        return conn.execute(
+            f"SELECT foods.name, {_COLUMNS} FROM foods_fts "
+            f"JOIN foods ON foods.id = foods_fts.rowid "
+            f"WHERE foods_fts MATCH ? "
+            f"ORDER BY bm25(foods_fts), length(foods.name), foods.id LIMIT ?",
+            (query, limit),
+        ).fetchall()
+
+    def find_food_matches(self, food_name: str) -> list:
+        """Ranked (food_name, nutrition) matches, best first"""
+        rows = self._ranked(food_name.lower().strip(), self.max_matches)
+        return [(row[0], to_nutrition_dict(row[1:])) for row in rows]
+
+    def resolve(self, food_name: str) -> Optional[Tuple[str, np.ndarray]]:
+        """Best match as (canonical name, per-100g vector), or None"""
+        rows = self._ranked(food_name.lower().strip(), 1)
+        if not rows:
+            return None
+        return rows[0][0], np.array(rows[0][1:], dtype=np.float32)
+
+
+def main(argv: List[str]) -> int:
+    """Import or update foods from a CSV into a store"""
+    if len(argv) != 2:
+        print("Usage: python src/food_store.py <foods.csv> <nutrition.db>", file=sys.stderr)
+        return 2
+
+    from catalog_file import read_catalog_csv
+
+    foods = read_catalog_csv(argv[0])
+    store = SQLiteFoodStore(argv[1])
+    store.upsert_foods(foods)
+    print(f"Upserted {len(foods):,} foods; store now holds {len(store):,}")
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,119 @@
+"""
+EatWise AI - Fuzzy Food Matcher
+Character-trigram TF-IDF similarity for misspelled or variant food names
+"""
+
+import math
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+
+class FuzzyMatcher:
+    """Cosine similarity between character-trigram TF-IDF vectors.
+
+    The catalog side is a sparse matrix stored column-wise (one posting list
+    of rows and weights per trigram), so a lookup only touches the posting
+    lists of the query's trigrams and scores them with one NumPy bincount.
+    """
+
+    GRAM_SIZE = 3
+
+    def __init__(self, names: Sequence[str], max_postings: int = 5000):
+        """Build the TF-IDF matrix
+
+        Args:
+            names: Catalog food names (lowercased), in catalog order
+            max_postings: Trigrams found in more names than this are skipped
+                at query time; they carry almost no weight (low IDF) but
+                dominate lookup cost on large catalogs
+        """
+        self.size = len(names)
+        self.max_postings = max_postings
+
+        gram_ids: Dict[str, int] = {}
+        rows: List[int] = []
+        cols: List[int] = []
+        for row, name in enumerate(names):
+            for gram in self._grams(name):
+                rows.append(row)
+                cols.append(gram_ids.setdefault(gram, len(gram_ids)))
+        self._gram_ids = gram_ids
+
+        rows = np.asarray(rows, dtype=np.int32)
+        cols = np.asarray(cols, dtype=np.int32)
+        df = np.bincount(cols, minlength=len(gram_ids))
+        self._idf = np.log((1 + self.size) / (1 + df)) + 1
+
+        # L2-normalize each name's vector (binary tf x idf)
+        weights = self._idf[cols]
+        norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=self.size))
+        weights = (weights / norms[rows]).astype(np.float32)
+
+        # Group entries by trigram: CSC layout of the names x trigrams matrix
+        order = np.argsort(cols, kind="stable")
+        self._rows = rows[order]
+        self._weights = weights[order]
+        self._starts = np.concatenate(([0], np.cumsum(df)))
+
+    def _grams(self, text: str) -> set:
+        """Padded character trigrams, so word boundaries count too"""
+        padded = f" {' '.join(text.split())} "
+        size = self.GRAM_SIZE
+        return {padded[i:i + size] for i in range(len(padded) - size + 1)}
+
+    def top_k(self, query: str, k: int = 5) -> List[Tuple[int, float]]:
+        """
+        Find the most similar catalog names.
+
+        Args:
+            query: Lowercased food name
+            k: Number of results
+
+        Returns:
+            (row, cosine similarity) pairs, best first
+        """
+        grams = self._grams(query)
+        query_grams = [self._gram_ids[g] for g in grams if g in self._gram_ids]
+        if not query_grams or not self.size:
+            return []
+
+        # Query vector: unseen trigrams still count toward its norm, so a
+        # name that only shares a few grams with a long query scores low
+        idf = self._idf[query_grams]
+        unseen = len(grams) - len(query_grams)
+        query_norm = math.sqrt(float(np.sum(idf ** 2)) + unseen * float(self._idf.max()) ** 2)
+
+        row_parts, weight_parts = [], []
+        for gram, gram_idf in zip(query_grams, idf):
+            start, end = self._starts[gram], self._starts[gram + 1]
+            if end - start > self.max_postings:
+                continue
+            row_parts.append(self._rows[start:end])
+            weight_parts.append(self._weights[start:end] * (gram_idf / query_norm))
+        if not row_parts:
+            return []
+
+        rows = np.concatenate(row_parts)
+        scores = np.bincount(rows, weights=np.concatenate(weight_parts))
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.lexsort((best, -scores[best]))]  # Ties go to the earlier row
+        return [(int(row), float(scores[row])) for row in best if scores[row] > 0]
+
+    def best_match(self, query: str, threshold: float) -> Tuple[int, float]:
+        """
+        Best catalog row for a query if it is similar enough.
+
+        Args:
+            query: Lowercased food name
+            threshold: Minimum cosine similarity (0-1)
+
+        Returns:
+            (row, score), or (-1, score) when nothing reaches the threshold
+        """
+        matches = self.top_k(query, k=1)
+        if not matches:
+            return -1, 0.0
+        row, score = matches[0]
+        return (row, score) if score >= threshold else (-1, score)
@@ -0,0 +1,286 @@
+"""
+EatWise AI - Health Scoring
+Deterministic health rating and advice from nutrient totals
+
+A meal is rated 1-10 against the profile's daily targets (one meal is
+measured against MEAL_SHARE of the day), health conditions and dietary
+preferences. Each issue found costs points; the advice lists the issues
+most expensive first. No model call is involved, so the same engine backs
+the app's quick tips, history re-scoring when the profile changes, and the
+analyzer's local-scoring mode that skips the analysis completion.
+"""
+
+import re
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+from meal_analysis import MAX_RATING
+
+# Daily targets by health goal, before the gender adjustment
+BASE_TARGETS = {
+    "General wellness": {"calories": 2000, "protein": 50, "carbs": 225, "fat": 65, "fiber": 25, "sodium": 2300},
+    "Weight loss": {"calories": 1500, "protein": 120, "carbs": 150, "fat": 50, "fiber": 30, "sodium": 2000},
+    "Muscle gain": {"calories": 2500, "protein": 150, "carbs": 300, "fat": 85, "fiber": 25, "sodium": 2300},
+    "Energy boost": {"calories": 2200, "protein": 70, "carbs": 275, "fat": 70, "fiber": 28, "sodium": 2300},
+    "Heart health": {"calories": 1800, "protein": 60, "carbs": 200, "fat": 50, "fiber": 35, "sodium": 1500},
+}
+DEFAULT_GOAL = "General wellness"
+
+# Calories and protein scale with gender (women typically need 10-15% less,
+# men 10-15% more)
+GENDER_FACTORS = {"Female": 0.85, "Male": 1.1}
+
+MEAL_SHARE = 1 / 3  # Share of the daily targets one meal is measured against
+BASE_SCORE = 9.0  # Score of a meal with no issues; bonuses lift it to MAX_RATING
+
+# Daily limits (g / mg) tightened by conditions and preferences
+SUGAR_LIMIT = 50
+DIABETES_SUGAR_LIMIT = 25
+LOW_SODIUM_LIMIT = 1500  # With hypertension or heart disease (AHA)
+DIABETES_CARB_LIMIT = 180
+CARB_LIMITS = {"Low-Carb": 100, "Keto": 30}
+
+SODIUM_CONDITIONS = ("Hypertension", "Heart Disease")
+
+# Ingredient keywords; matched at the start of a word so plurals count
+GLUTEN_FOODS = ["bread", "pasta", "spaghetti", "noodle", "couscous", "wheat", "barley", "rye",
+                "bagel", "cracker", "tortilla", "flour", "cereal", "pizza", "croissant"]
+DAIRY_FOODS = ["milk", "cheese", "cheddar", "mozzarella", "parmesan", "yogurt", "butter", "cream"]
+MEAT_FOODS = ["chicken", "beef", "pork", "turkey", "lamb", "steak", "bacon", "ham", "sausage", "meat",
+              "fish", "salmon", "tuna", "cod", "shrimp", "prawn", "seafood"]
+EGG_FOODS = ["egg"]
+
+# Plant-based namesakes that are not dairy ("peanut butter", "oat milk")
+_PLANT_BASED = re.compile(r"\b(?:peanut|almond|cashew|oat|soy|coconut|rice)\s+(?:butter|milk|cheese|yogurt|cream)")
+
+
+def _keywords(words: Sequence[str]) -> "re.Pattern":
+    return re.compile(r"\b(?:" + "|".join(re.escape(word) for word in words) + r")")
+
+
+_GLUTEN = _keywords(GLUTEN_FOODS)
+_DAIRY = _keywords(DAIRY_FOODS)
+_MEAT = _keywords(MEAT_FOODS)
+_ANIMAL = _keywords(MEAT_FOODS + DAIRY_FOODS + EGG_FOODS)
+
+
+def get_nutrition_targets(profile: Dict) -> Dict[str, int]:
+    """
+    Daily nutrition targets for a profile (health goal, adjusted by gender).
+
+    Args:
+        profile: User profile (health_goal, gender)
+
+    Returns:
+        Targets: calories (kcal), protein, carbs, fat, fiber (g), sodium (mg)
+    """
+    targets = dict(BASE_TARGETS.get(profile.get("health_goal"), BASE_TARGETS[DEFAULT_GOAL]))
+    factor = GENDER_FACTORS.get(profile.get("gender"))
+    if factor is not None:
+        targets["calories"] = int(targets["calories"] * factor)
+        targets["protein"] = int(targets["protein"] * factor)
+    return targets
+
+
+class HealthScore(NamedTuple):
+    """Rating and advice for one meal"""
+    rating: int  # 1-MAX_RATING
+    advice: Tuple[str, ...]  # Most important first
+    score: float  # Unrounded score the rating comes from
+    summary: str  # Templated one-paragraph interpretation
+
+    def response(self) -> Dict:
+        """In the shape of the analysis completion's JSON (for MealAnalysis.with_response)"""
+        return {"narrative": self.summary, "rating": self.rating, "advice": list(self.advice)}
+
+
+def _excess(ratio: float, start: float, base: float, slope: float, cap: float) -> float:
+    """Penalty for a ratio above start: base plus slope per unit over, at most cap"""
+    if ratio <= start:
+        return 0.0
+    return min(cap, base + (ratio - start) * slope)
+
+
+class MealScorer:
+    """Scores meals for one profile.
+
+    Targets and thresholds are worked out once in the constructor, so
+    score() is arithmetic over the totals plus a keyword scan of the item
+    names: re-scoring a whole history for a changed profile costs a few
+    microseconds per meal.
+    """
+
+    @staticmethod
+    def profile_key(profile: Dict) -> Tuple:
+        """Every profile field the scorer reads: equal keys score every meal the same"""
+        return (
+            profile.get("health_goal"),
+            profile.get("gender"),
+            tuple(sorted(profile.get("health_conditions") or [])),
+            tuple(sorted(profile.get("dietary_preferences") or [])),
+        )
+
+    def __init__(self, profile: Dict):
+        """Precompute the per-meal targets and rules of a profile
+
+        Args:
+            profile: User profile (health_goal, gender, health_conditions,
+                dietary_preferences)
+        """
+        self.targets = get_nutrition_targets(profile)
+        self.goal = profile.get("health_goal") if profile.get("health_goal") in BASE_TARGETS else DEFAULT_GOAL
+        conditions = set(profile.get("health_conditions") or [])
+        preferences = set(profile.get("dietary_preferences") or [])
+
+        self._calories = self.targets["calories"] * MEAL_SHARE
+        self._protein = self.targets["protein"] * MEAL_SHARE
+        self._fiber = self.targets["fiber"] * MEAL_SHARE
+        self._fat = self.targets["fat"] * MEAL_SHARE
+        self._fat_weight = 1.5 if "Heart Disease" in conditions else 1.0
+
+        self._sodium_conditions = " and ".join(c.lower() for c in SODIUM_CONDITIONS if c in conditions)
+        sodium = min(self.targets["sodium"], LOW_SODIUM_LIMIT) if self._sodium_conditions else self.targets["sodium"]
+        self._sodium = sodium * MEAL_SHARE
+        self._sodium_weight = 1.5 if self._sodium_conditions else 1.0
+
+        diabetes = "Diabetes" in conditions
+        self._sugar = (DIABETES_SUGAR_LIMIT if diabetes else SUGAR_LIMIT) * MEAL_SHARE
+        self._sugar_weight = 1.5 if diabetes else 1.0
+
+        # Strictest carb ceiling and what it comes from
+        carb_limits = [(limit, f"on a {name.lower()} diet") for name, limit in CARB_LIMITS.items() if name in preferences]
+        if diabetes:
+            carb_limits.append((DIABETES_CARB_LIMIT, "with diabetes"))
+        self._carbs, self._carb_reason = min(carb_limits) if carb_limits else (None, "")
+        if self._carbs is not None:
+            self._carbs *= MEAL_SHARE
+
+        # Ingredient rules: (pattern, penalty, advice after the matched names)
+        self._item_rules = []
+        if "Celiac" in conditions or "Gluten-Free" in preferences:
+            self._item_rules.append((_GLUTEN, 3.0, "choose a gluten-free alternative."))
+        if "Lactose Intolerance" in conditions:
+            self._item_rules.append((_DAIRY, 2.0, "pick a lactose-free or plant-based version."))
+        if "Vegan" in preferences:
+            self._item_rules.append((_ANIMAL, 3.0, "not vegan; swap in tofu, tempeh or legumes."))
+        elif "Vegetarian" in preferences:
+            self._item_rules.append((_MEAT, 3.0, "not vegetarian; swap in eggs, paneer or legumes."))
+
+        if "Vegan" in preferences:
+            self._protein_sources = "tofu, tempeh or lentils"
+        elif "Vegetarian" in preferences:
+            self._protein_sources = "eggs, Greek yogurt or lentils"
+        else:
+            self._protein_sources = "chicken, fish, eggs or legumes"
+
+    def score(self, nutrition: Dict[str, float], items: Sequence[Dict] = ()) -> HealthScore:
+        """
+        Rate a meal and rank the advice.
+
+        Args:
+            nutrition: Nutrition totals (calories, protein, carbs, fat, fiber,
+                sodium, sugar), e.g. MealAnalysis.nutrition
+            items: Extracted items ({"name", ...}), checked against the
+                profile's conditions and preferences
+
+        Returns:
+            HealthScore
+        """
+        calories = nutrition.get("calories") or 0
+        protein = nutrition.get("protein") or 0
+        carbs = nutrition.get("carbs") or 0
+        fat = nutrition.get("fat") or 0
+        fiber = nutrition.get("fiber") or 0
+        sodium = nutrition.get("sodium") or 0
+        sugar = nutrition.get("sugar") or 0
+
+        issues: List[Tuple[float, str]] = []
+        notes: List[str] = []
+        bonus = 0.0
+
+        ratio = calories / self._calories
+        if ratio > 1.25:
+            issues.append((_excess(ratio, 1.25, 0.5, 2.0, 2.5),
+                           f"At {calories:.0f} cal this meal is well over a third of your "
+                           f"{self.targets['calories']} cal daily target; a smaller portion would suit your goal."))
+        elif 50 < calories and ratio < 0.35:
+            issues.append((0.5, "Light meal - pair it with a protein or whole-grain side to stay full."))
+
+        ratio = protein / self._protein
+        if ratio < 0.6:
+            issues.append((min(2.0, (0.6 - ratio) * 3.5),
+                           f"Only {protein:.0f} g protein (about {self._protein:.0f} g per meal fits your goal); "
+                           f"add {self._protein_sources}."))
+        elif ratio >= 0.9:
+            bonus += 0.5
+            notes.append("Excellent protein for your goal.")
+
+        ratio = fiber / self._fiber
+        if ratio < 0.5:
+            issues.append((min(1.5, (0.5 - ratio) * 3),
+                           f"Only {fiber:.0f} g fiber; add vegetables, legumes or whole grains."))
+        elif ratio >= 0.8:
+            bonus += 0.5
+            notes.append("Great fiber content.")
+
+        penalty = _excess(sodium / self._sodium, 1.0, 0.5, 2.0, 2.0) * self._sodium_weight
+        if penalty:
+            advised = f" advised with {self._sodium_conditions}" if self._sodium_conditions else ""
+            issues.append((penalty, f"Sodium is {sodium:.0f} mg, over the {self._sodium:.0f} mg per meal{advised}; "
+                                    "choose low-sodium sauces and fewer processed foods."))
+
+        penalty = _excess(fat / self._fat, 1.3, 0.3, 2.0, 1.5) * self._fat_weight
+        if penalty:
+            issues.append((penalty, f"High in fat ({fat:.0f} g); go easier on oils, butter and fried foods."))
+
+        penalty = _excess(sugar / self._sugar, 1.0, 0.5, 1.5, 2.0) * self._sugar_weight
+        if penalty:
+            issues.append((penalty, f"{sugar:.0f} g sugar is a lot for one meal; swap sweets and juice for whole fruit."))
+
+        if self._carbs is not None:
+            penalty = _excess(carbs / self._carbs, 1.0, 1.0, 2.0, 3.0)
+            if penalty:
+                issues.append((penalty, f"{carbs:.0f} g carbs is above the ~{self._carbs:.0f} g per meal advised "
+                                        f"{self._carb_reason}; trade some starch for vegetables or protein."))
+
+        if self._item_rules:
+            names = [str(item.get("name") or "").lower() for item in items]
+            for pattern, penalty, advice in self._item_rules:
+                found = [name for name in names if pattern.search(_PLANT_BASED.sub("", name))]
+                if found:
+                    issues.append((penalty, f"Contains {', '.join(found)} - {advice}"))
+
+        score = BASE_SCORE + bonus - sum(penalty for penalty, _ in issues)
+        rating = max(1, min(MAX_RATING, int(score + 0.5)))
+        issues.sort(key=lambda issue: -issue[0])
+        advice = tuple(tip for _, tip in issues) + tuple(notes)
+        return HealthScore(rating, advice or ("Balanced meal for your goal - keep it up.",), score,
+                           self.summary(nutrition, rating))
+
+    def summary(self, nutrition: Dict[str, float], rating: int) -> str:
+        """Templated interpretation of a meal's totals and rating"""
+        calories = nutrition.get("calories") or 0
+        share = calories / self.targets["calories"] * 100
+        if rating >= 8:
+            verdict = f"A well-balanced choice for your {self.goal.lower()} goal."
+        elif rating >= 6:
+            verdict = f"A reasonable choice for your {self.goal.lower()} goal, with room to improve."
+        else:
+            verdict = f"This meal works against your {self.goal.lower()} goal; see the advice below."
+        return (f"About {calories:.0f} cal ({share:.0f}% of your {self.targets['calories']} cal daily target) "
+                f"with {nutrition.get('protein') or 0:.0f} g protein, {nutrition.get('carbs') or 0:.0f} g carbs "
+                f"and {nutrition.get('fat') or 0:.0f} g fat. {verdict}")
+
+
+def score_meal(nutrition: Dict[str, float], profile: Dict, items: Sequence[Dict] = ()) -> HealthScore:
+    """
+    Rate one meal for a profile (use a MealScorer to score many).
+
+    Args:
+        nutrition: Nutrition totals
+        profile: User profile
+        items: Extracted items
+
+    Returns:
+        HealthScore
+    """
+    return MealScorer(profile).score(nutrition, items)
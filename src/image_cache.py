@@ -0,0 +1,141 @@
+"""
+EatWise AI - Image Detection Cache
+Perceptual-hash (dHash) cache of vision detections for near-identical photos
+
+A re-upload, or a retake of the same plate after clicking Clear, produces
+an image that differs in bytes but not in content. Keying the detection
+JSON on a perceptual hash lets those skip the vision call entirely.
+"""
+
+import io
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from PIL import Image
+
+HASH_SIZE = 8  # 8x8 gradient bits -> 64-bit hash
+
+
+def dhash(image_data: bytes, hash_size: int = HASH_SIZE) -> Optional[int]:
+    """
+    Difference hash of an image: one bit per horizontally adjacent pixel
+    pair of a (hash_size + 1) x hash_size grayscale thumbnail.
+
+    Args:
+        image_data: Encoded image bytes (JPEG, PNG, ...)
+        hash_size: Bits per row / number of rows
+
+    Returns:
+        hash_size * hash_size bit integer, or None if the image can't be decoded
+    """
+    try:
+        image = Image.open(io.BytesIO(image_data))
+        # JPEGs can be decoded at 1/2-1/8 scale, far cheaper than full size
+        image.draft("L", (hash_size * 8, hash_size * 8))
+        thumbnail = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    except Exception:
+        return None
+
+    pixels = list(thumbnail.getdata())
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes"""
+    return (a ^ b).bit_count()
+
+
+class ImageDetectionCache:
+    """Bounded in-memory LRU of detection results keyed by image dHash.
+
+    A lookup matches the closest stored hash of the same namespace
+    (deployment and prompt version) within max_distance bits.
+    """
+
+    def __init__(self, max_entries: int = 256, max_distance: int = 6):
+        """Create an empty cache
+
+        Args:
+            max_entries: Least recently used entries beyond this are evicted
+            max_distance: Largest Hamming distance (of 64 bits) counted as the same image
+        """
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, int], Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _closest(self, image_hash: int, namespace: str) -> Optional[Tuple[str, int]]:
+        if (namespace, image_hash) in self._entries:
+            return namespace, image_hash
+
+        best, best_distance = None, self.max_distance + 1
+        for key in self._entries:
+            if key[0] == namespace:
+                distance = hamming_distance(key[1], image_hash)
+                if distance < best_distance:
+                    best, best_distance = key, distance
+        return best
+
+    def get(self, image_hash: Optional[int], namespace: str = "") -> Optional[Dict]:
+        """
+        Look up the detection of a near-identical image.
+
+        Args:
+            image_hash: dHash of the new image (None is always a miss)
+            namespace: Deployment / prompt version the detection came from
+
+        Returns:
+            The cached detection dict, or None on a miss
+        """
+        with self._lock:
+            key = self._closest(image_hash, namespace) if image_hash is not None else None
+            if key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def put(self, image_hash: Optional[int], detection: Dict, namespace: str = "") -> None:
+        """
+        Store a detection, evicting the least recently used entries if full.
+
+        Args:
+            image_hash: dHash of the image (None is ignored)
+            detection: Parsed detection ({"items": [...], "meal_description": ...})
+            namespace: Deployment / prompt version the detection came from
+        """
+        if image_hash is None or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[(namespace, image_hash)] = detection
+            self._entries.move_to_end((namespace, image_hash))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove every entry and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        """Hit/miss counters, hit rate and current number of entries"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": len(self),
+        }
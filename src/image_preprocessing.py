@@ -0,0 +1,101 @@
+"""
+EatWise AI - Image Preprocessing
+Decode, orient, downsample and re-encode meal photos before vision calls
+
+Phone photos are 4-12 MB, but the vision model only looks at a fit within
+2048x2048 with the short side scaled to 768px. Sending anything larger only
+costs upload bytes, base64 time and gateway latency.
+"""
+
+import io
+from typing import NamedTuple, Union
+
+from PIL import Image, ImageOps
+
+from config import IMAGE_FORMAT, IMAGE_MAX_LONG_SIDE, IMAGE_MAX_SHORT_SIDE, IMAGE_QUALITY
+
+_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+class PreparedImage(NamedTuple):
+    """A photo ready to send to the vision model"""
+    data: bytes  # Encoded image
+    mime_type: str  # e.g. "image/jpeg"
+    width: int
+    height: int
+    original_size: int  # Bytes of the uploaded file
+
+
+def target_size(width: int, height: int, max_long_side: int = IMAGE_MAX_LONG_SIDE,
+                max_short_side: int = IMAGE_MAX_SHORT_SIDE) -> tuple:
+    """
+    Largest size the model still uses for an image, keeping the aspect ratio.
+
+    Args:
+        width: Image width
+        height: Image height
+        max_long_side: Limit for the longer side
+        max_short_side: Limit for the shorter side
+
+    Returns:
+        (width, height), never larger than the input
+    """
+    scale = min(1.0, max_long_side / max(width, height), max_short_side / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def prepare_image(image_data: Union[bytes, Image.Image], image_format: str = IMAGE_FORMAT,
+                  quality: int = IMAGE_QUALITY) -> PreparedImage:
+    """
+    Decode a photo once and produce the payload for the vision model.
+
+    Applies the EXIF orientation, downsamples to the model's useful
+    resolution and re-encodes as a quality-tuned JPEG or WebP.
+
+    Args:
+        image_data: Uploaded file bytes (any format PIL reads) or an opened image
+        image_format: "JPEG" or "WEBP"
+        quality: Encoder quality (1-100)
+
+    Returns:
+        PreparedImage with the encoded bytes and their MIME type
+    """
+    image_format = image_format.upper()
+    if image_format not in _MIME_TYPES:
+        raise ValueError(f"Unsupported image format '{image_format}'. Use JPEG or WEBP")
+
+    if isinstance(image_data, Image.Image):
+        image, original_size = image_data, 0
+    else:
+        image, original_size = Image.open(io.BytesIO(image_data)), len(image_data)
+
+    # Orientation swaps width/height, so work out the target on the oriented size
+    orientation = image.getexif().get(0x0112, 1)  # EXIF Orientation tag
+    width, height = image.size
+    if orientation in (5, 6, 7, 8):
+        width, height = height, width
+    size = target_size(width, height)
+
+    # JPEGs can be decoded directly at 1/2-1/8 scale, skipping most of the work
+    draft_size = (size[1], size[0]) if orientation in (5, 6, 7, 8) else size
+    image.draft("RGB", draft_size)
+
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ("RGBA", "LA", "P"):
+        # Flatten transparency onto white instead of black
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+    if image.size != size:
+        image = image.resize(size, Image.LANCZOS, reducing_gap=2.0)
+
+    buffer = io.BytesIO()
+    if image_format == "JPEG":
+        image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    else:
+        image.save(buffer, format="WEBP", quality=quality, method=4)
+
+    return PreparedImage(buffer.getvalue(), _MIME_TYPES[image_format], size[0], size[1], original_size)
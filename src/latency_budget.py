@@ -0,0 +1,118 @@
+"""
+EatWise AI - Latency Budget
+Per-request deadline shared by every stage of an analysis
+
+A budget is set once, when an analysis starts, and every completion call
+made inside it (extraction or detection, then the analysis; queueing in
+the gateway scheduler and retries included) only gets the time that is
+left. When it runs out the stage is abandoned with BudgetExceeded, which
+the analyzer turns into a degraded, database-only result instead of an
+error, so a slow gateway still gets the user an answer within the budget.
+"""
+
+import asyncio
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import AsyncIterator, Awaitable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Monotonic time by which the current request must be answered
+_DEADLINE: contextvars.ContextVar = contextvars.ContextVar("latency_deadline", default=None)
+
+
+class BudgetExceeded(TimeoutError):
+    """Raised when a stage would run past the request's latency budget"""
+
+
+@contextmanager
+def latency_budget(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Give completion calls made inside the block (and tasks created in it) a deadline.
+
+    Nested budgets keep the earlier deadline.
+
+    Args:
+        seconds: Budget from now; None or 0 adds no limit
+    """
+    deadline = _DEADLINE.get()
+    if seconds:
+        ends = time.monotonic() + seconds
+        deadline = ends if deadline is None else min(deadline, ends)
+    token = _DEADLINE.set(deadline)
+    try:
+        yield
+    finally:
+        _DEADLINE.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current budget (None without one)"""
+    deadline = _DEADLINE.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+async def within_budget(awaitable: Awaitable[T]) -> T:
+    """
+    Await something, abandoning it when the current budget runs out.
+
+    Args:
+        awaitable: Work to bound (cancelled on timeout)
+
+    Returns:
+        Its result
+
+    Raises:
+        BudgetExceeded: The budget ran out first
+    """
+    left = remaining()
+    if left is None:
+        return await awaitable
+    if left <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise BudgetExceeded("Latency budget exhausted")
+    try:
+        return await asyncio.wait_for(awaitable, left)
+    except asyncio.TimeoutError:
+        raise BudgetExceeded("Latency budget exhausted") from None
+
+
+def with_deadline(chunks: AsyncIterator[T]) -> AsyncIterator[T]:
+    """
+    Bound a stream by the current budget, wherever it is consumed later.
+
+    The deadline is read now, so it holds even when the stream is iterated
+    outside the request's context (e.g. from a Streamlit thread).
+
+    Args:
+        chunks: Async iterator
+
+    Returns:
+        The same items; BudgetExceeded is raised (and the source closed)
+        once the deadline passes
+    """
+    deadline = _DEADLINE.get()
+    if deadline is None:
+        return chunks
+    return _until(chunks, deadline)
+
+
+async def _until(chunks: AsyncIterator[T], deadline: float) -> AsyncIterator[T]:
+    iterator = chunks.__aiter__()
+    try:
+        while True:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                raise BudgetExceeded("Latency budget exhausted")
+            try:
+                item = await asyncio.wait_for(iterator.__anext__(), left)
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                raise BudgetExceeded("Latency budget exhausted") from None
+            yield item
+    finally:
+        if hasattr(iterator, "aclose"):
+            await iterator.aclose()
@@ -0,0 +1,326 @@
+"""
+EatWise AI - Meal Analysis Result
+Typed analysis object built from JSON-mode completions
+
+The analyzer already knows the items and nutrition totals; the model only
+adds the narrative, rating and advice as JSON fields. The app renders and
+stores this object directly instead of scraping numbers out of markdown.
+"""
+
+import json
+import re
+from typing import AsyncIterator, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from latency_budget import BudgetExceeded
+
+MAX_RATING = 10
+
+
+def format_nutrition_facts(total_nutrition: Dict) -> str:
+    """
+    Format nutrition totals as a markdown Nutrition Facts block.
+
+    Args:
+        total_nutrition: Total nutrition values (as from _calculate_hybrid_nutrition)
+
+    Returns:
+        Markdown Nutrition Facts section
+    """
+    return f"""**Nutrition Facts**:
+- **Calories**: {int(total_nutrition['calories'])} cal
+- **Protein**: {total_nutrition['protein']}g
+- **Carbs**: {total_nutrition['carbs']}g
+- **Fat**: {total_nutrition['fat']}g
+- **Fiber**: {total_nutrition['fiber']}g
+- **Sodium**: {int(total_nutrition['sodium'])}mg
+- **Sugar**: {total_nutrition['sugar']}g"""
+
+
+def parse_json_object(text: str) -> Optional[Dict]:
+    """
+    Parse a model response that should be a JSON object.
+
+    JSON mode returns the bare object; older API versions may wrap it in
+    prose or a code fence, so fall back to the outermost {...}.
+
+    Args:
+        text: Response text
+
+    Returns:
+        Parsed dict, or None if no JSON object could be read
+    """
+    try:
+        data = json.loads(text)
+    except ValueError:
+        json_match = re.search(r'\{[\s\S]*\}', text)
+        try:
+            data = json.loads(json_match.group()) if json_match else None
+        except ValueError:
+            data = None
+    return data if isinstance(data, dict) else None
+
+
+class MealAnalysis(NamedTuple):
+    """Result of a meal analysis"""
+    items: List[Dict]  # {"name", "quantity", "unit", "preparation"} as extracted
+    nutrition: Dict[str, float]  # Database-backed totals (calories, protein, ...)
+    meal_description: str
+    narrative: str = ""  # Interpretation of the meal, markdown
+    rating: Optional[int] = None  # Health rating 1-MAX_RATING
+    advice: Tuple[str, ...] = ()  # Personalized tips, most important first
+    degraded: bool = False  # Latency budget ran out: database totals with a templated summary
+    partial: bool = False  # Some parts of the meal could not be read; totals cover the listed items only
+
+    def with_response(self, data: Optional[Dict]) -> "MealAnalysis":
+        """
+        Fill in narrative, rating and advice from the model's JSON.
+
+        Missing or malformed fields are left empty rather than guessed.
+
+        Args:
+            data: Parsed analysis JSON ({"narrative", "rating", "advice"}), or None
+
+        Returns:
+            New MealAnalysis
+        """
+        data = data or {}
+        narrative = data.get("narrative")
+        rating = data.get("rating")
+        advice = data.get("advice")
+        if isinstance(advice, str):
+            advice = [advice]
+
+        try:
+            rating = int(round(float(rating)))
+        except (TypeError, ValueError):
+            rating = None
+        return self._replace(
+            narrative=narrative.strip() if isinstance(narrative, str) else "",
+            rating=rating if rating is not None and 1 <= rating <= MAX_RATING else None,
+            advice=tuple(tip.strip() for tip in advice or [] if isinstance(tip, str) and tip.strip()),
+        )
+
+    def to_response(self) -> Dict:
+        """Narrative, rating and advice in the shape of the model's JSON (inverse of with_response)"""
+        return {"narrative": self.narrative, "rating": self.rating, "advice": list(self.advice)}
+
+    def to_markdown(self) -> str:
+        """Readable markdown version (history view, exports)"""
+        parts = []
+        if self.meal_description:
+            parts.append(f"**Your Meal**: {self.meal_description}")
+        if self.degraded:
+            parts.append("*Quick estimate: the full analysis did not finish in time.*")
+        if self.partial:
+            parts.append("*Only part of this meal could be read; the totals cover the listed items.*")
+        parts.append(format_nutrition_facts(self.nutrition))
+        if self.narrative:
+            parts.append(self.narrative)
+        if self.rating is not None:
+            parts.append(f"**Health Rating**: {self.rating}/{MAX_RATING}")
+        if self.advice:
+            parts.append("**Personalized Advice**:\n" + "\n".join(f"- {tip}" for tip in self.advice))
+        return "\n\n".join(parts)
+
+
+class StringFieldReader:
+    """Incrementally decode one top-level string field of a streaming JSON object.
+
+    feed() takes raw response text as it arrives and returns the newly
+    decoded characters of the field's value, so e.g. the narrative can be
+    shown while the rest of the object is still being generated.
+    """
+
+    _ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+    def __init__(self, field: str):
+        self._start = re.compile(r'"' + re.escape(field) + r'"\s*:\s*"')
+        self._buffer = ""
+        self._pos = None  # Index in buffer of the next undecoded value character
+        self.done = False
+
+    def feed(self, text: str) -> str:
+        """Add response text; return the value characters it completed"""
+        if self.done:
+            return ""
+        self._buffer += text
+        if self._pos is None:
+            match = self._start.search(self._buffer)
+            if match is None:
+                return ""
+            self._pos = match.end()
+
+        out = []
+        buffer, pos = self._buffer, self._pos
+        while pos < len(buffer):
+            char = buffer[pos]
+            if char == '"':
+                self.done = True
+                pos += 1
+                break
+            if char != '\\':
+                out.append(char)
+                pos += 1
+                continue
+            # Escape sequence: wait until it has fully arrived
+            if pos + 1 >= len(buffer):
+                break
+            code = buffer[pos + 1]
+            if code == 'u':
+                if pos + 6 > len(buffer):
+                    break
+                try:
+                    out.append(chr(int(buffer[pos + 2:pos + 6], 16)))
+                except ValueError:
+                    pass
+                pos += 6
+            else:
+                out.append(self._ESCAPES.get(code, code))
+                pos += 2
+        self._pos = pos
+        return "".join(out)
+
+
+class ArrayFieldReader:
+    """Incrementally decode the elements of one top-level array field of a streaming JSON object.
+
+    feed() takes raw response text as it arrives and returns the array
+    elements it completed, so e.g. each extracted item can be looked up in
+    the catalog while the model is still writing the next one.
+    """
+
+    def __init__(self, field: str):
+        self._start = re.compile(r'"' + re.escape(field) + r'"\s*:\s*\[')
+        self._buffer = ""
+        self._pos = None  # Index in buffer of the next unscanned character
+        self._element = None  # Index in buffer where the current element starts
+        self._depth = 0  # Bracket nesting inside the current element
+        self._in_string = False
+        self._escaped = False
+        self.done = False
+
+    def feed(self, text: str) -> List:
+        """Add response text; return the elements it completed (unparseable ones are skipped)"""
+        if self.done:
+            return []
+        self._buffer += text
+        if self._pos is None:
+            match = self._start.search(self._buffer)
+            if match is None:
+                return []
+            self._pos = match.end()
+
+        out = []
+        buffer, pos = self._buffer, self._pos
+        while pos < len(buffer):
+            char = buffer[pos]
+            pos += 1
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if char.isspace():
+                continue
+            if self._depth == 0 and char in ',]':
+                # End of a scalar element (objects and arrays end at their bracket)
+                if self._element is not None:
+                    self._emit(buffer[self._element:pos - 1], out)
+                if char == ']':
+                    self.done = True
+                    break
+                continue
+            if self._element is None:
+                self._element = pos - 1
+            if char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(buffer[self._element:pos], out)
+        self._pos = pos
+        return out
+
+    def _emit(self, text: str, out: list) -> None:
+        self._element = None
+        try:
+            out.append(json.loads(text))
+        except ValueError:
+            pass
+
+
+class AnalysisStream:
+    """A meal analysis whose narrative is still being generated.
+
+    `result` holds the items and nutrition totals straight away. Iterating
+    (`for` for the blocking API, `async for` for the async one) yields the
+    narrative as it streams in; once exhausted, `result` also carries the
+    narrative, rating and advice parsed from the full JSON response. If the
+    stream runs out of latency budget, iteration ends early and `result` is
+    the degraded one instead.
+    """
+
+    def __init__(self, result: MealAnalysis, chunks: Union[Iterator[str], AsyncIterator[str]],
+                 degrade: Callable[[MealAnalysis], MealAnalysis] = None):
+        """Wrap a raw response stream
+
+        Args:
+            result: Analysis with items and nutrition filled in
+            chunks: Raw JSON response text chunks (sync or async iterator)
+            degrade: Builds the result from `result` when the chunks raise
+                BudgetExceeded (without it, the error is raised)
+        """
+        self.result = result
+        self._chunks = chunks
+        self._degrade = degrade
+        self._reader = StringFieldReader("narrative")
+        self._text = []
+
+    @property
+    def nutrition(self) -> Dict[str, float]:
+        return self.result.nutrition
+
+    def _feed(self, text: str) -> str:
+        self._text.append(text)
+        return self._reader.feed(text)
+
+    def _finish(self) -> None:
+        self.result = self.result.with_response(parse_json_object("".join(self._text)))
+
+    def __iter__(self) -> Iterator[str]:
+        try:
+            for text in self._chunks:
+                narrative = self._feed(text)
+                if narrative:
+                    yield narrative
+        except BudgetExceeded:
+            if self._degrade is None:
+                raise
+            self.result = self._degrade(self.result)
+            return
+        finally:
+            # Also when the reader stops early: release the response stream now
+            if hasattr(self._chunks, "close"):
+                self._chunks.close()
+        self._finish()
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        try:
+            async for text in self._chunks:
+                narrative = self._feed(text)
+                if narrative:
+                    yield narrative
+        except BudgetExceeded:
+            if self._degrade is None:
+                raise
+            self.result = self._degrade(self.result)
+            return
+        finally:
+            if hasattr(self._chunks, "aclose"):
+                await self._chunks.aclose()
+        self._finish()
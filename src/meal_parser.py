@@ -0,0 +1,193 @@
+"""
+EatWise AI - Local Meal Parser
+Rule-based quantity / unit / food extraction for simple meal descriptions
+
+Descriptions like "150g chicken breast, 1 cup brown rice, 1 tbsp olive oil"
+name catalog foods with explicit portions, so the items can be read
+directly instead of asking the model. Every item gets a confidence score;
+the analyzer only calls the extraction completion when the meal's score
+(its weakest item) is below LOCAL_PARSER_MIN_CONFIDENCE.
+"""
+
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from nutrition_database import PORTION_MULTIPLIERS, match_food_name
+
+# Unit spellings mapped to PORTION_MULTIPLIERS keys
+UNIT_ALIASES = {
+    "grams": "g", "gr": "g", "ounces": "oz", "cups": "cup",
+    "tbsps": "tbsp", "tbs": "tbsp", "tablespoons": "tablespoon",
+    "tsps": "tsp", "teaspoons": "teaspoon", "slices": "slice",
+}
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "half": 0.5, "half a": 0.5,
+}
+
+PREPARATIONS = {
+    "grilled", "steamed", "fried", "roasted", "baked", "boiled", "raw", "scrambled", "poached",
+    "sauteed", "sautéed", "mashed", "toasted", "smoked", "braised", "stir-fried", "pan-fried",
+}
+
+# Words that do not change which food is meant
+MODIFIERS = {"fresh", "plain", "cooked", "lean", "boneless", "skinless", "organic", "some", "the", "of", "my"}
+
+# Grams per piece of catalog foods that are counted rather than measured;
+# a bare count of any other food ("3 rice") is left to the model
+PIECE_GRAMS = {
+    "eggs": 50, "egg white": 33, "chicken breast": 175, "chicken thigh": 115,
+    "banana": 118, "apple": 182, "orange": 131, "strawberry": 12, "blueberry": 0.7, "grape": 5,
+    "potato": 170, "sweet potato": 130, "tomato": 123, "carrot": 61, "onion": 110, "garlic": 3,
+    "bell pepper": 120, "cucumber": 300, "zucchini": 200,
+    "bread": 30, "whole wheat bread": 32,
+    "almonds": 1.2, "walnuts": 4, "peanuts": 1,
+}
+
+# Confidence factor of an item's portion: explicit unit, bare count ("2
+# eggs", read with PIECE_GRAMS), or no quantity at all (100 g assumed)
+UNIT_CONFIDENCE = 1.0
+COUNT_CONFIDENCE = 0.7
+NO_QUANTITY_CONFIDENCE = 0.3
+
+_SEPARATORS = re.compile(r"\s*(?:[,;+&\n]|\band\b|\bwith\b|\bplus\b)\s*")
+_QUANTITY = re.compile(
+    r"^(?P<quantity>\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?|½|(?:"
+    + "|".join(sorted((re.escape(word) for word in NUMBER_WORDS), key=len, reverse=True))
+    + r")\b)\s*(?P<rest>.*)$"
+)
+_UNIT = re.compile(
+    r"^(?P<unit>"
+    + "|".join(sorted((re.escape(unit) for unit in [*PORTION_MULTIPLIERS, *UNIT_ALIASES]), key=len, reverse=True))
+    + r")\.?\b\s*(?P<rest>.*)$"
+)
+_WORD = re.compile(r"[a-zé-]+")
+
+
+class ParsedMeal(NamedTuple):
+    """Items read from a meal description, with how sure the parser is"""
+    items: List[Dict]  # {"name", "quantity", "unit", "preparation"}, like an extraction
+    confidence: float  # Weakest item's confidence, 0 when nothing was parsed
+    item_confidence: Tuple[float, ...] = ()
+
+    def extraction(self, meal_description: str) -> Dict:
+        """The parse in the shape of the extraction completion's JSON"""
+        return {"items": self.items, "meal_description": meal_description}
+
+
+def _quantity(text: str) -> Optional[float]:
+    if text == "½":
+        return 0.5
+    if text in NUMBER_WORDS:
+        return float(NUMBER_WORDS[text])
+    if "/" in text:
+        whole, _, fraction = text.rpartition(" ")
+        numerator, denominator = fraction.split("/")
+        if float(denominator) == 0:
+            return None
+        return float(whole or 0) + float(numerator) / float(denominator)
+    return float(text)
+
+
+def parse_item(text: str) -> Tuple[Optional[Dict], float]:
+    """
+    Parse one item, e.g. "150g grilled chicken breast" or "1 cup of brown rice".
+
+    Args:
+        text: Lowercased item text
+
+    Returns:
+        (item dict or None, confidence 0-1)
+    """
+    quantity = None
+    unit = None
+    rest = text
+    match = _QUANTITY.match(rest)
+    if match:
+        quantity = _quantity(match.group("quantity"))
+        rest = match.group("rest")
+        unit_match = _UNIT.match(rest)
+        if unit_match:
+            unit = UNIT_ALIASES.get(unit_match.group("unit"), unit_match.group("unit"))
+            rest = unit_match.group("rest")
+
+    words = _WORD.findall(rest)
+    preparation = " ".join(word for word in words if word in PREPARATIONS)
+    words = [word for word in words if word not in PREPARATIONS]
+    if not words:
+        return None, 0.0
+
+    food, score = match_food_name(" ".join(words))
+    if score < 1.0:
+        # Retry without modifiers ("lean beef") and in singular ("carrots")
+        words = [word for word in words if word not in MODIFIERS] or words
+        for name in (" ".join(words), _singular(" ".join(words))):
+            candidate, candidate_score = match_food_name(name)
+            if candidate_score > score:
+                food, score = candidate, candidate_score
+    if food is None:
+        return None, 0.0
+
+    if quantity is None:
+        quantity, unit, portion = 100, "g", NO_QUANTITY_CONFIDENCE
+    elif unit is None:
+        # A count is only read for foods counted in pieces, and only when the
+        # word after it is part of the food ("12 almonds"), not a unit the
+        # parser does not know ("200 ml milk", "1 can tuna", "a bowl of rice")
+        first = next((word for word in words if word not in MODIFIERS), words[0])
+        if food.key not in PIECE_GRAMS or not _names_food(first, food.key):
+            return None, 0.0
+        quantity, unit, portion = round(quantity * PIECE_GRAMS[food.key], 1), "g", COUNT_CONFIDENCE
+    else:
+        portion = UNIT_CONFIDENCE
+    item = {"name": food.key, "quantity": quantity, "unit": unit, "preparation": preparation}
+    return item, score * portion
+
+
+def _names_food(word: str, key: str) -> bool:
+    """Whether a word is one of the food name's words (or their plural)"""
+    return any(word in (name, _singular(name) + "s", name + "s", name + "es") or _singular(word) == name
+               for name in key.split())
+
+
+def _singular(name: str) -> str:
+    if name.endswith("ies"):
+        return name[:-3] + "y"
+    if name.endswith("oes"):
+        return name[:-2]
+    if name.endswith("s") and not name.endswith("ss"):
+        return name[:-1]
+    return name
+
+
+def parse_meal(meal_description: str, partial: bool = False) -> ParsedMeal:
+    """
+    Parse a meal description into catalog items without a model call.
+
+    Args:
+        meal_description: Free-text meal, items separated by commas, "and",
+            "with", "+" or new lines
+        partial: Keep the parts that could be read when others could not
+            (best-effort items for a degraded result)
+
+    Returns:
+        ParsedMeal; its confidence is 0 if any part could not be read as a
+        known food
+    """
+    items = []
+    confidences = []
+    unread = False
+    for part in _SEPARATORS.split(meal_description.lower().strip()):
+        part = part.strip(" .!")
+        if not part:
+            continue
+        item, confidence = parse_item(part)
+        if item is None:
+            if not partial:
+                return ParsedMeal([], 0.0)
+            unread = True
+            continue
+        items.append(item)
+        confidences.append(confidence)
+    return ParsedMeal(items, 0.0 if unread else min(confidences, default=0.0), tuple(confidences))
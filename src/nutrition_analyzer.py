@@ -3,19 +3,319 @@ EatWise AI - Hybrid Nutrition Analyzer
 LLM-powered ingredient detection + Database-backed nutrition values
 """
 
-import json
+import asyncio
 import base64
+import json
 import re
-from typing import Dict, Optional, Tuple
-from openai import AzureOpenAI
+import sys
+import threading
+import time
+import weakref
+from collections import Counter
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar, Union
+from openai import AsyncAzureOpenAI
 import httpx
-from nutrition_database import find_food_matches, get_nutrition_for_portion, validate_nutrition_data
+from config import (
+    ANALYSIS_BUDGET_SECONDS,
+    BATCH_MAX_CONCURRENCY,
+    EXTRACTION_CACHE_MAX_ENTRIES,
+    EXTRACTION_CACHE_PATH,
+    EXTRACTION_CACHE_TTL_DAYS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_TIMEOUT,
+    IMAGE_CACHE_MAX_DISTANCE,
+    IMAGE_CACHE_MAX_ENTRIES,
+    LOCAL_MEAL_PARSER,
+    LOCAL_PARSER_MIN_CONFIDENCE,
+    LOCAL_SCORING,
+    REQUEST_COALESCING,
+    SINGLE_CALL_ANALYSIS,
+    STAGE_DEPLOYMENTS,
+    STREAMING_EXTRACTION,
+)
+from extraction_cache import ExtractionCache
+from health_score import HealthScore, MealScorer
+from image_cache import ImageDetectionCache, dhash
+from image_preprocessing import PreparedImage, prepare_image
+from latency_budget import BudgetExceeded, latency_budget, remaining, with_deadline, within_budget
+from meal_analysis import ArrayFieldReader, AnalysisStream, MealAnalysis, format_nutrition_facts, parse_json_object
+from meal_parser import parse_meal
+from nutrition_database import (
+    FoodMatch,
+    estimate_food,
+    get_nutrition_for_match,
+    get_nutrition_for_portions,
+    portion_multiplier,
+    resolve_food,
+    sum_portions,
+    to_nutrition_dict,
+    validate_nutrition_vector,
+)
+from rate_limiter import BATCH, INTERACTIVE, GatewayBusyError, GatewayScheduler, current_lane, estimate_tokens, priority_lane
+from resilience import LatencyTracker, ResilientCaller
+from single_flight import SingleFlight
+
+T = TypeVar("T")
+
+# Bump whenever the extraction / detection prompt changes, so cached results
+# made with the old prompt are no longer served
+EXTRACTION_PROMPT_VERSION = "1"
+DETECTION_PROMPT_VERSION = "1"
+
+# API versions before this reject response_format (JSON mode)
+JSON_MODE_MIN_API_VERSION = "2023-12-01"
+
+# Start of the analysis fields in a single-call response (see parse_items_prefix)
+_NARRATIVE_KEY = re.compile(r',\s*"narrative"\s*:')
+
+# Sampling settings of the extraction, the final analysis and a single-call analysis
+EXTRACTION_OPTIONS = {"temperature": 0.3, "max_tokens": 500}  # Low temperature for consistent JSON
+ANALYSIS_OPTIONS = {"temperature": 0.5, "max_tokens": 900}
+SINGLE_CALL_OPTIONS = {
+    "temperature": 0.4,  # Between detection (0.3) and analysis (0.5)
+    "max_tokens": 1300,  # Extraction (400-500) + analysis (900) budgets
+}
+
+# Parsed items below this confidence (no quantity, weak name match) are left
+# out of a degraded result rather than given a guessed portion
+DEGRADED_MIN_ITEM_CONFIDENCE = 0.5
+
+# Narrative of a degraded result whose items were not known in time
+DEGRADED_UNKNOWN_MEAL = ("The foods in this meal could not be identified in time. Please try again, "
+                         "or list them with portions (e.g. \"150g chicken breast, 1 cup rice\").")
+
+# Process-wide HTTP pools, event loop, rate limiter and analyzers (see
+# shared_http_client, shared_event_loop, shared_scheduler / get_shared_analyzer)
+_SHARED_LOCK = threading.Lock()
+_SHARED_HTTP_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_SHARED_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_SHARED_EXTRACTION_CACHE: Optional[ExtractionCache] = None
+_SHARED_IMAGE_CACHE: Optional[ImageDetectionCache] = None
+_SHARED_SCHEDULER: Optional[GatewayScheduler] = None
+_SHARED_ANALYZERS: Dict[Tuple, "NutritionAnalyzer"] = {}
+# Connection pool of the analyzers' template clients, which never send (see
+# NutritionAnalyzer.__init__); each loop's clients are copies on its own pool
+_TEMPLATE_HTTP_CLIENT: Optional[httpx.AsyncClient] = None
+
+# Default of the analyzer's cache arguments: use the process-wide cache
+# (None is taken, it disables the cache)
+SHARED_CACHE = object()
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        max_connections=HTTP_MAX_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def shared_http_client() -> httpx.AsyncClient:
+    """
+    Get the HTTP client of the running event loop (created on first use).
+    
+    An httpx.AsyncClient is bound to the loop it is used on. Blocking calls
+    all run on the shared event loop, so in practice every session and
+    analyzer shares one keepalive pool instead of opening new TCP+TLS
+    connections per request.
+    
+    Returns:
+        httpx.AsyncClient sized by the HTTP_* settings in config.py
+    """
+    loop = asyncio.get_running_loop()
+    with _SHARED_LOCK:
+        client = _SHARED_HTTP_CLIENTS.get(loop)
+        if client is None or client.is_closed:
+            client = _SHARED_HTTP_CLIENTS[loop] = httpx.AsyncClient(timeout=HTTP_TIMEOUT, limits=_pool_limits())
+        return client
+
+
+def _template_http_client() -> httpx.AsyncClient:
+    global _TEMPLATE_HTTP_CLIENT
+    with _SHARED_LOCK:
+        if _TEMPLATE_HTTP_CLIENT is None:
+            _TEMPLATE_HTTP_CLIENT = httpx.AsyncClient(timeout=HTTP_TIMEOUT)
+        return _TEMPLATE_HTTP_CLIENT
+
+
+def shared_extraction_cache() -> Optional[ExtractionCache]:
+    """
+    Get the process-wide extraction cache configured in config.py.
+    
+    Returns:
+        Shared ExtractionCache, or None when EXTRACTION_CACHE_PATH is empty
+    """
+    global _SHARED_EXTRACTION_CACHE
+    if not EXTRACTION_CACHE_PATH:
+        return None
+    with _SHARED_LOCK:
+        if _SHARED_EXTRACTION_CACHE is None:
+            _SHARED_EXTRACTION_CACHE = ExtractionCache(
+                EXTRACTION_CACHE_PATH,
+                ttl_seconds=EXTRACTION_CACHE_TTL_DAYS * 86400,
+                max_entries=EXTRACTION_CACHE_MAX_ENTRIES,
+            )
+        return _SHARED_EXTRACTION_CACHE
+
+
+def shared_image_cache() -> Optional[ImageDetectionCache]:
+    """
+    Get the process-wide image detection cache configured in config.py.
+    
+    Returns:
+        Shared ImageDetectionCache, or None when IMAGE_CACHE_MAX_ENTRIES is 0
+    """
+    global _SHARED_IMAGE_CACHE
+    if IMAGE_CACHE_MAX_ENTRIES <= 0:
+        return None
+    with _SHARED_LOCK:
+        if _SHARED_IMAGE_CACHE is None:
+            _SHARED_IMAGE_CACHE = ImageDetectionCache(IMAGE_CACHE_MAX_ENTRIES, IMAGE_CACHE_MAX_DISTANCE)
+        return _SHARED_IMAGE_CACHE
+
+
+def shared_scheduler() -> GatewayScheduler:
+    """
+    Get the process-wide gateway scheduler configured in config.py.
+    
+    Every session's completion calls draw from this one request/token
+    budget, since the Azure quota is per deployment, not per session.
+    
+    Returns:
+        Shared GatewayScheduler
+    """
+    global _SHARED_SCHEDULER
+    with _SHARED_LOCK:
+        if _SHARED_SCHEDULER is None:
+            _SHARED_SCHEDULER = GatewayScheduler()
+        return _SHARED_SCHEDULER
+
+
+def shared_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Get the process-wide event loop, running in a daemon thread.
+    
+    All blocking analyzer calls are executed on this one loop, so the
+    requests of every session are in flight concurrently on a single
+    async connection pool instead of each holding a thread.
+    
+    Returns:
+        Running event loop
+    """
+    global _SHARED_LOOP
+    with _SHARED_LOCK:
+        if _SHARED_LOOP is None or _SHARED_LOOP.is_closed():
+            _SHARED_LOOP = asyncio.new_event_loop()
+            threading.Thread(
+                target=_SHARED_LOOP.run_forever, name="eatwise-event-loop", daemon=True
+            ).start()
+        return _SHARED_LOOP
+
+
+def run_coroutine(coro: Awaitable[T]) -> T:
+    """
+    Run a coroutine on the shared event loop and wait for its result.
+    
+    Args:
+        coro: Coroutine to run
+        
+    Returns:
+        The coroutine's result (its exception is re-raised)
+    """
+    loop = shared_event_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("Blocking analyzer call made from the shared event loop; await the *_async method instead")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+def iterate_in_loop(chunks: AsyncIterator[T]) -> Iterator[T]:
+    """
+    Consume an async iterator living on the shared event loop from a
+    blocking caller (e.g. a Streamlit script thread).
+    
+    Args:
+        chunks: Async iterator created on the shared loop
+        
+    Yields:
+        Items of the async iterator as they arrive
+    """
+    iterator = chunks.__aiter__()
+    try:
+        while True:
+            try:
+                yield run_coroutine(iterator.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        # Closed early (e.g. the session went away): release the HTTP stream
+        # (unless the interpreter is exiting and the loop thread is gone)
+        if hasattr(iterator, "aclose") and not sys.is_finalizing():
+            run_coroutine(iterator.aclose())
+
+
+def parse_items_prefix(text: str) -> Optional[Dict]:
+    """
+    Parse the items of a single-call response that is still streaming.
+    
+    The model is asked for "items" and "meal_description" before the
+    analysis fields, so everything before the "narrative" key, closed with
+    "}", is already a complete JSON object.
+    
+    Args:
+        text: Response text received so far
+        
+    Returns:
+        Dict with "items" (and usually "meal_description"), or None while
+        the items are not complete
+    """
+    match = _NARRATIVE_KEY.search(text)
+    if match is None:
+        return None
+    data = parse_json_object(text[:match.start()] + "}")
+    return data if data is not None and "items" in data else None
+
+
+def get_shared_analyzer(api_key: str, endpoint: str = None, deployment: str = None,
+                        api_version: str = None) -> "NutritionAnalyzer":
+    """
+    Get the process-wide analyzer for a configuration, creating it once.
+    
+    Args:
+        api_key: Azure OpenAI API key
+        endpoint: Azure OpenAI endpoint
+        deployment: Deployment name
+        api_version: API version
+        
+    Returns:
+        NutritionAnalyzer shared by all callers with the same settings
+    """
+    key = (api_key, endpoint, deployment, api_version)
+    with _SHARED_LOCK:
+        analyzer = _SHARED_ANALYZERS.get(key)
+    if analyzer is None:
+        analyzer = NutritionAnalyzer(api_key, endpoint, deployment, api_version)
+        with _SHARED_LOCK:
+            analyzer = _SHARED_ANALYZERS.setdefault(key, analyzer)
+    return analyzer
 
 
 class NutritionAnalyzer:
     """Analyzes food using Azure OpenAI GPT-4 Vision and GPT-4 (HKUST endpoint)"""
     
-    def __init__(self, api_key: str, endpoint: str = None, deployment: str = None, api_version: str = None):
+    def __init__(self, api_key: str, endpoint: str = None, deployment: str = None, api_version: str = None,
+                 extraction_cache: Optional[ExtractionCache] = SHARED_CACHE,
+                 image_cache: Optional[ImageDetectionCache] = SHARED_CACHE, single_call: Optional[bool] = None,
+                 resilience: Optional[ResilientCaller] = None, scheduler: Optional[GatewayScheduler] = None,
+                 coalesce: Optional[bool] = None, local_parser: Optional[bool] = None,
+                 local_scoring: Optional[bool] = None, budget_seconds: Optional[float] = None,
+                 stage_deployments: Optional[Dict[str, str]] = None, stream_extraction: Optional[bool] = None):
         """Initialize with Azure OpenAI API key and endpoint
         
         Args:
@@ -23,6 +323,38 @@ class NutritionAnalyzer:
             endpoint: Azure OpenAI endpoint (defaults to HKUST)
             deployment: Deployment name (defaults to gpt-4o)
             api_version: API version (defaults to 2024-05-01-preview)
+            extraction_cache: Cache for parsed text-meal extractions (defaults
+                to the process-wide cache from shared_extraction_cache; None
+                disables caching)
+            image_cache: Cache for vision detections of near-identical photos
+                (defaults to the process-wide cache from shared_image_cache;
+                None disables caching)
+            single_call: Get items and advice from one completion instead of
+                two (defaults to SINGLE_CALL_ANALYSIS in config.py)
+            resilience: Retry / hedging / circuit breaker policy for completion
+                calls (defaults to one configured from config.py)
+            scheduler: Rate limiter for completion calls (defaults to the
+                process-wide one from shared_scheduler)
+            coalesce: Share one in-flight call between identical concurrent
+                text analyses / coaching requests (defaults to
+                REQUEST_COALESCING in config.py)
+            local_parser: Read simple text meals with the rule-based parser,
+                skipping the extraction call when it is confident enough
+                (defaults to LOCAL_MEAL_PARSER in config.py)
+            local_scoring: Rate and advise with the local health_score engine
+                instead of the analysis completion (defaults to LOCAL_SCORING
+                in config.py)
+            budget_seconds: Latency budget of each interactive analysis, across
+                all its completion calls; when it runs out a degraded result
+                is returned instead (defaults to ANALYSIS_BUDGET_SECONDS in
+                config.py, 0 disables it)
+            stage_deployments: Deployment per pipeline stage ("extraction",
+                "detection", "analysis", "single_call", "coaching"); other
+                stages, and calls that fail on their stage deployment, use
+                `deployment` (defaults to STAGE_DEPLOYMENTS in config.py)
+            stream_extraction: Stream the extraction completion and look up
+                each item as soon as it is complete (defaults to
+                STREAMING_EXTRACTION in config.py)
         """
         if not api_key:
             raise ValueError("Azure OpenAI API key is required. Please set AZURE_OPENAI_API_KEY in your .env file")
@@ -36,57 +368,276 @@ class NutritionAnalyzer:
         if self.endpoint and not self.endpoint.endswith("/"):
             self.endpoint += "/"
         
+        self.stage_deployments = dict(STAGE_DEPLOYMENTS if stage_deployments is None else stage_deployments)
+        self.stage_latencies: Dict[str, LatencyTracker] = {}
+        self.stage_calls: Counter = Counter()
+        self.stage_fallbacks: Counter = Counter()
+        
+        self.extraction_cache = shared_extraction_cache() if extraction_cache is SHARED_CACHE else extraction_cache
+        self.extraction_namespace = f"{self.deployment_for('extraction')}:extraction-v{EXTRACTION_PROMPT_VERSION}"
+        self.image_cache = shared_image_cache() if image_cache is SHARED_CACHE else image_cache
+        self.detection_namespace = f"{self.deployment_for('detection')}:detection-v{DETECTION_PROMPT_VERSION}"
+        self.single_call = SINGLE_CALL_ANALYSIS if single_call is None else single_call
+        self.resilience = resilience or ResilientCaller()
+        self.scheduler = scheduler or shared_scheduler()
+        self.in_flight = SingleFlight(REQUEST_COALESCING if coalesce is None else coalesce)
+        self.local_parser = LOCAL_MEAL_PARSER if local_parser is None else local_parser
+        self.local_parser_min_confidence = LOCAL_PARSER_MIN_CONFIDENCE
+        self.stream_extraction = STREAMING_EXTRACTION if stream_extraction is None else stream_extraction
+        self.local_scoring = LOCAL_SCORING if local_scoring is None else local_scoring
+        self.budget_seconds = ANALYSIS_BUDGET_SECONDS if budget_seconds is None else budget_seconds
+        
+        # Built here so a bad key, endpoint or API version fails at startup;
+        # requests go through its copies on each event loop's shared pool
         try:
-            # Create a custom httpx client with proper configuration
-            http_client = httpx.Client(
-                timeout=30.0,
-                limits=httpx.Limits(max_keepalive_connections=5, max_connections=10)
-            )
-            
-            self.client = AzureOpenAI(
-                api_key=api_key,
+            self._client_template = AsyncAzureOpenAI(
+                api_key=self.api_key,
                 api_version=self.api_version,
                 azure_endpoint=self.endpoint,
-                http_client=http_client
+                http_client=_template_http_client(),
+                max_retries=0  # Retried by self.resilience instead
             )
         except Exception as e:
-            error_msg = str(e)
-            # Print detailed debug info to logs
-            import sys
-            print(f"DEBUG: Endpoint: {self.endpoint}", file=sys.stderr)
-            print(f"DEBUG: API Version: {self.api_version}", file=sys.stderr)
-            print(f"DEBUG: Deployment: {self.deployment}", file=sys.stderr)
-            print(f"DEBUG: API Key length: {len(api_key) if api_key else 0}", file=sys.stderr)
-            print(f"DEBUG: Error: {error_msg}", file=sys.stderr)
-            
-            # Provide more specific error messages
-            if "invalid_request_error" in error_msg.lower() or "authentication" in error_msg.lower():
-                raise RuntimeError(f"Authentication failed. Please verify your AZURE_OPENAI_API_KEY is correct. Error: {error_msg}")
-            elif "endpoint" in error_msg.lower():
-                raise RuntimeError(f"Invalid endpoint. Configured endpoint: {self.endpoint}. Error: {error_msg}")
-            elif "api_version" in error_msg.lower() or "version" in error_msg.lower():
-                raise RuntimeError(f"Invalid API version '{self.api_version}'. Error: {error_msg}")
-            else:
-                raise RuntimeError(f"Failed to initialize Azure OpenAI client. Endpoint: {self.endpoint}, API Version: {self.api_version}. Error: {error_msg}")
-    
-    def detect_food_from_image(self, image_data: bytes, profile: Dict) -> str:
+            raise self._client_error(e) from e
+        
+        # Async clients are bound to the event loop they are used on: one per
+        # loop, created lazily on the loop's shared connection pool
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._async_lock = threading.Lock()
+    
+    def _client_error(self, e: Exception) -> RuntimeError:
+        """Readable error for an Azure OpenAI client that could not be created"""
+        error_msg = str(e)
+        # Print detailed debug info to logs
+        print(f"DEBUG: Endpoint: {self.endpoint}", file=sys.stderr)
+        print(f"DEBUG: API Version: {self.api_version}", file=sys.stderr)
+        print(f"DEBUG: Deployment: {self.deployment}", file=sys.stderr)
+        print(f"DEBUG: API Key length: {len(self.api_key) if self.api_key else 0}", file=sys.stderr)
+        print(f"DEBUG: Error: {error_msg}", file=sys.stderr)
+        
+        # Provide more specific error messages
+        if "invalid_request_error" in error_msg.lower() or "authentication" in error_msg.lower():
+            return RuntimeError(f"Authentication failed. Please verify your AZURE_OPENAI_API_KEY is correct. Error: {error_msg}")
+        elif "endpoint" in error_msg.lower():
+            return RuntimeError(f"Invalid endpoint. Configured endpoint: {self.endpoint}. Error: {error_msg}")
+        elif "api_version" in error_msg.lower() or "version" in error_msg.lower():
+            return RuntimeError(f"Invalid API version '{self.api_version}'. Error: {error_msg}")
+        else:
+            return RuntimeError(f"Failed to initialize Azure OpenAI client. Endpoint: {self.endpoint}, API Version: {self.api_version}. Error: {error_msg}")
+
+    def _async_clients_for_loop(self) -> Tuple[AsyncAzureOpenAI, httpx.AsyncClient]:
+        """Async OpenAI client and connection pool for the running event loop"""
+        loop = asyncio.get_running_loop()
+        http_client = shared_http_client()
+        with self._async_lock:
+            clients = self._async_clients.get(loop)
+            if clients is None or clients[1] is not http_client:
+                client = self._client_template.copy(http_client=http_client)
+                clients = self._async_clients[loop] = (client, http_client)
+        return clients
+    
+    def _async_client(self) -> AsyncAzureOpenAI:
+        return self._async_clients_for_loop()[0]
+    
+    def deployment_for(self, stage: str) -> str:
+        """Deployment a pipeline stage's completions are sent to first"""
+        return self.stage_deployments.get(stage) or self.deployment
+    
+    def stage_stats(self) -> Dict:
+        """
+        Per-stage completion stats, to compare stage deployments.
+        
+        Latencies cover the whole call as the pipeline sees it: queueing in
+        the scheduler, retries and any fallback to the primary deployment
+        (streams until their first chunk, under "<stage>-stream").
+        
+        Returns:
+            {stage: {"deployment", "calls", "fallbacks", "samples", "p50", "p95"}}
+        """
+        return {
+            key: {
+                "deployment": self.deployment_for(key.split("-stream")[0]),
+                "calls": self.stage_calls[key],
+                "fallbacks": self.stage_fallbacks[key],
+                "samples": len(tracker),
+                "p50": tracker.percentile(50),
+                "p95": tracker.percentile(95),
+            }
+            for key, tracker in list(self.stage_latencies.items())
+        }
+    
+    def warm_up(self) -> bool:
+        """
+        Open a pooled connection to the endpoint ahead of the first analysis,
+        so the DNS lookup and TCP+TLS handshake are not paid by a user request.
+
+        Returns:
+            True if the endpoint answered (any HTTP status), False otherwise
+        """
+        return run_coroutine(self.warm_up_async())
+    
+    async def warm_up_async(self) -> bool:
+        """Async version of warm_up, warming the pool of the running event loop"""
+        try:
+            await self._async_clients_for_loop()[1].head(self.endpoint)
+            return True
+        except httpx.HTTPError:
+            return False
+
+    def detect_food_from_image(self, image_data: Union[bytes, PreparedImage], profile: Dict,
+                               single_call: Optional[bool] = None, local_scoring: Optional[bool] = None) -> MealAnalysis:
+        """Blocking wrapper around detect_food_from_image_async (runs on the shared event loop)"""
+        return run_coroutine(self.detect_food_from_image_async(image_data, profile, single_call, local_scoring))
+    
+    async def detect_food_from_image_async(self, image_data: Union[bytes, PreparedImage], profile: Dict,
+                                           single_call: Optional[bool] = None,
+                                           local_scoring: Optional[bool] = None) -> MealAnalysis:
         """
         Detect food from image and provide hybrid nutrition analysis.
         Uses LLM to detect ingredients, then database for accurate nutrition values.
         
         Args:
-            image_data: Image bytes
+            image_data: Image bytes, or a PreparedImage from image_preprocessing.prepare_image
             profile: User profile (name, age_group, health_conditions, dietary_preferences, health_goal)
+            single_call: Detect and advise in one completion (defaults to self.single_call)
+            local_scoring: Rate and advise locally, without the analysis completion
+                (defaults to self.local_scoring)
             
         Returns:
-            Formatted markdown string with analysis
+            MealAnalysis with the detected items, database nutrition totals,
+            narrative, health rating and advice (locally computed and flagged
+            degraded if the latency budget ran out)
         """
+        analysis = None
         try:
-            # Convert image to base64
-            base64_image = base64.b64encode(image_data).decode('utf-8')
+            with latency_budget(self._request_budget()):
+                image, image_hash, detection_data = await self._cached_detection(image_data)
+                if self._use_local_scoring(local_scoring):
+                    return self._scored(await self._image_items(image, image_hash, detection_data), profile)
+                if detection_data is None and self._use_single_call(single_call):
+                    data = await self._complete_json(self._single_call_image_messages(image, profile), "single_call", **SINGLE_CALL_OPTIONS)
+                    detection_data = self._detection_part(data, "")
+                    self._remember_detection(image_hash, detection_data)
+                    return self._meal_analysis(detection_data, "").with_response(data)
+                
+                analysis, messages = await self._prepare_image_analysis(image, image_hash, detection_data, profile)
+                return analysis.with_response(await self._complete_json(messages, "analysis", **ANALYSIS_OPTIONS))
+        
+        except BudgetExceeded:
+            # Out of time: the detected items if detection finished, else none
+            return self._degraded(analysis or self._meal_analysis({}, ""), profile)
+        except GatewayBusyError:
+            raise
+        except Exception as e:
+            raise Exception(f"Image analysis error: {str(e)}") from e
+    
+    def detect_food_from_image_stream(self, image_data: Union[bytes, PreparedImage], profile: Dict,
+                                      single_call: Optional[bool] = None,
+                                      local_scoring: Optional[bool] = None) -> AnalysisStream:
+        """Blocking wrapper around detect_food_from_image_stream_async"""
+        analysis, chunks = run_coroutine(self._start_image_analysis(image_data, profile, single_call, local_scoring))
+        return AnalysisStream(analysis, iterate_in_loop(chunks), self._degrader(profile))
+    
+    async def detect_food_from_image_stream_async(self, image_data: Union[bytes, PreparedImage], profile: Dict,
+                                                  single_call: Optional[bool] = None,
+                                                  local_scoring: Optional[bool] = None) -> AnalysisStream:
+        """
+        Streaming version of detect_food_from_image.
+        
+        Detection and the database lookup finish before this returns, so the
+        nutrition totals can be shown while the analysis is still generating.
+        
+        Args:
+            image_data: Image bytes, or a PreparedImage from image_preprocessing.prepare_image
+            profile: User profile (name, age_group, health_conditions, dietary_preferences, health_goal)
+            single_call: Detect and advise in one completion (defaults to self.single_call)
+            local_scoring: Rate and advise locally, without the analysis completion
+                (defaults to self.local_scoring)
             
-            # Step 1: Use GPT-4 Vision to detect food items and portions
-            detection_prompt = """Analyze this food image and extract:
+        Returns:
+            AnalysisStream: nutrition totals now, narrative chunks while
+            iterating, the complete MealAnalysis in .result afterwards (a
+            degraded one if the latency budget runs out)
+        """
+        return AnalysisStream(*await self._start_image_analysis(image_data, profile, single_call, local_scoring),
+                              self._degrader(profile))
+    
+    async def _start_image_analysis(self, image_data: Union[bytes, PreparedImage], profile: Dict, single_call: Optional[bool],
+                                    local_scoring: Optional[bool]) -> Tuple[MealAnalysis, AsyncIterator[str]]:
+        """Items and nutrition of a photo, plus the raw analysis JSON stream"""
+        try:
+            with latency_budget(self._request_budget()):
+                image, image_hash, detection_data = await self._cached_detection(image_data)
+                if self._use_local_scoring(local_scoring):
+                    analysis = await self._image_items(image, image_hash, detection_data)
+                    return analysis, self._fixed_response(self._scored(analysis, profile))
+                if detection_data is None and self._use_single_call(single_call):
+                    return await self._stream_single_call(
+                        self._single_call_image_messages(image, profile), "",
+                        lambda detection_data: self._remember_detection(image_hash, detection_data),
+                        "Image analysis error",
+                    )
+                
+                analysis, messages = await self._prepare_image_analysis(image, image_hash, detection_data, profile)
+                return analysis, with_deadline(self._stream_completion(messages, "Image analysis error"))
+        except BudgetExceeded:
+            degraded = self._degraded(self._meal_analysis({}, ""), profile)
+            return degraded, self._fixed_response(degraded)
+        except GatewayBusyError:
+            raise
+        except Exception as e:
+            raise Exception(f"Image analysis error: {str(e)}") from e
+    
+    async def _cached_detection(self, image_data: Union[bytes, PreparedImage]) -> Tuple[PreparedImage, Optional[int], Optional[Dict]]:
+        """Prepare an image and look up the detection of a near-identical photo (None on a miss)"""
+        # Decode, orient and downsample once, off the event loop
+        if not isinstance(image_data, PreparedImage):
+            image_data = await asyncio.get_running_loop().run_in_executor(None, prepare_image, image_data)
+        
+        cache = self.image_cache
+        image_hash = dhash(image_data.data) if cache is not None else None
+        detection_data = cache.get(image_hash, self.detection_namespace) if cache is not None else None
+        return image_data, image_hash, detection_data
+    
+    def _remember_detection(self, image_hash: Optional[int], detection_data: Dict) -> None:
+        if self.image_cache is not None and detection_data.get("items"):
+            self.image_cache.put(image_hash, detection_data, self.detection_namespace)
+    
+    async def _prepare_image_analysis(self, image: PreparedImage, image_hash: Optional[int],
+                                      detection_data: Optional[Dict], profile: Dict) -> Tuple[MealAnalysis, list]:
+        """Detect items in an image (unless cached), total their nutrition and build the analysis prompt"""
+        analysis = await self._image_items(image, image_hash, detection_data)
+        
+        # Step 4: Generate personalized analysis with accurate nutrition values
+        return analysis, self._analysis_messages(analysis, profile)
+    
+    async def _image_items(self, image: PreparedImage, image_hash: Optional[int],
+                           detection_data: Optional[Dict]) -> MealAnalysis:
+        """Detect items in an image (unless cached) and total their nutrition"""
+        # Steps 1-2: detect food items, unless a near-identical photo was analyzed before
+        if detection_data is None:
+            detection_data = await self._detect_items(image)
+            self._remember_detection(image_hash, detection_data)
+        
+        # Step 3: Calculate nutrition using hybrid approach
+        return self._meal_analysis(detection_data, "")
+    
+    def _single_call_image_messages(self, image: PreparedImage, profile: Dict) -> list:
+        """Chat messages asking one vision completion for items and analysis"""
+        prompt = self._single_call_prompt("Analyze the food in this image and provide health guidance.", profile)
+        base64_image = base64.b64encode(image.data).decode('utf-8')
+        return self._single_call_messages([
+            {"type": "text", "text": prompt},
+            {"type": "image_url", "image_url": {"url": f"data:{image.mime_type};base64,{base64_image}"}},
+        ])
+    
+    async def _detect_items(self, image: PreparedImage) -> Dict:
+        """Ask the vision model for the food items and portions in a photo (parsed JSON)"""
+        # Convert image to base64
+        base64_image = base64.b64encode(image.data).decode('utf-8')
+        
+        # Step 1: Use GPT-4 Vision to detect food items and portions
+        detection_prompt = """Analyze this food image and extract:
 
 1. **Food Items**: List each food item with estimated portion (e.g., "150g chicken breast", "1 cup broccoli", "2 tbsp olive oil")
 2. **Preparation**: Note if grilled, fried, roasted, raw, etc.
@@ -99,94 +650,35 @@ Format as JSON:
     ],
     "meal_description": "brief description of the meal"
 }"""
-            
-            detection_response = self.client.chat.completions.create(
-                model=self.deployment,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": detection_prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}
-                            }
-                        ]
-                    }
-                ],
-                temperature=0.3,  # Lower temperature for more consistent detection
-                max_tokens=400
-            )
-            
-            # Step 2: Parse detected items and get nutrition from database
-            try:
-                detection_text = detection_response.choices[0].message.content
-                # Extract JSON from response
-                json_match = re.search(r'\{[\s\S]*\}', detection_text)
-                if json_match:
-                    detection_data = json.loads(json_match.group())
-                else:
-                    detection_data = {"items": [], "meal_description": ""}
-            except:
-                detection_data = {"items": [], "meal_description": ""}
-            
-            # Step 3: Calculate nutrition using hybrid approach
-            total_nutrition = self._calculate_hybrid_nutrition(detection_data.get("items", []))
-            meal_description = detection_data.get("meal_description", "")
-            
-            # Step 4: Generate personalized analysis with accurate nutrition values
-            context = self._build_profile_context(profile)
-            
-            # Format nutrition values for embedding in response
-            nutrition_section = f"""**Nutrition Facts**:
-- **Calories**: {int(total_nutrition['calories'])} cal
-- **Protein**: {total_nutrition['protein']}g
-- **Carbs**: {total_nutrition['carbs']}g
-- **Fat**: {total_nutrition['fat']}g
-- **Fiber**: {total_nutrition['fiber']}g
-- **Sodium**: {int(total_nutrition['sodium'])}mg
-- **Sugar**: {total_nutrition['sugar']}g"""
-            
-            analysis_prompt = f"""Based on this meal analysis, provide comprehensive health guidance:
-
-Meal: {meal_description}
-
-{nutrition_section}
-
-User Profile:
-{context}
-
-IMPORTANT: You must include the exact nutrition facts above in your response. Then provide:
-1. **Your Meal**: Description and food items
-2. Copy the Nutrition Facts section exactly as shown above
-3. **Analysis**: Interpretation of the nutrition values and meal quality
-4. **Health Rating**: Rate this meal 1-10 for overall healthiness
-5. **Personalized Advice**: Tips specific to their health goal and conditions
-
-Format with clear paragraphs and a "Health Rating: X/10" line."""
-            
-            final_response = self.client.chat.completions.create(
-                model=self.deployment,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a nutrition expert. You MUST include the Nutrition Facts section exactly as provided. Include the specific numbers without modification. Format your response as clear paragraphs."
-                    },
-                    {
-                        "role": "user",
-                        "content": analysis_prompt
-                    }
-                ],
-                temperature=0.5,  # Lower temperature for consistency
-                max_tokens=900
-            )
-            
-            return final_response.choices[0].message.content
         
-        except Exception as e:
-            raise Exception(f"Image analysis error: {str(e)}")
+        detection_data = await self._complete_json(
+            [
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": detection_prompt},
+                        {
+                            "type": "image_url",
+                            "image_url": {"url": f"data:{image.mime_type};base64,{base64_image}"}
+                        }
+                    ]
+                }
+            ],
+            "detection",
+            temperature=0.3,  # Lower temperature for more consistent detection
+            max_tokens=400
+        )
+        
+        # Step 2: Parsed detected items; nutrition comes from the database
+        return detection_data or {"items": [], "meal_description": ""}
+    
+    def analyze_text_meal(self, meal_description: str, profile: Dict, single_call: Optional[bool] = None,
+                          local_scoring: Optional[bool] = None) -> MealAnalysis:
+        """Blocking wrapper around analyze_text_meal_async (runs on the shared event loop)"""
+        return run_coroutine(self.analyze_text_meal_async(meal_description, profile, single_call, local_scoring))
     
-    def analyze_text_meal(self, meal_description: str, profile: Dict) -> str:
+    async def analyze_text_meal_async(self, meal_description: str, profile: Dict, single_call: Optional[bool] = None,
+                                      local_scoring: Optional[bool] = None) -> MealAnalysis:
         """
         Analyze meal from text description using hybrid approach.
         Extracts ingredients and portions, then uses database for accurate nutrition.
@@ -194,13 +686,264 @@ Format with clear paragraphs and a "Health Rating: X/10" line."""
         Args:
             meal_description: Text description of the meal
             profile: User profile (name, age_group, health_conditions, dietary_preferences, health_goal)
+            single_call: Extract and advise in one completion (defaults to self.single_call)
+            local_scoring: Rate and advise locally, without the analysis completion
+                (defaults to self.local_scoring)
+            
+        Returns:
+            MealAnalysis with the extracted items, database nutrition totals,
+            narrative, health rating and advice (locally computed and flagged
+            degraded if the latency budget ran out)
+        """
+        try:
+            single_call = self._use_single_call(single_call)
+            local_scoring = self._use_local_scoring(local_scoring)
+            # Identical requests already in flight (same meal, profile, mode) are joined
+            with latency_budget(self._request_budget()):
+                return await self.in_flight.run(
+                    self._text_analysis_key("text", meal_description, profile, single_call, local_scoring),
+                    lambda: self._analyze_text_meal(meal_description, profile, single_call, local_scoring),
+                )
+        
+        except GatewayBusyError:
+            raise
+        except Exception as e:
+            raise Exception(f"Meal analysis error: {str(e)}") from e
+    
+    async def _analyze_text_meal(self, meal_description: str, profile: Dict, single_call: bool,
+                                 local_scoring: bool) -> MealAnalysis:
+        extraction_data = self._known_extraction(meal_description)
+        analysis = None
+        try:
+            if local_scoring:
+                return self._scored(await self._text_items(meal_description, extraction_data), profile)
+            if extraction_data is None and single_call:
+                data = await self._complete_json(self._single_call_text_messages(meal_description, profile), "single_call", **SINGLE_CALL_OPTIONS)
+                extraction_data = self._detection_part(data, meal_description)
+                self._remember_extraction(meal_description, extraction_data)
+                return self._meal_analysis(extraction_data, meal_description).with_response(data)
+            
+            analysis, messages = await self._prepare_text_analysis(meal_description, extraction_data, profile)
+            return analysis.with_response(await self._complete_json(messages, "analysis", **ANALYSIS_OPTIONS))
+        except BudgetExceeded:
+            return self._degraded(analysis or self._fallback_text_analysis(meal_description), profile)
+    
+    def analyze_text_meal_stream(self, meal_description: str, profile: Dict, single_call: Optional[bool] = None,
+                                 local_scoring: Optional[bool] = None) -> AnalysisStream:
+        """Blocking wrapper around analyze_text_meal_stream_async"""
+        analysis, chunks = run_coroutine(self._start_text_analysis(meal_description, profile, single_call, local_scoring))
+        return AnalysisStream(analysis, iterate_in_loop(chunks), self._degrader(profile))
+    
+    async def analyze_text_meal_stream_async(self, meal_description: str, profile: Dict,
+                                             single_call: Optional[bool] = None,
+                                             local_scoring: Optional[bool] = None) -> AnalysisStream:
+        """
+        Streaming version of analyze_text_meal.
+        
+        Extraction and the database lookup finish before this returns, so the
+        nutrition totals can be shown while the analysis is still generating.
+        
+        Args:
+            meal_description: Text description of the meal
+            profile: User profile (name, age_group, health_conditions, dietary_preferences, health_goal)
+            single_call: Extract and advise in one completion (defaults to self.single_call)
+            local_scoring: Rate and advise locally, without the analysis completion
+                (defaults to self.local_scoring)
             
         Returns:
-            Formatted markdown string with analysis
+            AnalysisStream: nutrition totals now, narrative chunks while
+            iterating, the complete MealAnalysis in .result afterwards (a
+            degraded one if the latency budget runs out)
         """
+        return AnalysisStream(*await self._start_text_analysis(meal_description, profile, single_call, local_scoring),
+                              self._degrader(profile))
+    
+    async def _start_text_analysis(self, meal_description: str, profile: Dict, single_call: Optional[bool],
+                                   local_scoring: Optional[bool]) -> Tuple[MealAnalysis, AsyncIterator[str]]:
+        """Items and nutrition of a described meal, plus the raw analysis JSON stream"""
         try:
-            # Step 1: Use GPT to extract structured ingredient data
-            extraction_prompt = f"""Extract ingredients and portions from this meal description and format as JSON.
+            single_call = self._use_single_call(single_call)
+            local_scoring = self._use_local_scoring(local_scoring)
+            # Joiners of an identical in-flight request get the whole stream replayed
+            with latency_budget(self._request_budget()):
+                return await self.in_flight.stream(
+                    self._text_analysis_key("text-stream", meal_description, profile, single_call, local_scoring),
+                    lambda: self._open_text_analysis(meal_description, profile, single_call, local_scoring),
+                )
+        except GatewayBusyError:
+            raise
+        except Exception as e:
+            raise Exception(f"Meal analysis error: {str(e)}") from e
+    
+    async def _open_text_analysis(self, meal_description: str, profile: Dict, single_call: bool,
+                                  local_scoring: bool) -> Tuple[MealAnalysis, AsyncIterator[str]]:
+        extraction_data = self._known_extraction(meal_description)
+        try:
+            if local_scoring:
+                analysis = await self._text_items(meal_description, extraction_data)
+                return analysis, self._fixed_response(self._scored(analysis, profile))
+            if extraction_data is None and single_call:
+                return await self._stream_single_call(
+                    self._single_call_text_messages(meal_description, profile), meal_description,
+                    lambda extraction_data: self._remember_extraction(meal_description, extraction_data),
+                    "Meal analysis error",
+                )
+            
+            analysis, messages = await self._prepare_text_analysis(meal_description, extraction_data, profile)
+            return analysis, with_deadline(self._stream_completion(messages, "Meal analysis error"))
+        except BudgetExceeded:
+            degraded = self._degraded(self._fallback_text_analysis(meal_description), profile)
+            return degraded, self._fixed_response(degraded)
+    
+    def _text_analysis_key(self, kind: str, meal_description: str, profile: Dict, single_call: bool,
+                           local_scoring: bool) -> Tuple:
+        """Coalescing key: everything the prompts and the local scorer depend on"""
+        return (kind, meal_description, self._build_profile_context(profile), MealScorer.profile_key(profile),
+                single_call, local_scoring) + self._flight_scope()
+    
+    @staticmethod
+    def _flight_scope() -> Tuple:
+        """
+        Coalescing key part for the caller's lane and latency budget.
+        
+        A coalesced call runs with the context of whoever started it, so only
+        callers in the same lane, budgeted or not alike, may share one: a batch
+        request joining an interactive one would come back degraded, and an
+        interactive one joining a batch one would ignore its budget.
+        """
+        return current_lane(), remaining() is not None
+    
+    def analyze_meals(self, descriptions: Sequence[str], profile: Dict, max_concurrency: int = None,
+                      progress: Callable[[int, int], None] = None,
+                      single_call: Optional[bool] = None,
+                      local_scoring: Optional[bool] = None) -> List[Union[MealAnalysis, Exception]]:
+        """Blocking wrapper around analyze_meals_async (runs on the shared event loop)"""
+        return run_coroutine(self.analyze_meals_async(descriptions, profile, max_concurrency, progress,
+                                                      single_call, local_scoring))
+    
+    async def analyze_meals_async(self, descriptions: Sequence[str], profile: Dict, max_concurrency: int = None,
+                                  progress: Callable[[int, int], None] = None,
+                                  single_call: Optional[bool] = None,
+                                  local_scoring: Optional[bool] = None) -> List[Union[MealAnalysis, Exception]]:
+        """
+        Analyze many text meals concurrently (e.g. back-filling a food diary).
+        
+        At most max_concurrency analyses are in flight at once; a failing meal
+        does not affect the others.
+        
+        Args:
+            descriptions: Meal descriptions
+            profile: User profile shared by all meals
+            max_concurrency: Analyses in flight at once (defaults to BATCH_MAX_CONCURRENCY)
+            progress: Called as progress(completed, total) after each meal
+                finishes, on the event loop thread (keep it quick)
+            single_call: Extract and advise in one completion (defaults to self.single_call)
+            local_scoring: Rate and advise locally, without the analysis completion
+                (defaults to self.local_scoring)
+            
+        Returns:
+            One entry per description, in order: its MealAnalysis, or the
+            Exception it raised
+        """
+        total = len(descriptions)
+        semaphore = asyncio.Semaphore(max(1, max_concurrency or BATCH_MAX_CONCURRENCY))
+        completed = 0
+        
+        async def analyze(description: str) -> Union[MealAnalysis, Exception]:
+            nonlocal completed
+            async with semaphore:
+                try:
+                    result = await self.analyze_text_meal_async(description, profile, single_call, local_scoring)
+                except Exception as e:
+                    result = e
+            completed += 1
+            if progress is not None:
+                progress(completed, total)
+            return result
+        
+        # Behind interactive requests in the gateway scheduler
+        with priority_lane(BATCH):
+            return list(await asyncio.gather(*(analyze(description) for description in descriptions)))
+    
+    def _fallback_text_analysis(self, meal_description: str) -> MealAnalysis:
+        """
+        Best items known without a completion: cached or parsed, else the
+        parts the parser reads with enough confidence. Nothing is guessed for
+        the other parts; the result is marked partial instead.
+        """
+        extraction_data = self._known_extraction(meal_description)
+        if extraction_data is not None:
+            return self._meal_analysis(extraction_data, meal_description)
+        parsed = parse_meal(meal_description, partial=True)
+        items = [item for item, confidence in zip(parsed.items, parsed.item_confidence)
+                 if confidence >= DEGRADED_MIN_ITEM_CONFIDENCE]
+        analysis = self._meal_analysis({"items": items}, meal_description)
+        # confidence is 0 when some part of the meal was not read at all
+        skipped = parsed.confidence == 0 or len(items) < len(parsed.items)
+        return analysis._replace(partial=bool(items) and skipped)
+    
+    def _known_extraction(self, meal_description: str) -> Optional[Dict]:
+        """Extraction that needs no completion: a confident local parse, else a cached one"""
+        if self.local_parser:
+            parsed = parse_meal(meal_description)
+            if parsed.confidence >= self.local_parser_min_confidence:
+                return parsed.extraction(meal_description)
+        return self._cached_extraction(meal_description)
+    
+    def _cached_extraction(self, meal_description: str) -> Optional[Dict]:
+        """Extraction of a previously analyzed meal, or None"""
+        if self.extraction_cache is None:
+            return None
+        return self.extraction_cache.get(meal_description, self.extraction_namespace)
+    
+    def _remember_extraction(self, meal_description: str, extraction_data: Dict) -> None:
+        if self.extraction_cache is not None and extraction_data.get("items"):
+            self.extraction_cache.put(meal_description, extraction_data, self.extraction_namespace)
+    
+    async def _prepare_text_analysis(self, meal_description: str, extraction_data: Optional[Dict],
+                                     profile: Dict) -> Tuple[MealAnalysis, list]:
+        """Extract items from a description (unless cached), total their nutrition and build the analysis prompt"""
+        analysis = await self._text_items(meal_description, extraction_data)
+        
+        # Step 4: Generate personalized analysis
+        return analysis, self._analysis_messages(analysis, profile)
+    
+    async def _text_items(self, meal_description: str, extraction_data: Optional[Dict]) -> MealAnalysis:
+        """Extract items from a description (unless already known) and total their nutrition"""
+        # Steps 1-2: extract ingredients, unless this meal was extracted before
+        portions = None
+        if extraction_data is None:
+            # Shared with in-flight analyses of the same meal for other profiles
+            # (in the same lane and under a budget alike, see _flight_scope)
+            extraction_data, portions = await within_budget(self.in_flight.run(
+                ("extraction", meal_description) + self._flight_scope(),
+                lambda: self._extract_items(meal_description),
+            ))
+            self._remember_extraction(meal_description, extraction_data)
+        
+        # Step 3: Calculate nutrition using hybrid database approach
+        return self._meal_analysis(extraction_data, meal_description, portions)
+    
+    def _single_call_text_messages(self, meal_description: str, profile: Dict) -> list:
+        """Chat messages asking one completion for items and analysis"""
+        return self._single_call_messages(self._single_call_prompt(
+            f"Analyze this meal and provide health guidance.\n\nMeal: {meal_description}", profile
+        ))
+    
+    async def _extract_items(self, meal_description: str) -> Tuple[Dict, Optional[list]]:
+        """
+        Ask the model for the meal's ingredients and portions.
+        
+        With stream_extraction, each item is resolved against the catalog as
+        soon as the model has written it, overlapping the lookups with the
+        rest of the generation.
+        
+        Returns:
+            (parsed extraction, resolved portions of its items from
+            _resolve_portion, or None if they were not resolved while streaming)
+        """
+        # Step 1: Use GPT to extract structured ingredient data
+        extraction_prompt = f"""Extract ingredients and portions from this meal description and format as JSON.
 
 Meal: {meal_description}
 
@@ -214,90 +957,352 @@ For each ingredient, estimate the portion size. Format as:
 }}
 
 Common units: g, oz, cup, tbsp, tsp, slice, medium, small, large"""
-            
-            extraction_response = self.client.chat.completions.create(
-                model=self.deployment,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Extract structured ingredient data from meal descriptions. Always respond with valid JSON format."
-                    },
-                    {
-                        "role": "user",
-                        "content": extraction_prompt
-                    }
-                ],
-                temperature=0.3,  # Lower temperature for consistent JSON
-                max_tokens=500
-            )
-            
-            # Step 2: Parse extraction and get hybrid nutrition
-            try:
-                extraction_text = extraction_response.choices[0].message.content
-                json_match = re.search(r'\{[\s\S]*\}', extraction_text)
-                if json_match:
-                    extraction_data = json.loads(json_match.group())
-                else:
-                    extraction_data = {"items": [], "meal_description": meal_description}
-            except:
-                extraction_data = {"items": [], "meal_description": meal_description}
-            
-            # Step 3: Calculate nutrition using hybrid database approach
-            total_nutrition = self._calculate_hybrid_nutrition(extraction_data.get("items", []))
-            
-            # Step 4: Generate personalized analysis
-            context = self._build_profile_context(profile)
-            
-            # Format nutrition values for embedding in response
-            nutrition_section = f"""**Nutrition Facts**:
-- **Calories**: {int(total_nutrition['calories'])} cal
-- **Protein**: {total_nutrition['protein']}g
-- **Carbs**: {total_nutrition['carbs']}g
-- **Fat**: {total_nutrition['fat']}g
-- **Fiber**: {total_nutrition['fiber']}g
-- **Sodium**: {int(total_nutrition['sodium'])}mg
-- **Sugar**: {total_nutrition['sugar']}g"""
-            
-            analysis_prompt = f"""Based on this meal analysis, provide comprehensive health guidance:
+        
+        messages = [
+            {
+                "role": "system",
+                "content": "Extract structured ingredient data from meal descriptions. Always respond with valid JSON format."
+            },
+            {
+                "role": "user",
+                "content": extraction_prompt
+            }
+        ]
+        
+        portions = None
+        if self.stream_extraction:
+            extraction_data, portions = await self._stream_extraction(messages)
+        else:
+            extraction_data = await self._complete_json(messages, "extraction", **EXTRACTION_OPTIONS)
+        
+        # Step 2: Parsed extraction; nutrition comes from the database
+        return extraction_data or {"items": [], "meal_description": meal_description}, portions
+    
+    async def _stream_extraction(self, messages: list) -> Tuple[Optional[Dict], Optional[list]]:
+        """Stream an extraction, resolving each item as soon as it is complete"""
+        stream = await self._create_completion(
+            "extraction",
+            messages=messages,
+            stream=True,
+            **EXTRACTION_OPTIONS,
+            **self._json_mode_options()
+        )
+        chunks = self._completion_text(stream)
+        reader = ArrayFieldReader("items")
+        text, items, portions = [], [], []
+        try:
+            async for chunk in chunks:
+                text.append(chunk)
+                for item in reader.feed(chunk):
+                    if isinstance(item, dict):
+                        items.append(item)
+                        portions.append(self._resolve_portion(item))
+        finally:
+            await chunks.aclose()
+        
+        # The full parse stays authoritative (e.g. a fenced or repaired response)
+        extraction_data = parse_json_object("".join(text))
+        if extraction_data is None or extraction_data.get("items") != items:
+            return extraction_data, None
+        return extraction_data, portions
+    
+    def _meal_analysis(self, detection_data: Dict, default_description: str,
+                       portions: Optional[list] = None) -> MealAnalysis:
+        """MealAnalysis with the items and their database nutrition totals (no narrative yet)"""
+        items = detection_data.get("items") or []
+        return MealAnalysis(
+            items=items,
+            nutrition=self._calculate_hybrid_nutrition(items, portions),
+            meal_description=detection_data.get("meal_description") or default_description,
+        )
+    
+    @staticmethod
+    def _detection_part(data: Optional[Dict], default_description: str) -> Dict:
+        """Items part of a single-call response, in the shape of an extraction / detection"""
+        data = data or {}
+        return {
+            "items": data.get("items") or [],
+            "meal_description": data.get("meal_description") or default_description,
+        }
+    
+    def _analysis_messages(self, analysis: MealAnalysis, profile: Dict) -> list:
+        """Chat messages for the final analysis completion"""
+        context = self._build_profile_context(profile)
+        
+        analysis_prompt = f"""Based on this meal analysis, provide comprehensive health guidance:
 
-Meal: {extraction_data.get('meal_description', meal_description)}
+Meal: {analysis.meal_description}
 
-{nutrition_section}
+{format_nutrition_facts(analysis.nutrition)}
 
 User Profile:
 {context}
 
-IMPORTANT: You must include the exact nutrition facts above in your response. Then provide:
-1. **Your Meal**: Description of the food items
-2. Copy the Nutrition Facts section exactly as shown above
-3. **Analysis**: Interpretation of the values and meal quality
-4. **Health Rating**: Rate this meal 1-10 for overall healthiness
-5. **Personalized Recommendations**: Tips specific to their health goal and conditions
+Respond with a JSON object with these fields, in this order:
+{{
+    "narrative": "Interpretation of the nutrition values and meal quality, in clear paragraphs (markdown allowed; do not repeat the Nutrition Facts list)",
+    "rating": 7,
+    "advice": ["Tip specific to their health goal and conditions", "Another tip"]
+}}
 
-Format with clear paragraphs and a "Health Rating: X/10" line."""
+"rating" is an integer from 1 to 10 for overall healthiness. Give 2-4 advice tips, most important first."""
+        
+        return [
+            {
+                "role": "system",
+                "content": "You are a nutrition expert. The Nutrition Facts provided are exact; never change or contradict the numbers. Respond only with a JSON object."
+            },
+            {
+                "role": "user",
+                "content": analysis_prompt
+            }
+        ]
+    
+    def _json_mode_options(self) -> Dict:
+        """response_format for JSON-mode completions, if the API version supports it"""
+        if self.api_version[:10] >= JSON_MODE_MIN_API_VERSION:
+            return {"response_format": {"type": "json_object"}}
+        return {}
+    
+    async def _create_completion(self, stage: str, **params):
+        """
+        chat.completions.create through the gateway scheduler (rate limit,
+        priority lanes) and the resilience layer (retries, hedging, circuit
+        breaker). Streaming requests are retried but never hedged.
+        
+        A stage with its own deployment (stage_deployments) gets one attempt
+        there, with its own circuit breaker; if that fails the request is
+        sent to the primary deployment with the usual retries.
+        
+        Args:
+            stage: Pipeline stage, the latency bucket for hedging and stats
+            **params: Completion parameters (the deployment is added here)
             
-            final_response = self.client.chat.completions.create(
-                model=self.deployment,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a nutrition expert. You MUST include the Nutrition Facts section exactly as provided. Include the specific numbers without modification. Format your response as clear paragraphs."
-                    },
-                    {
-                        "role": "user",
-                        "content": analysis_prompt
-                    }
-                ],
-                temperature=0.5,  # Lower temperature for consistency
-                max_tokens=900
-            )
+        Returns:
+            The completion, or the stream for stream=True
             
-            return final_response.choices[0].message.content
+        Raises:
+            GatewayBusyError: The quota is exhausted for longer than this
+                request's lane may wait
+            BudgetExceeded: The request's latency budget ran out (queueing
+                and retries included)
+        """
+        stream = bool(params.get("stream"))
+        # Streams return at the first byte, so their latencies are kept apart
+        key = f"{stage}-stream" if stream else stage
+        
+        tokens = estimate_tokens(params["messages"], params.get("max_tokens", 0))
+        # Every attempt is charged: retries queue like new requests, hedges
+        # only go out when the quota has room for them right now
+        acquire = lambda: self.scheduler.acquire(tokens)
+        acquire_hedge = lambda: self.scheduler.try_acquire(tokens)
+        
+        async def send(deployment: str):
+            client = self._async_client()
+            if deployment == self.deployment:
+                return await self.resilience.call(
+                    lambda: client.chat.completions.create(model=deployment, **params),
+                    key=key,
+                    hedge=not stream,
+                    acquire=acquire,
+                    acquire_hedge=acquire_hedge,
+                )
+            return await self.resilience.call(
+                lambda: client.chat.completions.create(model=deployment, **params),
+                key=f"{key}@{deployment}",
+                hedge=not stream,
+                circuit=deployment,
+                max_attempts=1,  # The primary deployment is the retry
+                acquire=acquire,
+                acquire_hedge=acquire_hedge,
+            )
+        
+        async def route():
+            start = time.monotonic()
+            deployment = self.deployment_for(stage)
+            try:
+                response = await send(deployment)
+            except GatewayBusyError:
+                raise
+            except Exception:
+                if deployment == self.deployment:
+                    raise
+                self.stage_fallbacks[key] += 1
+                response = await send(self.deployment)
+            self.stage_latencies[key].record(time.monotonic() - start)
+            return response
         
+        self.stage_calls[key] += 1
+        self.stage_latencies.setdefault(key, LatencyTracker())
+        return await within_budget(route())
+    
+    async def _complete_json(self, messages: list, stage: str, temperature: float, max_tokens: int) -> Optional[Dict]:
+        """Run a completion that answers with a JSON object (None if unparseable)"""
+        response = await self._create_completion(
+            stage,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **self._json_mode_options()
+        )
+        return parse_json_object(response.choices[0].message.content or "")
+    
+    async def _stream_completion(self, messages: list, error_prefix: str) -> AsyncIterator[str]:
+        """Yield the final analysis JSON chunk by chunk as it is generated"""
+        try:
+            stream = await self._create_completion(
+                "analysis",
+                messages=messages,
+                stream=True,
+                **ANALYSIS_OPTIONS,
+                **self._json_mode_options()
+            )
+            async for text in self._completion_text(stream):
+                yield text
+        except (GatewayBusyError, BudgetExceeded):
+            raise
         except Exception as e:
-            raise Exception(f"Meal analysis error: {str(e)}")
+            raise Exception(f"{error_prefix}: {str(e)}") from e
+    
+    def _use_single_call(self, single_call: Optional[bool]) -> bool:
+        return self.single_call if single_call is None else single_call
+    
+    def _use_local_scoring(self, local_scoring: Optional[bool]) -> bool:
+        return self.local_scoring if local_scoring is None else local_scoring
+    
+    @staticmethod
+    def _health_score(analysis: MealAnalysis, profile: Dict) -> HealthScore:
+        """Rating, advice and templated narrative from the local scoring engine"""
+        return MealScorer(profile).score(analysis.nutrition, analysis.items)
+    
+    def _scored(self, analysis: MealAnalysis, profile: Dict) -> MealAnalysis:
+        return analysis.with_response(self._health_score(analysis, profile).response())
+    
+    @staticmethod
+    async def _fixed_response(analysis: MealAnalysis) -> AsyncIterator[str]:
+        """A finished analysis as a one-chunk analysis JSON stream (read by AnalysisStream)"""
+        yield json.dumps(analysis.to_response())
+    
+    def _request_budget(self) -> Optional[float]:
+        """Latency budget of a new request; bulk (batch lane) work may queue instead"""
+        return self.budget_seconds if current_lane() == INTERACTIVE else None
+    
+    def _degraded(self, analysis: MealAnalysis, profile: Dict) -> MealAnalysis:
+        """Database-only result of a request that ran out of latency budget"""
+        if analysis.items:
+            analysis = self._scored(analysis, profile)
+        else:
+            analysis = analysis._replace(narrative=DEGRADED_UNKNOWN_MEAL, rating=None, advice=())
+        return analysis._replace(degraded=True)
+    
+    def _degrader(self, profile: Dict) -> Callable[[MealAnalysis], MealAnalysis]:
+        return lambda analysis: self._degraded(analysis, profile)
+    
+    def _single_call_prompt(self, task: str, profile: Dict) -> str:
+        """Prompt asking for the items and the analysis in one JSON object"""
+        context = self._build_profile_context(profile)
+        return f"""{task}
+
+User Profile:
+{context}
+
+Respond with a JSON object with these fields, in this order:
+{{
+    "items": [
+        {{"name": "chicken breast", "quantity": 150, "unit": "g", "preparation": "grilled"}},
+        {{"name": "broccoli", "quantity": 1, "unit": "cup", "preparation": "roasted"}}
+    ],
+    "meal_description": "brief description of the meal",
+    "narrative": "Interpretation of the meal quality and nutritional balance, in clear paragraphs (markdown allowed)",
+    "rating": 7,
+    "advice": ["Tip specific to their health goal and conditions", "Another tip"]
+}}
+
+List each food item with its estimated portion (common units: g, oz, cup, tbsp,
+tsp, slice, medium, small, large). "rating" is an integer from 1 to 10 for
+overall healthiness. Give 2-4 advice tips, most important first. Do not list
+nutrient numbers: exact Nutrition Facts from our database are shown with
+your analysis."""
+    
+    def _single_call_messages(self, content) -> list:
+        """Chat messages for a single-call analysis (content: prompt text or multimodal parts)"""
+        return [
+            {
+                "role": "system",
+                "content": "You are a nutrition expert. Respond only with a JSON object, with the items before your analysis."
+            },
+            {
+                "role": "user",
+                "content": content
+            }
+        ]
+    
+    async def _stream_single_call(self, messages: list, default_description: str,
+                                  remember: Callable[[Dict], None], error_prefix: str) -> Tuple[MealAnalysis, AsyncIterator[str]]:
+        """
+        Start a single-call completion and read it until the items are complete.
+        
+        The nutrition totals are computed from the database as soon as the
+        items are known, so they can be shown while the analysis still streams.
+        
+        Args:
+            messages: Chat messages built by _single_call_messages
+            default_description: Meal description if the model gives none
+            remember: Called with the items part (to fill the caches)
+            error_prefix: Prefix for errors raised while streaming the analysis
+            
+        Returns:
+            (MealAnalysis with items and nutrition, async iterator of the
+            whole raw JSON response, including the part already read)
+        """
+        stream = await self._create_completion(
+            "single_call",
+            messages=messages,
+            stream=True,
+            **SINGLE_CALL_OPTIONS,
+            **self._json_mode_options()
+        )
+        chunks = with_deadline(self._completion_text(stream))
+        
+        head = ""
+        async for text in chunks:
+            head += text
+            data = parse_items_prefix(head)
+            if data is not None:
+                break
+        else:
+            # Items came after the analysis fields (or the stream ended early)
+            data = parse_json_object(head)
+        
+        detection_data = self._detection_part(data, default_description)
+        remember(detection_data)
+        
+        async def response() -> AsyncIterator[str]:
+            try:
+                yield head
+                async for text in chunks:
+                    yield text
+            except BudgetExceeded:
+                raise
+            except Exception as e:
+                raise Exception(f"{error_prefix}: {str(e)}") from e
+            finally:
+                await chunks.aclose()
+        
+        return self._meal_analysis(detection_data, default_description), response()
+    
+    @staticmethod
+    async def _completion_text(stream) -> AsyncIterator[str]:
+        async for chunk in stream:
+            # Azure may send chunks without choices (content filter results)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
     
     def get_personalized_coaching(self, topic: str, profile: Dict) -> str:
+        """Blocking wrapper around get_personalized_coaching_async (runs on the shared event loop)"""
+        return run_coroutine(self.get_personalized_coaching_async(topic, profile))
+    
+    async def get_personalized_coaching_async(self, topic: str, profile: Dict) -> str:
         """
         Generate personalized nutrition coaching tips.
         
@@ -309,10 +1314,22 @@ Format with clear paragraphs and a "Health Rating: X/10" line."""
             Formatted markdown string with coaching tips
         """
         try:
-            # Build personalization context
-            context = self._build_profile_context(profile)
-            
-            prompt = f"""Provide personalized nutrition coaching on this topic: {topic}
+            # Identical requests already in flight (same topic and profile) are joined
+            return await self.in_flight.run(
+                ("coaching", topic, self._build_profile_context(profile)) + self._flight_scope(),
+                lambda: self._coaching(topic, profile),
+            )
+        
+        except GatewayBusyError:
+            raise
+        except Exception as e:
+            raise Exception(f"Coaching generation error: {str(e)}") from e
+    
+    async def _coaching(self, topic: str, profile: Dict) -> str:
+        # Build personalization context
+        context = self._build_profile_context(profile)
+        
+        prompt = f"""Provide personalized nutrition coaching on this topic: {topic}
 
 User Profile:
 {context}
@@ -324,77 +1341,81 @@ Generate practical, actionable advice in paragraph format. Focus on:
 - Practical, easy-to-implement tips
 
 Make it conversational and encouraging."""
-            
-            response = self.client.chat.completions.create(
-                model=self.deployment,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a compassionate and knowledgeable nutrition coach. Provide personalized, actionable advice in an encouraging tone."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.8,
-                max_tokens=800
-            )
-            
-            return response.choices[0].message.content
         
-        except Exception as e:
-            raise Exception(f"Coaching generation error: {str(e)}")
+        response = await self._create_completion(
+            "coaching",
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are a compassionate and knowledgeable nutrition coach. Provide personalized, actionable advice in an encouraging tone."
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            temperature=0.8,
+            max_tokens=800
+        )
+        
+        return response.choices[0].message.content
     
-    def _calculate_hybrid_nutrition(self, items: list) -> Dict:
+    def _calculate_hybrid_nutrition(self, items: list, portions: Optional[list] = None) -> Dict:
         """
         Calculate total nutrition using hybrid database + estimation approach.
         Uses nutrition database for known foods, estimation for unknowns.
         
         Args:
             items: List of food items with quantity and unit
+            portions: The items already resolved by _resolve_portion (e.g.
+                while the extraction was streaming), in the same order
             
         Returns:
             Dictionary with total nutrition values
         """
-        total = {
-            "calories": 0,
-            "protein": 0,
-            "carbs": 0,
-            "fat": 0,
-            "fiber": 0,
-            "sodium": 0,
-            "sugar": 0
-        }
+        if portions is None or len(portions) != len(items):
+            portions = [self._resolve_portion(item) for item in items]
+        matches = [match for match, _ in portions]
+        multipliers = [multiplier for _, multiplier in portions]
+        
+        # Scale and sum the whole meal at once, then validate the total vector
+        total = validate_nutrition_vector(sum_portions(matches, multipliers))
         
-        for item in items:
-            food_name = item.get("name", "").lower()
-            quantity = item.get("quantity", 100)
-            unit = item.get("unit", "g")
+        return to_nutrition_dict(total)
+    
+    def _resolve_portion(self, item: Dict) -> Tuple[FoodMatch, float]:
+        """Food match and per-100g multiplier of one item"""
+        food_name = item.get("name", "")
+        
+        # Resolve once: database entry if known, category estimate otherwise
+        match = resolve_food(food_name) or self._estimate_match(food_name)
+        return match, portion_multiplier(item.get("quantity", 100), item.get("unit", "g"))
+    
+    def calculate_batch_nutrition(self, rows) -> Dict:
+        """
+        Calculate nutrition totals for many logged meals at once.
+        Same database + estimation approach as a single analysis, but with
+        each distinct food resolved once for the whole batch.
+        
+        Args:
+            rows: Iterable of (meal_id, food_name, quantity, unit)
             
-            # Try to find in database
-            matches = find_food_matches(food_name)
+        Returns:
+            Dictionary of meal_id -> total nutrition values
+        """
+        return get_nutrition_for_portions(rows, estimate=self._estimate_match)
+    
+    def _estimate_match(self, food_name: str) -> FoodMatch:
+        """
+        Estimate per-100g nutrition for foods not in database using heuristics.
+        
+        Args:
+            food_name: Name of the food
             
-            if matches:
-                # Use database nutrition values
-                nutrition = get_nutrition_for_portion(food_name, quantity, unit)
-                if nutrition:
-                    for nutrient in total:
-                        total[nutrient] += nutrition.get(nutrient, 0)
-            else:
-                # Fallback: estimate based on food category
-                estimated = self._estimate_nutrition(food_name, quantity, unit)
-                for nutrient in total:
-                    total[nutrient] += estimated.get(nutrient, 0)
-        
-        # Validate and correct total nutrition
-        total = validate_nutrition_data(total)
-        
-        # Round all values
-        for nutrient in total:
-            total[nutrient] = round(total[nutrient], 1)
-        
-        return total
+        Returns:
+            FoodMatch keyed by the estimated category, flagged as estimated
+        """
+        return estimate_food(food_name)
     
     def _estimate_nutrition(self, food_name: str, quantity: float, unit: str) -> Dict:
         """
@@ -408,53 +1429,7 @@ Make it conversational and encouraging."""
         Returns:
             Estimated nutrition dictionary
         """
-        # Base estimates per 100g based on food categories
-        estimates = {
-            "meat": {"calories": 200, "protein": 26, "carbs": 0, "fat": 10, "fiber": 0, "sodium": 80, "sugar": 0},
-            "fish": {"calories": 150, "protein": 20, "carbs": 0, "fat": 7, "fiber": 0, "sodium": 50, "sugar": 0},
-            "vegetable": {"calories": 40, "protein": 2, "carbs": 8, "fat": 0.3, "fiber": 2, "sodium": 30, "sugar": 2},
-            "fruit": {"calories": 60, "protein": 0.7, "carbs": 15, "fat": 0.2, "fiber": 2, "sodium": 5, "sugar": 10},
-            "grain": {"calories": 130, "protein": 4, "carbs": 28, "fat": 1, "fiber": 2, "sodium": 5, "sugar": 0.5},
-            "legume": {"calories": 140, "protein": 8, "carbs": 25, "fat": 1, "fiber": 6, "sodium": 10, "sugar": 1},
-            "dairy": {"calories": 150, "protein": 8, "carbs": 5, "fat": 8, "fiber": 0, "sodium": 200, "sugar": 4},
-            "oil": {"calories": 884, "protein": 0, "carbs": 0, "fat": 100, "fiber": 0, "sodium": 0, "sugar": 0},
-        }
-        
-        # Determine category based on food name keywords
-        category = "vegetable"  # Default
-        food_lower = food_name.lower()
-        
-        if any(x in food_lower for x in ["chicken", "beef", "pork", "meat", "turkey", "lamb", "steak"]):
-            category = "meat"
-        elif any(x in food_lower for x in ["fish", "salmon", "tuna", "cod", "shrimp", "seafood"]):
-            category = "fish"
-        elif any(x in food_lower for x in ["apple", "banana", "orange", "fruit", "berry", "grape"]):
-            category = "fruit"
-        elif any(x in food_lower for x in ["rice", "bread", "pasta", "grain", "cereal", "oat"]):
-            category = "grain"
-        elif any(x in food_lower for x in ["bean", "lentil", "chickpea", "legume", "pea"]):
-            category = "legume"
-        elif any(x in food_lower for x in ["cheese", "milk", "yogurt", "butter", "dairy"]):
-            category = "dairy"
-        elif any(x in food_lower for x in ["oil", "fat", "butter", "mayo"]):
-            category = "oil"
-        
-        # Get base estimate
-        base_nutrition = estimates[category].copy()
-        
-        # Convert quantity to grams
-        from nutrition_database import PORTION_MULTIPLIERS
-        unit_lower = unit.lower().strip()
-        multiplier = PORTION_MULTIPLIERS.get(unit_lower, 1/100)
-        grams = quantity * multiplier * 100
-        
-        # Apply portion size
-        portion_multiplier = grams / 100
-        result = {}
-        for nutrient, value in base_nutrition.items():
-            result[nutrient] = round(value * portion_multiplier, 1)
-        
-        return result
+        return get_nutrition_for_match(self._estimate_match(food_name), quantity, unit)
     
     def _build_profile_context(self, profile: Dict) -> str:
         """Build readable profile context for prompts"""
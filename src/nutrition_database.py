@@ -4,6 +4,28 @@ Comprehensive food nutrition database for accurate hybrid analysis
 Based on USDA and nutrition reference data
 """
 
+import re
+from typing import Callable, Dict, Hashable, Iterable, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from catalog_file import open_catalog
+from config import (
+    FUZZY_MATCH_THRESHOLD,
+    FUZZY_MATCHING,
+    FUZZY_WEAK_SUBSTRING_COVERAGE,
+    NUTRITION_BACKEND,
+    NUTRITION_CATALOG_PATH,
+    NUTRITION_SQLITE_PATH,
+)
+from food_catalog import NUTRIENTS, FoodCatalog, to_nutrition_dict
+from food_store import SQLiteFoodStore
+from fuzzy_matcher import FuzzyMatcher
+
+# Column positions used by the vector validation rules
+_CARBS = NUTRIENTS.index("carbs")
+_FIBER = NUTRIENTS.index("fiber")
+
 # Common foods with their nutrition values per 100g (standard serving)
 # Format: {food_name: {calories, protein_g, carbs_g, fat_g, fiber_g, sodium_mg, sugar_g}}
 NUTRITION_DATABASE = {
@@ -107,6 +129,177 @@ PORTION_MULTIPLIERS = {
     "slice": 1.0,  # Varies, estimate as 100g
 }
 
+class FoodMatch(NamedTuple):
+    """A resolved food: canonical key plus its per-100g nutrient vector"""
+    key: str
+    per_100g: np.ndarray  # float32 values in NUTRIENTS order
+    estimated: bool = False  # True for category estimates of unknown foods
+
+
+# Base estimates per 100g for foods not in the database, by category
+CATEGORY_ESTIMATES = {
+    "meat": {"calories": 200, "protein": 26, "carbs": 0, "fat": 10, "fiber": 0, "sodium": 80, "sugar": 0},
+    "fish": {"calories": 150, "protein": 20, "carbs": 0, "fat": 7, "fiber": 0, "sodium": 50, "sugar": 0},
+    "vegetable": {"calories": 40, "protein": 2, "carbs": 8, "fat": 0.3, "fiber": 2, "sodium": 30, "sugar": 2},
+    "fruit": {"calories": 60, "protein": 0.7, "carbs": 15, "fat": 0.2, "fiber": 2, "sodium": 5, "sugar": 10},
+    "grain": {"calories": 130, "protein": 4, "carbs": 28, "fat": 1, "fiber": 2, "sodium": 5, "sugar": 0.5},
+    "legume": {"calories": 140, "protein": 8, "carbs": 25, "fat": 1, "fiber": 6, "sodium": 10, "sugar": 1},
+    "dairy": {"calories": 150, "protein": 8, "carbs": 5, "fat": 8, "fiber": 0, "sodium": 200, "sugar": 4},
+    "oil": {"calories": 884, "protein": 0, "carbs": 0, "fat": 100, "fiber": 0, "sodium": 0, "sugar": 0},
+}
+
+# Name keywords per category, highest priority first: a name containing
+# keywords of several categories gets the earliest one ("chicken rice" is meat)
+CATEGORY_KEYWORDS = [
+    ("meat", ["chicken", "beef", "pork", "meat", "turkey", "lamb", "steak"]),
+    ("fish", ["fish", "salmon", "tuna", "cod", "shrimp", "seafood"]),
+    ("fruit", ["apple", "banana", "orange", "fruit", "berry", "grape"]),
+    ("grain", ["rice", "bread", "pasta", "grain", "cereal", "oat"]),
+    ("legume", ["bean", "lentil", "chickpea", "legume", "pea"]),
+    ("dairy", ["cheese", "milk", "yogurt", "butter", "dairy"]),
+    ("oil", ["oil", "fat", "butter", "mayo"]),
+]
+DEFAULT_CATEGORY = "vegetable"
+
+
+def _compile_category_matcher():
+    """One alternation regex over every keyword, plus keyword -> priority"""
+    priorities = {}
+    for priority, (_, keywords) in enumerate(CATEGORY_KEYWORDS):
+        for keyword in keywords:
+            priorities.setdefault(keyword, priority)
+    
+    # Longest keywords first so "chickpea" wins over "pea" at the same
+    # position; the lookahead reports overlapping hits in a single scan
+    alternation = "|".join(re.escape(k) for k in sorted(priorities, key=len, reverse=True))
+    return re.compile(f"(?=({alternation}))"), priorities
+
+
+_CATEGORY_PATTERN, _KEYWORD_PRIORITY = _compile_category_matcher()
+
+
+
+def _category_match(category: str, values: dict) -> FoodMatch:
+    vector = np.array([values[n] for n in NUTRIENTS], dtype=np.float32)
+    vector.setflags(write=False)
+    return FoodMatch(category, vector, estimated=True)
+
+
+# Preallocated read-only estimate per category, shared by every unknown food
+_CATEGORY_MATCHES = {c: _category_match(c, v) for c, v in CATEGORY_ESTIMATES.items()}
+
+
+def classify_food(food_name: str) -> str:
+    """
+    Guess the food category of a name that is not in the database.
+    
+    Args:
+        food_name: Name of the food
+        
+    Returns:
+        Category key of CATEGORY_ESTIMATES (DEFAULT_CATEGORY if no keyword matches)
+    """
+    best = len(CATEGORY_KEYWORDS)
+    for hit in _CATEGORY_PATTERN.finditer(food_name.lower()):
+        best = min(best, _KEYWORD_PRIORITY[hit.group(1)])
+        if best == 0:
+            break
+    return CATEGORY_KEYWORDS[best][0] if best < len(CATEGORY_KEYWORDS) else DEFAULT_CATEGORY
+
+
+def estimate_food(food_name: str) -> FoodMatch:
+    """
+    Estimate per-100g nutrition for a food not in the database.
+    
+    Args:
+        food_name: Name of the food
+        
+    Returns:
+        Shared FoodMatch keyed by the estimated category, flagged as estimated
+    """
+    return _CATEGORY_MATCHES[classify_food(food_name)]
+
+
+# Columnar catalog (float32 matrix + n-gram name index): a compiled catalog
+# file when configured, otherwise built from the database above
+if NUTRITION_CATALOG_PATH:
+    _CATALOG = open_catalog(NUTRITION_CATALOG_PATH)
+else:
+    _CATALOG = FoodCatalog.from_dict(NUTRITION_DATABASE)
+
+# Trigram matcher over _CATALOG names, built on the first lookup that
+# misses exact and substring matching
+_FUZZY: Optional[FuzzyMatcher] = None
+
+
+def rebuild_food_index() -> None:
+    """Rebuild the catalog and its name index after NUTRITION_DATABASE has been modified"""
+    global _CATALOG, _FUZZY
+    _CATALOG = FoodCatalog.from_dict(NUTRITION_DATABASE)
+    _FUZZY = None
+
+
+def load_catalog(path: str) -> None:
+    """
+    Switch all lookups to a compiled catalog file.
+    
+    Args:
+        path: File written by catalog_file.write_catalog (memory-mapped, not parsed)
+    """
+    global _CATALOG, _FUZZY
+    _CATALOG = open_catalog(path)
+    _FUZZY = None
+
+
+def _fuzzy_matcher() -> FuzzyMatcher:
+    global _FUZZY
+    if _FUZZY is None:
+        _FUZZY = FuzzyMatcher(_CATALOG.names)
+    return _FUZZY
+
+
+def fuzzy_match(food_name: str, threshold: float = FUZZY_MATCH_THRESHOLD) -> Tuple[int, float]:
+    """
+    Closest catalog row for a misspelled or variant food name.
+    
+    Args:
+        food_name: Lowercased, stripped food name
+        threshold: Minimum trigram cosine similarity (0-1)
+        
+    Returns:
+        (row, score), or (-1, score) when nothing is similar enough
+    """
+    return _fuzzy_matcher().best_match(food_name, threshold)
+
+
+def _coverage(name: str, food_name: str) -> float:
+    """Share of the longer of two names that a substring match between them covers"""
+    return min(len(name), len(food_name)) / max(len(name), len(food_name))
+
+
+# Optional alternative lookup backend (e.g. food_store.SQLiteFoodStore). When
+# set, it answers find_food_matches / resolve_food instead of _CATALOG; it
+# must provide find_food_matches(name) and resolve(name) -> (key, vector).
+_BACKEND = None
+
+
+def set_backend(backend) -> None:
+    """
+    Route food lookups through an alternative backend.
+    
+    Args:
+        backend: Backend object, or None to use the in-process catalog again
+    """
+    global _BACKEND
+    _BACKEND = backend
+
+
+if NUTRITION_BACKEND == "sqlite":
+    _BACKEND = SQLiteFoodStore(NUTRITION_SQLITE_PATH)
+    if not len(_BACKEND):
+        _BACKEND.upsert_foods(NUTRITION_DATABASE)
+
+
 def find_food_matches(food_name: str) -> list:
     """
     Find matching foods in database using fuzzy matching.
@@ -117,19 +310,144 @@ def find_food_matches(food_name: str) -> list:
     Returns:
         List of matching food names and their nutrition data
     """
+    if _BACKEND is not None:
+        return _BACKEND.find_food_matches(food_name)
+    
     food_name = food_name.lower().strip()
-    matches = []
+    index = _CATALOG.index
     
     # Exact match
-    if food_name in NUTRITION_DATABASE:
-        return [(food_name, NUTRITION_DATABASE[food_name])]
+    row = index.row_of(food_name)
+    if row >= 0:
+        return [(food_name, _CATALOG.food_dict(row))]
+    
+    # Substring matching (food name contains search term or vice versa),
+    # answered by the index in catalog order
+    rows = index.search(food_name)
+    
+    # Misspellings ("brocoli", "sweet potatos"): similar names above the
+    # threshold, best first, ahead of a substring match covering less
+    if FUZZY_MATCHING:
+        coverage = _coverage(_CATALOG.names[rows[0]], food_name) if rows else 0.0
+        if coverage < FUZZY_WEAK_SUBSTRING_COVERAGE:
+            closer = [
+                row for row, score in _fuzzy_matcher().top_k(food_name)
+                if score >= FUZZY_MATCH_THRESHOLD and score > coverage
+            ]
+            rows = closer + [row for row in rows if row not in closer]
+    
+    return [(_CATALOG.names[row], _CATALOG.food_dict(row)) for row in rows]
+
+
+def resolve_food(food_name: str) -> Optional[FoodMatch]:
+    """
+    Resolve a food name to its best database entry.
+    
+    Uses the same rules as find_food_matches (exact match, else the first
+    substring match unless it covers little of the name and the closest
+    fuzzy match scores higher, else that fuzzy match, or the top ranked
+    match of a backend) but stops at the first hit, so callers can resolve
+    a name once and reuse the handle for portion math.
+    
+    Args:
+        food_name: Name of food to search for
+        
+    Returns:
+        FoodMatch for the food, or None if it is not in the database
+    """
+    if _BACKEND is not None:
+        resolved = _BACKEND.resolve(food_name)
+        return FoodMatch(*resolved) if resolved else None
+    
+    food_name = food_name.lower().strip()
+    row = _CATALOG.resolve_row(food_name)
+    if FUZZY_MATCHING:
+        coverage = _coverage(_CATALOG.names[row], food_name) if row >= 0 else 0.0
+        if coverage < FUZZY_WEAK_SUBSTRING_COVERAGE:
+            fuzzy_row, score = fuzzy_match(food_name)
+            if fuzzy_row >= 0 and score > coverage:
+                row = fuzzy_row
+    if row < 0:
+        return None
+    
+    return FoodMatch(_CATALOG.names[row], _CATALOG.matrix[row])
+
+
+def match_food_name(food_name: str) -> Tuple[Optional[FoodMatch], float]:
+    """
+    Resolve a food name like resolve_food, and grade how well it matched.
+    
+    Args:
+        food_name: Name of food to search for
+        
+    Returns:
+        (FoodMatch, score): 1.0 for an exact catalog name; for a substring
+        match, the shorter name's share of the longer one ("salmon" for
+        "wild salmon" scores 6/11); the trigram similarity for a fuzzy
+        match. (None, 0.0) if the food is not in the database
+    """
+    food_name = food_name.lower().strip()
+    match = resolve_food(food_name)
+    if match is None:
+        return None, 0.0
+    if match.key == food_name:
+        return match, 1.0
+    if match.key in food_name or food_name in match.key:
+        return match, _coverage(match.key, food_name)
+    if _BACKEND is not None:
+        # Backend ranking (e.g. FTS5 token match) without a similarity score
+        return match, 0.5
+    _, score = fuzzy_match(food_name)
+    return match, score
+
+
+def portion_multiplier(quantity: float, unit: str = "g") -> float:
+    """
+    Convert a quantity and unit into a multiplier of the per-100g values.
+    
+    Args:
+        quantity: Amount of food
+        unit: Unit of measurement (g, oz, cup, tbsp, etc.)
+        
+    Returns:
+        Multiplier to apply to per-100g nutrition values
+    """
+    unit_lower = unit.lower().strip()
+    return quantity * PORTION_MULTIPLIERS.get(unit_lower, 1/100)  # Default to gram
+
+
+def get_nutrition_for_match(match: FoodMatch, quantity: float, unit: str = "g") -> dict:
+    """
+    Calculate nutrition values for a portion of an already resolved food.
+    
+    Args:
+        match: FoodMatch from resolve_food (or a category estimate)
+        quantity: Amount of food
+        unit: Unit of measurement (g, oz, cup, tbsp, etc.)
+        
+    Returns:
+        Dictionary with adjusted nutrition values for the portion
+    """
+    return to_nutrition_dict(match.per_100g * portion_multiplier(quantity, unit))
+
+
+def sum_portions(matches: Sequence[FoodMatch], multipliers: Sequence[float]) -> np.ndarray:
+    """
+    Scale a meal's resolved foods by their portions and sum them.
     
-    # Substring matching (food name contains search term or vice versa)
-    for db_food in NUTRITION_DATABASE:
-        if food_name in db_food or db_food in food_name:
-            matches.append((db_food, NUTRITION_DATABASE[db_food]))
+    Args:
+        matches: Resolved foods, one per meal item
+        multipliers: Per-100g multipliers from portion_multiplier, one per item
+        
+    Returns:
+        Meal total as a nutrient vector in NUTRIENTS order
+    """
+    if not matches:
+        return np.zeros(len(NUTRIENTS))
     
-    return matches
+    # One (items,) x (items, nutrients) multiply-and-reduce for the whole meal
+    vectors = np.stack([match.per_100g for match in matches])
+    return np.asarray(multipliers, dtype=np.float64) @ vectors
 
 
 def get_nutrition_for_portion(food_name: str, quantity: float, unit: str = "g") -> dict:
@@ -144,26 +462,69 @@ def get_nutrition_for_portion(food_name: str, quantity: float, unit: str = "g")
     Returns:
         Dictionary with adjusted nutrition values for the portion
     """
-    # Find the food in database
-    matches = find_food_matches(food_name)
-    if not matches:
+    match = resolve_food(food_name)
+    if match is None:
         return None
     
-    food_data = matches[0][1]  # Use first match
+    return get_nutrition_for_match(match, quantity, unit)
+
+
+def get_nutrition_for_portions(
+    items: Iterable[Tuple[Hashable, str, float, str]],
+    estimate: Optional[Callable[[str], FoodMatch]] = None,
+) -> Dict[Hashable, dict]:
+    """
+    Calculate validated nutrition totals for many meals in one pass.
+    
+    Each distinct food name and unit is resolved once for the whole batch,
+    then every row is scaled and summed into its meal with a segmented sum.
     
-    # Get portion multiplier
-    unit_lower = unit.lower().strip()
-    multiplier = PORTION_MULTIPLIERS.get(unit_lower, 1/100)  # Default to gram
+    Args:
+        items: Rows of (meal_id, food_name, quantity, unit)
+        estimate: Fallback for names not in the database, returning a
+            FoodMatch (e.g. NutritionAnalyzer._estimate_match). Unknown
+            foods contribute nothing when omitted.
+        
+    Returns:
+        Dictionary of meal_id -> nutrition totals, in first-seen meal order
+    """
+    meal_codes: Dict[Hashable, int] = {}
+    name_codes: Dict[str, int] = {}
+    unit_codes: Dict[str, int] = {}
+    rows_meal, rows_name, rows_unit, quantities = [], [], [], []
+    
+    for meal_id, food_name, quantity, unit in items:
+        rows_meal.append(meal_codes.setdefault(meal_id, len(meal_codes)))
+        rows_name.append(name_codes.setdefault(food_name.lower().strip(), len(name_codes)))
+        rows_unit.append(unit_codes.setdefault(unit.lower().strip(), len(unit_codes)))
+        quantities.append(quantity)
     
-    # Calculate actual multiplier based on quantity and unit
-    actual_multiplier = quantity * multiplier
+    if not meal_codes:
+        return {}
     
-    # Apply multiplier to all nutrition values
-    adjusted = {}
-    for nutrient, value in food_data.items():
-        adjusted[nutrient] = round(value * actual_multiplier, 1)
+    # Grouped resolution: one lookup per distinct food name and unit
+    per_100g = np.zeros((len(name_codes), len(NUTRIENTS)), dtype=np.float32)
+    for name, code in name_codes.items():
+        match = resolve_food(name)
+        if match is None and estimate is not None:
+            match = estimate(name)
+        if match is not None:
+            per_100g[code] = match.per_100g
+    unit_factors = np.array(
+        [PORTION_MULTIPLIERS.get(unit, 1/100) for unit in unit_codes], dtype=np.float64
+    )
     
-    return adjusted
+    # Scale every row, then segmented sum of rows into their meals
+    multipliers = np.asarray(quantities, dtype=np.float64) * unit_factors[rows_unit]
+    scaled = per_100g[rows_name] * multipliers[:, None]
+    rows_meal = np.asarray(rows_meal)
+    totals = np.column_stack([
+        np.bincount(rows_meal, weights=scaled[:, column], minlength=len(meal_codes))
+        for column in range(len(NUTRIENTS))
+    ])
+    
+    totals = validate_nutrition_vector(totals)
+    return {meal_id: to_nutrition_dict(totals[code]) for meal_id, code in meal_codes.items()}
 
 
 def validate_nutrition_data(nutrition_dict: dict) -> dict:
@@ -213,6 +574,27 @@ def validate_nutrition_data(nutrition_dict: dict) -> dict:
     return corrected
 
 
+def validate_nutrition_vector(vector: np.ndarray) -> np.ndarray:
+    """
+    Vector form of validate_nutrition_data for totals in NUTRIENTS order.
+    
+    Args:
+        vector: Nutrient vector, or a (meals x nutrients) matrix of totals
+        
+    Returns:
+        Corrected copy, rounded to 1 decimal
+    """
+    corrected = np.array(vector, dtype=np.float64)
+    carbs = corrected[..., _CARBS]
+    fiber = corrected[..., _FIBER]
+    
+    # If carbs is 0 but has vegetables, estimate carbs from fiber
+    missing_carbs = (carbs == 0) & (fiber > 0)
+    corrected[..., _CARBS] = np.where(missing_carbs, np.maximum(3, fiber * 2), carbs)
+    
+    return np.round(corrected, 1)
+
+
 def suggest_missing_nutrients(nutrition_dict: dict, confidence: float = 0.8) -> dict:
     """
     Suggest missing nutrient values based on macronutrient composition.
@@ -0,0 +1,307 @@
+"""
+EatWise AI - Gateway Rate Limiter
+Process-wide token buckets and priority lanes in front of completion calls
+
+Azure meters each deployment in requests and tokens per minute, counting a
+request's prompt plus its max_tokens as soon as it is accepted. Budgeting
+both here, before a request is sent, keeps a burst of sessions (or a bulk
+back-fill) under the quota instead of turning it into 429s for everyone.
+Interactive requests are always granted before batch ones, and a request
+that would wait too long is refused with GatewayBusyError.
+"""
+
+import asyncio
+import contextvars
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, Optional
+
+from config import (
+    GATEWAY_BATCH_MAX_WAIT,
+    GATEWAY_BURST_SECONDS,
+    GATEWAY_INTERACTIVE_MAX_WAIT,
+    GATEWAY_MAX_QUEUE_DEPTH,
+    GATEWAY_REQUESTS_PER_MINUTE,
+    GATEWAY_TOKENS_PER_MINUTE,
+)
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+# Highest priority first
+LANES = (INTERACTIVE, BATCH)
+
+# Rough prompt cost of one image part (a 768px-short-side photo is 4-6
+# 512px tiles at 170 tokens each, plus the base 85)
+IMAGE_PART_TOKENS = 1105
+
+# How often a queued request that is not at the head re-checks its turn
+_POLL_SECONDS = 0.01
+
+_LANE: contextvars.ContextVar = contextvars.ContextVar("gateway_lane", default=INTERACTIVE)
+
+
+class GatewayBusyError(RuntimeError):
+    """Raised instead of queueing a request that would wait too long"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@contextmanager
+def priority_lane(lane: str) -> Iterator[None]:
+    """
+    Run completion calls made inside the block (and tasks created in it) in a lane.
+
+    Args:
+        lane: INTERACTIVE (default for every call) or BATCH
+    """
+    if lane not in LANES:
+        raise ValueError(f"Unknown lane '{lane}'; expected one of {LANES}")
+    token = _LANE.set(lane)
+    try:
+        yield
+    finally:
+        _LANE.reset(token)
+
+
+def current_lane() -> str:
+    return _LANE.get()
+
+
+def estimate_tokens(messages: list, max_tokens: int = 0) -> int:
+    """
+    Tokens a completion request is charged against the quota.
+
+    Args:
+        messages: Chat messages (text or multimodal content)
+        max_tokens: Requested completion tokens (charged up front by Azure)
+
+    Returns:
+        Estimated prompt tokens (about 4 characters each) plus max_tokens
+    """
+    characters = 0
+    images = 0
+    for message in messages:
+        content = message.get("content") or ""
+        if isinstance(content, str):
+            characters += len(content)
+            continue
+        for part in content:
+            if part.get("type") == "image_url":
+                images += 1
+            else:
+                characters += len(part.get("text") or "")
+    # Each message also carries a few tokens of role/formatting overhead
+    return characters // 4 + 4 * len(messages) + images * IMAGE_PART_TOKENS + max_tokens
+
+
+class TokenBucket:
+    """Continuously refilling budget of `rate` units per second, holding at most `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available (after refill); 0 if it is now"""
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= min(amount, self.capacity)
+
+
+class GatewayScheduler:
+    """Admits completion calls within a request and token budget, by priority.
+
+    Requests queue per lane. The head of the highest-priority non-empty lane
+    is admitted as soon as both buckets hold enough; nothing from a lower
+    lane is admitted while a higher lane is waiting. A request whose
+    expected wait exceeds its lane's limit, or that finds the queue full,
+    fails immediately with GatewayBusyError.
+
+    Thread-safe: the Streamlit event loop and any other loops (tests, batch
+    scripts) share one scheduler.
+    """
+
+    def __init__(self, requests_per_minute: float = GATEWAY_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = GATEWAY_TOKENS_PER_MINUTE,
+                 burst_seconds: float = GATEWAY_BURST_SECONDS,
+                 max_queue_depth: int = GATEWAY_MAX_QUEUE_DEPTH,
+                 max_wait: Optional[Dict[str, float]] = None):
+        """Create a scheduler with full buckets
+
+        Args:
+            requests_per_minute: Request quota (0 = unlimited)
+            tokens_per_minute: Token quota (0 = unlimited)
+            burst_seconds: Bucket size in seconds of quota, i.e. the largest
+                burst admitted at once (Azure enforces its quota over short
+                windows, not per minute)
+            max_queue_depth: Requests waiting at once, all lanes together
+            max_wait: Longest expected wait per lane, in seconds (defaults
+                to GATEWAY_INTERACTIVE_MAX_WAIT / GATEWAY_BATCH_MAX_WAIT)
+        """
+        self.buckets = {
+            name: TokenBucket(per_minute / 60, max(1.0, per_minute / 60 * burst_seconds))
+            for name, per_minute in (("requests", requests_per_minute), ("tokens", tokens_per_minute))
+            if per_minute > 0
+        }
+        self.max_queue_depth = max_queue_depth
+        self.max_wait = {INTERACTIVE: GATEWAY_INTERACTIVE_MAX_WAIT, BATCH: GATEWAY_BATCH_MAX_WAIT}
+        self.max_wait.update(max_wait or {})
+        self._queues: Dict[str, Deque[int]] = {lane: deque() for lane in LANES}
+        self._tickets = itertools.count()
+        self._lock = threading.Lock()
+        self.granted = {lane: 0 for lane in LANES}
+        self.rejected = {lane: 0 for lane in LANES}
+        self.waited = {lane: 0.0 for lane in LANES}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.buckets)
+
+    def queue_depth(self, lane: Optional[str] = None) -> int:
+        """Requests currently waiting, in one lane or in all of them"""
+        with self._lock:
+            if lane is not None:
+                return len(self._queues[lane])
+            return sum(len(queue) for queue in self._queues.values())
+
+    async def acquire(self, tokens: int, lane: Optional[str] = None) -> float:
+        """
+        Wait until a request of `tokens` may be sent, and charge it.
+
+        Args:
+            tokens: Estimated tokens (see estimate_tokens)
+            lane: Priority lane (defaults to the one set with priority_lane)
+
+        Returns:
+            Seconds spent waiting
+
+        Raises:
+            GatewayBusyError: The queue is full or the expected wait exceeds
+                the lane's limit
+        """
+        lane = lane or current_lane()
+        if not self.enabled:
+            return 0.0
+        start = time.monotonic()
+        cost = {"requests": 1, "tokens": tokens}
+        with self._lock:
+            wait = self._expected_wait(lane, cost, start)
+            depth = sum(len(queue) for queue in self._queues.values())
+            if depth >= self.max_queue_depth or wait > self.max_wait[lane]:
+                self.rejected[lane] += 1
+                raise GatewayBusyError(
+                    f"The analysis service is busy ({depth} requests queued); "
+                    f"please try again in {max(1, round(wait))}s",
+                    retry_after=wait,
+                )
+            ticket = next(self._tickets)
+            self._queues[lane].append(ticket)
+        try:
+            while True:
+                with self._lock:
+                    delay = self._try_take(lane, ticket, cost)
+                    if delay == 0:
+                        self._queues[lane].popleft()
+                        waited = time.monotonic() - start
+                        self.granted[lane] += 1
+                        self.waited[lane] += waited
+                        return waited
+                await asyncio.sleep(delay)
+        except BaseException:
+            # Cancelled (or the loop is closing): give up the place in the queue
+            with self._lock:
+                if ticket in self._queues[lane]:
+                    self._queues[lane].remove(ticket)
+            raise
+
+    def try_acquire(self, tokens: int, lane: Optional[str] = None) -> bool:
+        """
+        Charge a request of `tokens` only if it may be sent right away.
+
+        For optional requests (hedges): nothing is queued, and nothing is
+        taken while requests of the same or a higher lane are waiting.
+
+        Args:
+            tokens: Estimated tokens (see estimate_tokens)
+            lane: Priority lane (defaults to the one set with priority_lane)
+
+        Returns:
+            Whether the request was charged and may be sent
+        """
+        lane = lane or current_lane()
+        if not self.enabled:
+            return True
+        cost = {"requests": 1, "tokens": tokens}
+        with self._lock:
+            if any(self._queues[l] for l in LANES[:LANES.index(lane) + 1]):
+                return False
+            now = time.monotonic()
+            for bucket in self.buckets.values():
+                bucket.refill(now)
+            if any(self.buckets[name].wait_time(cost[name]) > 0 for name in self.buckets):
+                return False
+            for name, bucket in self.buckets.items():
+                bucket.take(cost[name])
+            self.granted[lane] += 1
+            return True
+
+    def _try_take(self, lane: str, ticket: int, cost: Dict[str, float]) -> float:
+        """Charge the request if it is its turn and the budget allows (returns 0), else seconds to sleep"""
+        for higher in LANES[:LANES.index(lane)]:
+            if self._queues[higher]:
+                return _POLL_SECONDS
+        if self._queues[lane][0] != ticket:
+            return _POLL_SECONDS
+        now = time.monotonic()
+        for bucket in self.buckets.values():
+            bucket.refill(now)
+        delay = max(self.buckets[name].wait_time(cost[name]) for name in self.buckets)
+        if delay > 0:
+            return delay
+        for name, bucket in self.buckets.items():
+            bucket.take(cost[name])
+        return 0.0
+
+    def _expected_wait(self, lane: str, cost: Dict[str, float], now: float) -> float:
+        """Seconds until a new request in `lane` would be admitted (its own and queued requests' cost)"""
+        ahead = [l for l in LANES[:LANES.index(lane) + 1] if self._queues[l]]
+        queued = sum(len(self._queues[l]) for l in ahead)
+        wait = 0.0
+        for name, bucket in self.buckets.items():
+            bucket.refill(now)
+            # Queued requests are costed like this one
+            needed = cost[name] * (queued + 1) - bucket.level
+            wait = max(wait, needed / bucket.rate if needed > 0 else 0.0)
+        return wait
+
+    def stats(self) -> Dict:
+        """Queue depth, grants, rejections and mean wait per lane, and bucket levels"""
+        with self._lock:
+            now = time.monotonic()
+            for bucket in self.buckets.values():
+                bucket.refill(now)
+            return {
+                "queue_depth": {lane: len(queue) for lane, queue in self._queues.items()},
+                "granted": dict(self.granted),
+                "rejected": dict(self.rejected),
+                "mean_wait": {
+                    lane: self.waited[lane] / self.granted[lane] if self.granted[lane] else 0.0
+                    for lane in LANES
+                },
+                "available": {name: bucket.level for name, bucket in self.buckets.items()},
+            }
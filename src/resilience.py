@@ -0,0 +1,383 @@
+"""
+EatWise AI - Resilient Completion Calls
+Jittered retries, hedged requests and a circuit breaker around Azure calls
+
+The gateway's tail latency comes from occasional slow or rate-limited
+(429) responses. Retrying with backoff (honoring Retry-After), racing a
+duplicate request once a call is slower than usual, and failing fast while
+the endpoint is down trims p99 without adding load when things are healthy.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+import httpx
+import openai
+
+from config import (
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_SECONDS,
+    HEDGE_MAX_RATIO,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_PERCENTILE,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_ATTEMPTS,
+    RETRY_MAX_DELAY,
+)
+
+T = TypeVar("T")
+
+# HTTP statuses worth another attempt: timeouts, conflicts, rate limits, server errors
+RETRYABLE_STATUSES = {408, 409, 429}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an endpoint that keeps failing"""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Whether a failed call may succeed if simply tried again.
+
+    Args:
+        error: Exception raised by the OpenAI client (or httpx)
+
+    Returns:
+        True for timeouts, connection errors, 408/409/429 and 5xx responses
+    """
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError,
+                          httpx.TimeoutException, httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUSES or error.status_code >= 500
+    return False
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """
+    Delay the server asked for before retrying (retry-after-ms / Retry-After).
+
+    Args:
+        error: Exception raised by the OpenAI client
+
+    Returns:
+        Seconds to wait, or None if the response had no usable header
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            # HTTP-date form
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base_delay: float = RETRY_BASE_DELAY, max_delay: float = RETRY_MAX_DELAY,
+                  rng: random.Random = None) -> float:
+    """
+    Full-jitter exponential backoff: uniform in [0, min(max_delay, base * 2^attempt)].
+
+    Args:
+        attempt: Number of attempts already failed, minus one (0 for the first retry)
+        base_delay: Upper bound of the first delay
+        max_delay: Cap on the upper bound
+        rng: Random source (defaults to the module's)
+
+    Returns:
+        Seconds to sleep
+    """
+    return (rng or random).uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+class LatencyTracker:
+    """Sliding window of recent call latencies, for hedging thresholds"""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Latency below which `percent`% of the window falls (None if empty)"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, max(0, round(percent / 100 * len(samples)) - 1))
+        return samples[index]
+
+
+class CircuitBreaker:
+    """Stops calls to an endpoint after consecutive failures.
+
+    Closed: calls pass. After failure_threshold consecutive failures it
+    opens and calls fail immediately with CircuitOpenError. After
+    reset_seconds one probe call is let through (half-open): success closes
+    the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_seconds: float = CIRCUIT_RESET_SECONDS):
+        """Create a closed breaker
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit (0 disables)
+            reset_seconds: Time open before a probe call is allowed
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may go out now"""
+        with self._lock:
+            if self.opened_at is None:
+                return
+            remaining = self.reset_seconds - (time.monotonic() - self.opened_at)
+            if remaining <= 0 and not self._probing:
+                self._probing = True
+                return
+        raise CircuitOpenError(
+            f"Azure OpenAI endpoint unavailable after {self.failures} consecutive failures; "
+            f"retrying in {max(remaining, 0):.0f}s"
+        )
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._probing or (self.failure_threshold > 0 and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+    def record_cancel(self) -> None:
+        """A call was cancelled before the endpoint answered: a probe leaves the circuit open, uncounted"""
+        with self._lock:
+            if self._probing:
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+class ResilientCaller:
+    """Runs completion calls with retries, hedging and a circuit breaker.
+
+    Latencies are tracked per key (e.g. pipeline stage), since extraction and
+    the final analysis have very different normal response times. Calls to
+    other deployments than the primary one can be given their own named
+    circuit, so one failing deployment does not stop calls to the others.
+    """
+
+    def __init__(self, max_attempts: int = RETRY_MAX_ATTEMPTS, base_delay: float = RETRY_BASE_DELAY,
+                 max_delay: float = RETRY_MAX_DELAY, hedge_percentile: float = HEDGE_PERCENTILE,
+                 hedge_min_samples: int = HEDGE_MIN_SAMPLES, hedge_max_ratio: float = HEDGE_MAX_RATIO,
+                 breaker: Optional[CircuitBreaker] = None, rng: random.Random = None):
+        """Create a caller
+
+        Args:
+            max_attempts: Attempts per call, including the first
+            base_delay: First backoff delay bound (seconds)
+            max_delay: Longest backoff; a longer Retry-After is not waited for
+            hedge_percentile: Latency percentile after which a duplicate
+                request is sent (0 disables hedging)
+            hedge_min_samples: Latencies recorded for a key before it is hedged
+            hedge_max_ratio: Largest fraction of calls that may be hedged
+            breaker: Circuit breaker (defaults to one from config)
+            rng: Random source for jitter
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_max_ratio = hedge_max_ratio
+        self.breaker = breaker or CircuitBreaker()
+        self.rng = rng or random.Random()
+        self.latencies: Dict[str, LatencyTracker] = {}
+        self.circuits: Dict[str, CircuitBreaker] = {}
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def latency(self, key: str) -> LatencyTracker:
+        tracker = self.latencies.get(key)
+        if tracker is None:
+            tracker = self.latencies.setdefault(key, LatencyTracker())
+        return tracker
+
+    def circuit(self, name: str) -> CircuitBreaker:
+        """Breaker of a named endpoint, created like the primary one on first use"""
+        breaker = self.circuits.get(name)
+        if breaker is None:
+            breaker = self.circuits.setdefault(
+                name, CircuitBreaker(self.breaker.failure_threshold, self.breaker.reset_seconds)
+            )
+        return breaker
+
+    def hedge_delay(self, key: str) -> Optional[float]:
+        """Seconds after which a call for `key` gets a duplicate, or None"""
+        tracker = self.latency(key)
+        if self.hedge_percentile <= 0 or len(tracker) < self.hedge_min_samples:
+            return None
+        if self.hedges >= self.hedge_max_ratio * self.calls:
+            return None
+        return tracker.percentile(self.hedge_percentile)
+
+    async def call(self, request: Callable[[], Awaitable[T]], key: str = "default", hedge: bool = True,
+                   circuit: Optional[str] = None, max_attempts: Optional[int] = None,
+                   acquire: Optional[Callable[[], Awaitable]] = None,
+                   acquire_hedge: Optional[Callable[[], bool]] = None) -> T:
+        """
+        Run a request with retries, optional hedging and the circuit breaker.
+
+        Args:
+            request: Function starting one attempt (called once per attempt / hedge)
+            key: Latency bucket, e.g. the pipeline stage
+            hedge: Whether a slow attempt may be duplicated (idempotent,
+                non-streaming requests only)
+            circuit: Named breaker to use instead of the primary one (see circuit())
+            max_attempts: Attempts for this call (defaults to the caller's)
+            acquire: Awaited before each attempt, e.g. to wait for and take
+                rate-limit budget (its errors end the call)
+            acquire_hedge: Takes a hedge's budget if it is available right
+                away; a slow attempt is not hedged when it returns False
+
+        Returns:
+            The first successful attempt's result
+
+        Raises:
+            CircuitOpenError: The endpoint is failing and not yet due for a probe
+            Exception: The last attempt's error, or a non-retryable error
+        """
+        breaker = self.breaker if circuit is None else self.circuit(circuit)
+        attempts = self.max_attempts if max_attempts is None else max(1, max_attempts)
+        self.calls += 1
+        for attempt in range(attempts):
+            if acquire is not None:
+                await acquire()
+            breaker.before_call()
+            try:
+                result = await self._attempt(request, key, hedge, acquire_hedge)
+            except asyncio.CancelledError:
+                # E.g. the latency budget ran out; says nothing about the endpoint
+                breaker.record_cancel()
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    # The endpoint answered; the request itself was bad
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                delay = self._retry_delay(attempt, e)
+                if attempt + 1 >= attempts or delay is None:
+                    raise
+                self.retries += 1
+                await asyncio.sleep(delay)
+            else:
+                breaker.record_success()
+                return result
+
+    def _retry_delay(self, attempt: int, error: BaseException) -> Optional[float]:
+        """Backoff before the next attempt; None if the server asks for too long a wait"""
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_delay else None
+        return backoff_delay(attempt, self.base_delay, self.max_delay, self.rng)
+
+    async def _attempt(self, request: Callable[[], Awaitable[T]], key: str, hedge: bool,
+                       acquire_hedge: Optional[Callable[[], bool]]) -> T:
+        start = time.monotonic()
+        delay = self.hedge_delay(key) if hedge else None
+        primary = asyncio.ensure_future(request())
+        if delay is None:
+            result = await primary
+        else:
+            try:
+                done, _ = await asyncio.wait({primary}, timeout=delay)
+            except asyncio.CancelledError:
+                primary.cancel()
+                raise
+            if done:
+                result = primary.result()
+            elif acquire_hedge is not None and not acquire_hedge():
+                # No budget to spare for a duplicate: wait for the slow attempt
+                result = await primary
+            else:
+                self.hedges += 1
+                result = await self._first_success(primary, asyncio.ensure_future(request()))
+        self.latency(key).record(time.monotonic() - start)
+        return result
+
+    async def _first_success(self, primary: "asyncio.Future[T]", backup: "asyncio.Future[T]") -> T:
+        """Result of whichever request succeeds first; the other is cancelled"""
+        pending = {primary, backup}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict:
+        """Call, retry and hedge counters, breaker states and per-key p50/p95 latency"""
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "circuit": self.breaker.state,
+            "circuits": {name: breaker.state for name, breaker in self.circuits.items()},
+            "latency": {
+                key: {
+                    "samples": len(tracker),
+                    "p50": tracker.percentile(50),
+                    "p95": tracker.percentile(95),
+                }
+                for key, tracker in self.latencies.items()
+            },
+        }
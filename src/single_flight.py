@@ -0,0 +1,178 @@
+"""
+EatWise AI - Request Coalescing
+Single-flight execution of identical in-flight analyses
+
+When several sessions submit the same meal or coaching request at the same
+moment (a classroom demo, a shared link), only the first one calls the
+gateway; the others wait on its in-flight task and receive the same result.
+Nothing is kept once the call finishes, so this is not a cache: a request
+made after the first one completed runs again.
+"""
+
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+def _mark_retrieved(task: asyncio.Task) -> None:
+    # Every caller may have left (e.g. timed out) before the shared call
+    # failed; its error is theirs to see, not an unretrieved-exception warning
+    if not task.cancelled():
+        task.exception()
+
+
+class SharedStream:
+    """Fans one async text stream out to any number of subscribers.
+
+    The source is read by a background task; every subscriber receives all
+    chunks from the start, however late it subscribes. If every subscriber
+    stops early, the source is closed.
+    """
+
+    def __init__(self, source: AsyncIterator[str], on_finish: Callable[[], None] = None):
+        """Start reading the source on the running event loop
+
+        Args:
+            source: Async iterator of text chunks
+            on_finish: Called once the source is exhausted, fails or is closed
+        """
+        self._source = source
+        self._on_finish = on_finish
+        self._chunks: List[str] = []
+        self._error: Optional[BaseException] = None
+        self._done = False
+        self._changed = asyncio.Condition()
+        self._subscribers = 0
+        self._pump = asyncio.ensure_future(self._read())
+
+    async def _read(self) -> None:
+        try:
+            async for chunk in self._source:
+                async with self._changed:
+                    self._chunks.append(chunk)
+                    self._changed.notify_all()
+        except asyncio.CancelledError:
+            self._error = RuntimeError("Stream closed after all its readers left")
+        except Exception as e:
+            self._error = e
+        finally:
+            if hasattr(self._source, "aclose"):
+                await self._source.aclose()
+            async with self._changed:
+                self._done = True
+                self._changed.notify_all()
+            if self._on_finish is not None:
+                self._on_finish()
+
+    def subscribe(self) -> AsyncIterator[str]:
+        """Iterator over every chunk of the source, starting from the first"""
+        # Counted now, not at the first chunk, so the source is not closed
+        # while a subscriber is still about to start reading
+        self._subscribers += 1
+        return self._follow()
+
+    async def _follow(self) -> AsyncIterator[str]:
+        position = 0
+        try:
+            while True:
+                async with self._changed:
+                    await self._changed.wait_for(lambda: position < len(self._chunks) or self._done)
+                    chunks = self._chunks[position:]
+                    done = self._done
+                for chunk in chunks:
+                    yield chunk
+                position += len(chunks)
+                if done and position >= len(self._chunks):
+                    if self._error is not None:
+                        raise self._error
+                    return
+        finally:
+            self._subscribers -= 1
+            if self._subscribers == 0 and not self._pump.done():
+                # Everyone went away: stop generating
+                self._pump.cancel()
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers share it.
+
+    The shared call runs as its own task, so a caller that is cancelled
+    does not cancel it for the others. Calls are only shared between
+    callers on the same event loop.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def _join(self, key: Hashable, start: Callable[[], Awaitable]) -> asyncio.Task:
+        loop = asyncio.get_running_loop()
+        self.calls += 1
+        task = self._in_flight.get(key)
+        if task is not None and task.get_loop() is loop:
+            self.coalesced += 1
+            return task
+        task = loop.create_task(start())
+        task.add_done_callback(_mark_retrieved)
+        self._in_flight[key] = task
+        return task
+
+    def _release(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+    async def run(self, key: Hashable, function: Callable[[], Awaitable[T]]) -> T:
+        """
+        Await function(), or the identical call already in flight.
+
+        Args:
+            key: Identifies calls with interchangeable results
+            function: Starts the call (not invoked if one is in flight)
+
+        Returns:
+            The shared call's result (its exception is raised to every caller)
+        """
+        if not self.enabled:
+            return await function()
+        task = self._join(key, function)
+        task.add_done_callback(lambda task: self._release(key, task))
+        return await asyncio.shield(task)
+
+    async def stream(self, key: Hashable,
+                     start: Callable[[], Awaitable[Tuple[T, AsyncIterator[str]]]]) -> Tuple[T, AsyncIterator[str]]:
+        """
+        Start a streaming call, or join the identical one in flight.
+
+        The call stays joinable until its stream is finished.
+
+        Args:
+            key: Identifies calls with interchangeable results
+            start: Returns (head value, async iterator of chunks)
+
+        Returns:
+            (head value, iterator over the whole stream from its first chunk)
+        """
+        if not self.enabled:
+            return await start()
+
+        async def begin() -> Tuple[T, SharedStream]:
+            head, chunks = await start()
+            return head, SharedStream(chunks, on_finish=lambda: self._release(key, task))
+
+        def started(task: asyncio.Task) -> None:
+            # A call that failed before streaming is released right away;
+            # otherwise the stream releases it when it ends
+            if task.cancelled() or task.exception() is not None:
+                self._release(key, task)
+
+        task = self._join(key, begin)
+        task.add_done_callback(started)
+        head, shared = await asyncio.shield(task)
+        return head, shared.subscribe()
+
+    def stats(self) -> Dict:
+        """Calls, calls served by another in-flight call, and calls in flight now"""
+        return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._in_flight)}
@@ -0,0 +1,95 @@
+"""
+Food Lookup Benchmark
+Compares the indexed find_food_matches lookup with the original linear
+substring scan as the catalog grows
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from food_index import FoodIndex
+from nutrition_database import NUTRITION_DATABASE
+
+CATALOG_SIZES = [len(NUTRITION_DATABASE), 100, 1_000, 10_000, 50_000]
+REPEATS = 20
+
+# Typical names returned by the extraction / vision prompts
+QUERIES = [
+    "chicken breast",
+    "grilled chicken breast",
+    "broccoli",
+    "brown rice",
+    "sweet potato fries",
+    "pea",
+    "dragon fruit smoothie",
+]
+
+MODIFIERS = ["organic", "grilled", "roasted", "raw", "frozen", "canned", "baked",
+             "steamed", "smoked", "fresh", "dried", "low fat", "light", "spicy"]
+BRANDS = ["acme", "farmhouse", "golden", "valley", "sunrise", "harvest", "alpine"]
+
+
+def build_catalog(size: int) -> list:
+    """Build a synthetic catalog: the real database keys plus generated variants"""
+    rng = random.Random(size)
+    base = list(NUTRITION_DATABASE)
+    names = list(base)
+    seen = set(names)
+    while len(names) < size:
+        name = f"{rng.choice(BRANDS)} {rng.choice(MODIFIERS)} {rng.choice(base)} {rng.randint(1, 999)}"
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    return names[:size]
+
+
+def linear_scan(names: list, query: str) -> list:
+    """The original find_food_matches substring loop"""
+    return [row for row, name in enumerate(names) if query in name or name in query]
+
+
+def time_per_lookup(func, names_or_index, queries) -> float:
+    """Average microseconds per lookup"""
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        for query in queries:
+            func(names_or_index, query)
+    elapsed = time.perf_counter() - start
+    return elapsed / (REPEATS * len(queries)) * 1e6
+
+
+print("=" * 70)
+print("FOOD LOOKUP BENCHMARK - Linear scan vs n-gram index")
+print("=" * 70)
+
+print(f"\n{'Catalog':>10} | {'Build (ms)':>10} | {'Matches':>8} | {'Scan (us)':>10} | {'Index (us)':>10} | {'Speedup':>8}")
+print("-" * 80)
+
+for size in CATALOG_SIZES:
+    names = build_catalog(size)
+
+    build_start = time.perf_counter()
+    index = FoodIndex(names)
+    build_ms = (time.perf_counter() - build_start) * 1000
+
+    # Both approaches must agree on every query
+    matches = 0
+    for query in QUERIES:
+        rows = index.search(query)
+        assert rows == linear_scan(names, query), f"Mismatch for '{query}'"
+        matches += len(rows)
+
+    scan_us = time_per_lookup(linear_scan, names, QUERIES)
+    index_us = time_per_lookup(lambda idx, q: idx.search(q), index, QUERIES)
+
+    print(f"{size:>10,} | {build_ms:>10.1f} | {matches / len(QUERIES):>8.0f} | {scan_us:>10.1f} | {index_us:>10.1f} | {scan_us / index_us:>7.1f}x")
+
+print("\nMatches = average result size per query; index time grows with the")
+print("number of matches returned, not with the number of foods scanned.")
+print(f"Catalogs under {FoodIndex.LINEAR_SCAN_MAX_NAMES} names (the built-in database) use the scan.")
+print("\n✓ Index results identical to linear scan for all queries")
@@ -0,0 +1,112 @@
+"""
+Fuzzy Matcher Benchmark
+Checks that misspelled food names resolve to the right catalog entry and
+times trigram TF-IDF lookups as the catalog grows
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from fuzzy_matcher import FuzzyMatcher
+from nutrition_database import FUZZY_MATCH_THRESHOLD, NUTRITION_DATABASE, find_food_matches, resolve_food
+
+CATALOG_SIZES = [1_000, 10_000, 100_000]
+REPEATS = 20
+
+# Misspellings / variants seen in extraction output -> expected catalog key
+MISSPELLINGS = {
+    "brocoli": "broccoli",
+    "grilled chiken breast": "chicken breast",
+    "spinnach": "spinach",
+    "strawbery": "strawberry",
+    "bannana": "banana",
+    "yoghurt": "yogurt",
+}
+
+# Variants whose substring match covers only part of the name -> the closer fuzzy match
+WEAK_SUBSTRINGS = {
+    "sweet potatos": "sweet potato",  # Not "potato", the first substring match
+    "roasted sweet potato": "sweet potato",
+    "wholewheat bread": "whole wheat bread",
+    "brown rice bowl": "brown rice",
+}
+
+# Substring matches the fuzzy score must not override
+STRONG_SUBSTRINGS = {
+    "egg fried rice": "rice",
+    "potatoes": "potato",
+    "grilled chicken breast": "chicken breast",
+    "cheese pizza": "cheese",
+}
+
+# Foods not in the catalog must stay unmatched (category estimate instead)
+UNKNOWN = ["dragon fruit", "lamb chop", "parmesan", "spagheti", "steak"]
+
+MODIFIERS = ["organic", "grilled", "roasted", "raw", "frozen", "canned", "baked",
+             "steamed", "smoked", "fresh", "dried", "low fat", "light", "spicy"]
+BRANDS = ["acme", "farmhouse", "golden", "valley", "sunrise", "harvest", "alpine"]
+
+
+def build_catalog(size: int) -> list:
+    """Build a synthetic catalog: the real database keys plus generated variants"""
+    rng = random.Random(size)
+    base = list(NUTRITION_DATABASE)
+    names = list(base)
+    seen = set(names)
+    while len(names) < size:
+        name = f"{rng.choice(BRANDS)} {rng.choice(MODIFIERS)} {rng.choice(base)} {rng.randint(1, 999)}"
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    return names[:size]
+
+
+print("=" * 70)
+print("FUZZY MATCHER BENCHMARK - Trigram TF-IDF cosine similarity")
+print("=" * 70)
+
+print(f"\nThreshold: {FUZZY_MATCH_THRESHOLD}")
+for query, expected in MISSPELLINGS.items():
+    match = resolve_food(query)
+    assert match is not None and match.key == expected, f"'{query}' resolved to {match and match.key}"
+    assert find_food_matches(query)[0][0] == expected
+    print(f"✓ '{query}' -> '{match.key}'")
+
+for query, expected in {**WEAK_SUBSTRINGS, **STRONG_SUBSTRINGS}.items():
+    match = resolve_food(query)
+    assert match is not None and match.key == expected, f"'{query}' resolved to {match and match.key}"
+    assert find_food_matches(query)[0][0] == expected
+print(f"✓ Weak substring matches lose to closer fuzzy ones ('sweet potatos' -> 'sweet potato'); "
+      f"{len(STRONG_SUBSTRINGS)} others kept")
+
+for query in UNKNOWN:
+    assert resolve_food(query) is None, f"'{query}' should not match"
+print(f"✓ {len(UNKNOWN)} unknown foods left unmatched")
+
+print(f"\n{'Catalog':>10} | {'Build (ms)':>10} | {'Lookup (us)':>11}")
+print("-" * 40)
+
+for size in CATALOG_SIZES:
+    names = build_catalog(size)
+
+    build_start = time.perf_counter()
+    matcher = FuzzyMatcher(names)
+    build_ms = (time.perf_counter() - build_start) * 1000
+
+    queries = list(MISSPELLINGS) + UNKNOWN
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        for query in queries:
+            matcher.best_match(query, FUZZY_MATCH_THRESHOLD)
+    lookup_us = (time.perf_counter() - start) / (REPEATS * len(queries)) * 1e6
+
+    print(f"{size:>10,} | {build_ms:>10.1f} | {lookup_us:>11.1f}")
+    if size == 100_000:
+        assert lookup_us < 1000, f"Lookup took {lookup_us:.0f}us at 100k foods"
+
+print("\n✓ Fuzzy lookups under 1ms at 100k foods")
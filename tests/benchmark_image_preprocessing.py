@@ -0,0 +1,99 @@
+"""
+Image Preprocessing Benchmark
+Compares the original upload path (PNG re-encode + base64 of the raw file)
+with prepare_image (EXIF orientation, downsample, JPEG/WebP re-encode)
+"""
+
+import base64
+import io
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFilter
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from image_preprocessing import prepare_image
+
+REPEATS = 1
+
+
+def sample_photo(size: tuple) -> Image.Image:
+    """Synthetic meal photo with sensor-like noise, so it compresses like a real one"""
+    w, h = size
+    image = Image.merge("RGB", [
+        Image.effect_noise(size, 24).point(lambda v: v * 0.4 + 150),
+        Image.effect_noise(size, 24).point(lambda v: v * 0.4 + 120),
+        Image.effect_noise(size, 24).point(lambda v: v * 0.4 + 90),
+    ])
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((w * 0.1, h * 0.1, w * 0.9, h * 0.9), fill=(240, 240, 235))
+    draw.ellipse((w * 0.25, h * 0.3, w * 0.5, h * 0.6), fill=(190, 140, 80))
+    draw.ellipse((w * 0.5, h * 0.35, w * 0.75, h * 0.7), fill=(60, 140, 50))
+    return image.filter(ImageFilter.GaussianBlur(1))
+
+
+def encode(image: Image.Image, fmt: str, orientation: int = 1, **options) -> bytes:
+    buffer = io.BytesIO()
+    if orientation != 1:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        options["exif"] = exif
+    image.save(buffer, format=fmt, **options)
+    return buffer.getvalue()
+
+
+def original_path(data: bytes) -> int:
+    """What app.py + the analyzer did before: decode, unused PNG, base64 of raw bytes"""
+    image = Image.open(io.BytesIO(data))
+    image.save(io.BytesIO(), format="PNG")
+    return len(base64.b64encode(data))
+
+
+def prepared_path(data: bytes, image_format: str) -> int:
+    prepared = prepare_image(data, image_format=image_format)
+    return len(base64.b64encode(prepared.data))
+
+
+def timed(func, *args) -> tuple:
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        result = func(*args)
+    return result, (time.perf_counter() - start) / REPEATS * 1000
+
+
+print("=" * 70)
+print("IMAGE PREPROCESSING BENCHMARK - Vision upload payload and encode time")
+print("=" * 70)
+
+samples = {
+    "12MP phone JPEG (rotated)": encode(sample_photo((4032, 3024)), "JPEG", orientation=6, quality=95),
+    "8MP JPEG": encode(sample_photo((3264, 2448)), "JPEG", quality=92),
+    "PNG screenshot 1170x2532": encode(sample_photo((1170, 2532)), "PNG"),
+    "WebP 2000x1500": encode(sample_photo((2000, 1500)), "WEBP", quality=90),
+}
+
+print(f"\n{'Sample':<27} | {'File':>8} | {'Before':>15} | {'JPEG':>15} | {'WebP':>15}")
+print(f"{'':<27} | {'(KB)':>8} | {'payload KB/ms':>15} | {'payload KB/ms':>15} | {'payload KB/ms':>15}")
+print("-" * 92)
+
+for name, data in samples.items():
+    before, before_ms = timed(original_path, data)
+    jpeg, jpeg_ms = timed(prepared_path, data, "JPEG")
+    webp, webp_ms = timed(prepared_path, data, "WEBP")
+    print(f"{name:<27} | {len(data) / 1024:>8.0f} | {before / 1024:>7.0f} /{before_ms:>5.0f} "
+          f"| {jpeg / 1024:>7.0f} /{jpeg_ms:>5.0f} | {webp / 1024:>7.0f} /{webp_ms:>5.0f}")
+    assert jpeg < before and webp < before, name
+
+# EXIF orientation is applied and the model's resolution limits respected
+prepared = prepare_image(samples["12MP phone JPEG (rotated)"])
+print(f"\n  Rotated 4032x3024 upload -> {prepared.width}x{prepared.height} {prepared.mime_type}")
+assert (prepared.width, prepared.height) == (768, 1024)
+prepared = prepare_image(samples["PNG screenshot 1170x2532"])
+assert min(prepared.width, prepared.height) == 768 and prepared.mime_type == "image/jpeg"
+
+print("\nPayload = base64 bytes sent to the vision model; times are per image.")
+print("\n✓ Preprocessed payloads smaller than the original upload path for all samples")
+print("✓ EXIF orientation applied; images fit the model's 2048 / 768px limits")
@@ -0,0 +1,179 @@
+"""
+Fake Azure OpenAI gateway shared by the analyzer validation scripts
+
+Stands in for client.chat.completions so NutritionAnalyzer runs end to end
+without an endpoint: each call gets its stage's canned response after a
+configurable delay, streamed in chunks when the call asks for a stream.
+"""
+import asyncio
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterable, List, Tuple, Union
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import httpx
+import openai
+
+from nutrition_analyzer import NutritionAnalyzer
+from rate_limiter import GatewayScheduler
+from resilience import ResilientCaller
+
+STAGES = ("extraction", "detection", "single_call", "analysis", "coaching")
+EXTRACTION = '{"items": [{"name": "salmon", "quantity": 150, "unit": "g"}], "meal_description": "Salmon"}'
+ANALYSIS = '{"narrative": "Omega-3 rich and light.", "rating": 8, "advice": ["Add greens"]}'
+SINGLE_CALL = EXTRACTION[:-1] + ", " + ANALYSIS[1:]  # Items first, then the analysis
+COACHING = "Eat more vegetables."
+RESPONSES = {"extraction": EXTRACTION, "detection": EXTRACTION, "single_call": SINGLE_CALL, "analysis": ANALYSIS,
+             "coaching": COACHING}
+
+
+def stage_of(messages: List[Dict]) -> str:
+    """Pipeline stage of a completion request, from its first message"""
+    system = messages[0]["content"]
+    if isinstance(system, list):
+        return "detection"  # Vision requests carry the image instead of a system prompt
+    if system.startswith("Extract"):
+        return "extraction"
+    if "items before your analysis" in system:
+        return "single_call"
+    return "coaching" if "coach" in system else "analysis"
+
+
+def server_error(deployment: str) -> openai.InternalServerError:
+    """HTTP 500 from a deployment"""
+    request = httpx.Request("POST", f"https://example.test/openai/deployments/{deployment}/chat/completions")
+    return openai.InternalServerError("Server error", response=httpx.Response(500, request=request), body=None)
+
+
+def completion(content: str) -> SimpleNamespace:
+    """Non-streamed chat completion with the given content"""
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def chunk(content: str) -> SimpleNamespace:
+    """Streamed chat completion chunk with the given content"""
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+class FakeGateway:
+    """Stands in for client.chat.completions.
+
+    A call waits for its stage's delay plus its deployment's delay, then
+    answers with the stage's response (a string, or a function of the
+    messages that returns one or raises). Streams yield it chunk_size
+    characters at a time, each chunk after the stage's chunk delay; a
+    non-streamed response arrives when the whole stream would have.
+    """
+
+    def __init__(self, responses: Dict[str, Union[str, Callable[[List[Dict]], str]]] = None,
+                 delays: Dict[str, float] = None, chunk_size: int = 8, chunk_delays: Dict[str, float] = None,
+                 deployment_delays: Dict[str, float] = None, failing: Iterable[str] = (),
+                 errors: Iterable[Exception] = ()):
+        """Configure the gateway
+
+        Args:
+            responses: Response per stage (see STAGES), on top of RESPONSES
+            delays: Seconds before a stage's response starts
+            chunk_size: Characters per streamed chunk
+            chunk_delays: Seconds before each streamed chunk, per stage
+            deployment_delays: Extra seconds per deployment (the request's model)
+            failing: Deployments that answer with HTTP 500 after their delay
+            errors: Raised by the next calls, one per call, before any response
+        """
+        self.responses = {**RESPONSES, **(responses or {})}
+        self.delays = delays or {}
+        self.chunk_size = chunk_size
+        self.chunk_delays = chunk_delays or {}
+        self.deployment_delays = deployment_delays or {}
+        self.failing = set(failing)
+        self.errors = list(errors)
+        self.calls: List[Tuple[str, str]] = []  # (stage, deployment) per call
+        self.events: List[Tuple[str, float]] = []  # (event, seconds since the gateway was created)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.start = time.monotonic()
+
+    @property
+    def stages(self) -> List[str]:
+        """Stage of each call, in order"""
+        return [stage for stage, _ in self.calls]
+
+    def counts(self) -> Counter:
+        """Calls per stage"""
+        return Counter(self.stages)
+
+    def log(self, event: str) -> None:
+        """Record an event with its time (the gateway logs "<stage> request" and "<stage> done")"""
+        self.events.append((event, time.monotonic() - self.start))
+
+    async def create(self, **params):
+        messages = params["messages"]
+        stage, model = stage_of(messages), params.get("model")
+        self.calls.append((stage, model))
+        self.log(f"{stage} request")
+        if self.errors:
+            raise self.errors.pop(0)
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delays.get(stage, 0) + self.deployment_delays.get(model, 0))
+            if model in self.failing:
+                raise server_error(model)
+            content = self.responses[stage]
+            if callable(content):
+                content = content(messages)
+            parts = [content[i:i + self.chunk_size] for i in range(0, len(content), self.chunk_size)]
+            chunk_delay = self.chunk_delays.get(stage, 0)
+        except BaseException:
+            self.in_flight -= 1
+            raise
+
+        if params.get("stream"):
+            return self._stream(stage, parts, chunk_delay)
+        try:
+            await asyncio.sleep(chunk_delay * len(parts))
+        finally:
+            self.in_flight -= 1
+        self.log(f"{stage} done")
+        return completion(content)
+
+    async def _stream(self, stage: str, parts: List[str], chunk_delay: float):
+        try:
+            for part in parts:
+                await asyncio.sleep(chunk_delay)
+                yield chunk(part)
+            self.log(f"{stage} done")
+        finally:
+            self.in_flight -= 1
+
+
+def make_analyzer(gateway: FakeGateway, **options) -> NutritionAnalyzer:
+    """
+    Analyzer whose completions go to the fake gateway.
+
+    Defaults to no caches, the two-call analysis, retries without hedging and
+    no rate limits; any NutritionAnalyzer argument given overrides them.
+
+    Args:
+        gateway: Gateway answering the analyzer's completion calls
+        **options: NutritionAnalyzer keyword arguments
+
+    Returns:
+        NutritionAnalyzer
+    """
+    defaults = {
+        "extraction_cache": None,
+        "image_cache": None,
+        "single_call": False,
+        "resilience": ResilientCaller(hedge_percentile=0),
+        "scheduler": GatewayScheduler(requests_per_minute=0, tokens_per_minute=0),
+    }
+    analyzer = NutritionAnalyzer("test-key", **{**defaults, **options})
+    analyzer._async_client = lambda: SimpleNamespace(chat=SimpleNamespace(completions=gateway))
+    return analyzer
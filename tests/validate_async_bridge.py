@@ -0,0 +1,89 @@
+"""
+Validate the blocking bridge to the shared event loop and the per-loop connection pools
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from fake_gateway import FakeGateway, make_analyzer
+from nutrition_analyzer import NutritionAnalyzer, iterate_in_loop, run_coroutine, shared_event_loop, shared_http_client
+
+print("=" * 70)
+print("VALIDATION: Sync-over-async bridge")
+print("=" * 70)
+
+# Configuration errors surface when the analyzer is built, not on its first analysis
+for arguments, error in (({"api_key": ""}, ValueError), ({"api_key": "test-key", "endpoint": "::bad"}, RuntimeError)):
+    try:
+        NutritionAnalyzer(**arguments, extraction_cache=None, image_cache=None)
+        raise AssertionError(f"expected {error.__name__} for {arguments}")
+    except error as e:
+        print(f"\n  {arguments}: {type(e).__name__}: {str(e)[:70]}")
+print("✓ A missing key or a bad endpoint fails in the constructor")
+
+
+# A blocking wrapper called from the shared loop itself raises instead of deadlocking
+async def blocking_from_loop(analyzer):
+    return analyzer.get_personalized_coaching("Daily nutrition tips", {})
+
+
+analyzer = make_analyzer(FakeGateway())
+future = asyncio.run_coroutine_threadsafe(blocking_from_loop(analyzer), shared_event_loop())
+try:
+    future.result(timeout=5)
+    raise AssertionError("expected the blocking call to be refused")
+except RuntimeError as e:
+    print(f"\n  {e}")
+assert analyzer.get_personalized_coaching("Daily nutrition tips", {}) == "Eat more vegetables."
+print("✓ Blocking call from the shared loop raises; from another thread it runs")
+
+
+# Stopping a blocking iteration early closes the async stream behind it
+closed = []
+
+
+async def endless():
+    try:
+        while True:
+            await asyncio.sleep(0.001)
+            yield "chunk"
+    finally:
+        closed.append(True)
+
+
+chunks = iterate_in_loop(endless())
+assert [next(chunks), next(chunks)] == ["chunk", "chunk"]
+chunks.close()
+assert closed == [True]
+
+gateway = FakeGateway(chunk_size=2, chunk_delays={"analysis": 0.01})
+stream = make_analyzer(gateway).analyze_text_meal_stream("grilled salmon", {})
+for narrative in stream:
+    break
+del narrative
+deadline = time.monotonic() + 2
+while gateway.in_flight and time.monotonic() < deadline:
+    time.sleep(0.01)
+print(f"\n  Analysis stream left after its first chunk: {gateway.in_flight} response(s) still streaming")
+assert gateway.in_flight == 0 and "analysis done" not in [event for event, _ in gateway.events]
+print("✓ Leaving a blocking stream early closes the HTTP stream")
+
+
+# One loop, one connection pool, whichever analyzer sends
+async def pools(*analyzers):
+    return [analyzer._async_client()._client for analyzer in analyzers] + [shared_http_client()]
+
+
+first, second = (NutritionAnalyzer("test-key", extraction_cache=None, image_cache=None) for _ in range(2))
+on_shared_loop = run_coroutine(pools(first, second))
+on_other_loop = asyncio.run(pools(first, second))
+assert on_shared_loop[0] is on_shared_loop[1] is on_shared_loop[2]
+assert on_other_loop[0] is on_other_loop[1] and on_other_loop[0] is not on_shared_loop[0]
+assert run_coroutine(pools(first))[0] is on_shared_loop[0]
+print("✓ Analyzers on one event loop share its httpx.AsyncClient; another loop gets its own")
+
+print("\n✓ Sync-over-async bridge validated")
@@ -0,0 +1,90 @@
+"""
+Validate concurrent bulk meal analysis (NutritionAnalyzer.analyze_meals)
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from extraction_cache import ExtractionCache
+from fake_gateway import FakeGateway, make_analyzer
+from meal_analysis import MealAnalysis
+
+LATENCY = 0.05  # Seconds per simulated completion
+ANALYSIS = '{"narrative": "Balanced.", "rating": 7, "advice": ["Drink water"]}'
+
+
+def extraction(messages):
+    # Echoes the meal as its only item; "gateway error" meals fail
+    meal = messages[-1]["content"].split("Meal: ")[1].split("\n")[0]
+    if "gateway error" in meal:
+        raise RuntimeError("503 Service Unavailable")
+    return f'{{"items": [{{"name": "{meal}", "quantity": 100, "unit": "g"}}], "meal_description": "{meal}"}}'
+
+
+def batch_analyzer() -> tuple:
+    gateway = FakeGateway({"extraction": extraction, "analysis": ANALYSIS},
+                          delays={"extraction": LATENCY, "analysis": LATENCY})
+    cache = ExtractionCache(os.path.join(tempfile.mkdtemp(), "cache.db"))
+    return make_analyzer(gateway, extraction_cache=cache), gateway
+
+
+print("=" * 70)
+print("VALIDATION: Bulk meal analysis")
+print("=" * 70)
+
+foods = ["chicken breast", "brown rice", "salmon", "oatmeal", "banana", "broccoli", "eggs", "tofu"]
+descriptions = [f"{foods[i % len(foods)]} {i}" for i in range(40)]
+descriptions[7] = "gateway error"
+descriptions[23] = "gateway error again"
+profile = {"age_group": "26-35", "health_goal": "Weight loss"}
+
+# Serial baseline: analyze_text_meal in a loop
+analyzer, _ = batch_analyzer()
+start = time.perf_counter()
+for description in descriptions[:10]:
+    try:
+        analyzer.analyze_text_meal(description, profile)
+    except Exception:
+        pass
+serial = (time.perf_counter() - start) / 10 * len(descriptions)
+
+analyzer, gateway = batch_analyzer()
+updates = []
+start = time.perf_counter()
+results = analyzer.analyze_meals(descriptions, profile, max_concurrency=8,
+                                 progress=lambda done, total: updates.append((done, total)))
+elapsed = time.perf_counter() - start
+
+print(f"\n  {len(descriptions)} meals, 2 completions each at {LATENCY * 1000:.0f} ms")
+print(f"  Serial loop (est.):     {serial:.2f}s")
+print(f"  analyze_meals (8 wide): {elapsed:.2f}s ({serial / elapsed:.1f}x), max in flight {gateway.max_in_flight}")
+
+assert len(results) == len(descriptions)
+for description, result in zip(descriptions, results):
+    if "gateway error" in description:
+        assert isinstance(result, Exception) and "503" in str(result)
+    else:
+        assert isinstance(result, MealAnalysis) and result.meal_description == description
+print("✓ Results in input order; the two failing meals isolated as exceptions")
+
+assert gateway.max_in_flight == 8
+assert elapsed < serial / 4
+print("✓ Concurrency bounded by max_concurrency, throughput scales with it")
+
+assert updates == [(done, len(descriptions)) for done in range(1, len(descriptions) + 1)]
+print("✓ Progress reported once per meal")
+
+# Async API, from inside a running event loop
+analyzer, gateway = batch_analyzer()
+results = asyncio.run(analyzer.analyze_meals_async(descriptions[:6], profile, max_concurrency=2))
+assert gateway.max_in_flight == 2 and all(isinstance(result, MealAnalysis) for result in results)
+assert analyzer.analyze_meals([], profile) == []
+print("✓ analyze_meals_async and empty input")
+
+print("\n✓ Bulk meal analysis validated")
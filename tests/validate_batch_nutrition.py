@@ -0,0 +1,62 @@
+"""
+Validate the batch nutrition API against the per-meal hybrid calculation
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from nutrition_analyzer import NutritionAnalyzer
+from nutrition_database import NUTRITION_DATABASE
+
+MEALS = 3000
+UNITS = ["g", "oz", "cup", "tbsp", "tsp", "medium", "small", "large", "slice"]
+EXTRA_NAMES = ["Grilled Chicken Breast", "dragon fruit", "shrimp", "lamb chop", "sourdough"]
+
+print("=" * 70)
+print("VALIDATION: Batch nutrition vs per-meal calculation")
+print("=" * 70)
+
+# The hybrid helpers don't touch the API client
+analyzer = NutritionAnalyzer.__new__(NutritionAnalyzer)
+
+# Build a synthetic food diary: MEALS meals of 1-6 items each
+rng = random.Random(7)
+names = list(NUTRITION_DATABASE) + EXTRA_NAMES
+meals = {}
+for meal_id in range(MEALS):
+    meals[meal_id] = [
+        {"name": rng.choice(names), "quantity": rng.choice([1, 2, 50, 100, 150]), "unit": rng.choice(UNITS)}
+        for _ in range(rng.randint(1, 6))
+    ]
+rows = [
+    (meal_id, item["name"], item["quantity"], item["unit"])
+    for meal_id, items in meals.items()
+    for item in items
+]
+print(f"\nDiary: {len(meals)} meals, {len(rows)} logged items")
+
+start = time.perf_counter()
+expected = {meal_id: analyzer._calculate_hybrid_nutrition(items) for meal_id, items in meals.items()}
+loop_ms = (time.perf_counter() - start) * 1000
+
+start = time.perf_counter()
+actual = analyzer.calculate_batch_nutrition(rows)
+batch_ms = (time.perf_counter() - start) * 1000
+
+mismatches = [
+    meal_id for meal_id in meals
+    if any(abs(expected[meal_id][n] - actual[meal_id][n]) > 0.11 for n in expected[meal_id])
+]
+
+print(f"\n  Per-meal loop: {loop_ms:8.1f} ms")
+print(f"  Batch API:     {batch_ms:8.1f} ms ({loop_ms / batch_ms:.1f}x faster)")
+print(f"  Meals compared: {len(meals)}, mismatches: {len(mismatches)}")
+
+assert list(actual) == list(meals), "Batch result must keep meal order"
+assert not mismatches, f"Batch totals differ for meals {mismatches[:5]}"
+
+print("\n✓ Batch totals match the per-meal hybrid calculation")
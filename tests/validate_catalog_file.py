@@ -0,0 +1,75 @@
+"""
+Validate the memory-mapped catalog file against the in-memory catalog
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import numpy as np
+
+import nutrition_database
+from catalog_file import open_catalog, write_catalog
+from food_catalog import NUTRIENTS, FoodCatalog
+from nutrition_database import NUTRITION_DATABASE
+
+CATALOG_SIZE = 100_000
+QUERIES = ["chicken breast", "grilled chicken breast", "broccoli", "brown rice", "pea",
+           "rice", "xq", "e", "sweet potato fries", "dragon fruit smoothie", "acme raw salmon 12"]
+MODIFIERS = ["organic", "grilled", "roasted", "raw", "frozen", "canned", "baked", "steamed"]
+BRANDS = ["acme", "farmhouse", "golden", "valley", "sunrise", "harvest", "alpine"]
+
+print("=" * 70)
+print("VALIDATION: Memory-mapped catalog file")
+print("=" * 70)
+
+# Built-in foods plus synthetic variants up to CATALOG_SIZE
+rng = random.Random(5)
+foods = dict(NUTRITION_DATABASE)
+base = list(NUTRITION_DATABASE)
+while len(foods) < CATALOG_SIZE:
+    name = f"{rng.choice(BRANDS)} {rng.choice(MODIFIERS)} {rng.choice(base)} {rng.randint(1, 9999)}"
+    foods.setdefault(name, {n: round(rng.uniform(0, 500), 1) for n in NUTRIENTS})
+
+in_memory = FoodCatalog.from_dict(foods)
+path = os.path.join(tempfile.mkdtemp(), "catalog.bin")
+
+start = time.perf_counter()
+write_catalog(in_memory, path)
+write_s = time.perf_counter() - start
+
+start = time.perf_counter()
+mapped = open_catalog(path)
+open_ms = (time.perf_counter() - start) * 1000
+
+print(f"\nCatalog: {len(foods):,} foods, file size {os.path.getsize(path) / 1e6:.1f} MB")
+print(f"  Compile: {write_s:6.2f} s (offline)")
+print(f"  Open:    {open_ms:6.2f} ms (mmap, no parsing)")
+
+assert len(mapped) == len(in_memory)
+assert np.array_equal(mapped.matrix, in_memory.matrix), "Nutrient matrix differs"
+
+for query in QUERIES + rng.sample(list(foods), 20):
+    assert mapped.index.search(query) == in_memory.index.search(query), f"search('{query}') differs"
+    assert mapped.resolve_row(query) == in_memory.resolve_row(query), f"resolve('{query}') differs"
+print(f"  Lookups: {len(QUERIES) + 20} queries identical to the in-memory index")
+
+start = time.perf_counter()
+for _ in range(50):
+    for query in QUERIES:
+        mapped.resolve_row(query)
+lookup_us = (time.perf_counter() - start) / (50 * len(QUERIES)) * 1e6
+print(f"  Resolve: {lookup_us:6.1f} us per lookup")
+
+# The database API works unchanged on top of the mapped file
+nutrition_database.load_catalog(path)
+portion = nutrition_database.get_nutrition_for_portion("chicken breast", 150, "g")
+assert portion["protein"] == 46.5, portion
+nutrition_database.rebuild_food_index()
+
+print("\n✓ Mapped catalog matches the in-memory catalog")
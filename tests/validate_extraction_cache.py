@@ -0,0 +1,94 @@
+"""
+Validate the persistent extraction cache
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from config import DATA_DIR, EXTRACTION_CACHE_PATH
+from extraction_cache import ExtractionCache, normalize_meal_text
+from nutrition_analyzer import NutritionAnalyzer
+
+print("=" * 70)
+print("VALIDATION: Extraction cache")
+print("=" * 70)
+
+# Phrasings of the same meal share a key; different quantities don't
+same = [
+    "2 eggs, toast and black coffee",
+    "Black coffee with toast & 2 eggs.",
+    "  2 EGGS;  toast,\nblack   coffee! ",
+]
+keys = {normalize_meal_text(text) for text in same}
+print(f"\n  Normalized: {keys.pop()}")
+assert not keys
+assert normalize_meal_text("2 eggs and 1 toast") != normalize_meal_text("1 eggs and 2 toast")
+assert normalize_meal_text("1.5 cups rice") == "1.5 cups rice"
+print("✓ Case, whitespace, punctuation and component order normalized")
+
+path = os.path.join(tempfile.mkdtemp(), "extraction_cache.db")
+cache = ExtractionCache(path, ttl_seconds=3600, max_entries=3)
+extraction = {
+    "items": [{"name": "eggs", "quantity": 2, "unit": "large"}, {"name": "toast", "quantity": 1, "unit": "slice"}],
+    "meal_description": "Eggs and toast",
+}
+
+assert cache.get(same[0], "gpt-4o:v1") is None
+cache.put(same[0], extraction, "gpt-4o:v1")
+assert cache.get(same[1], "gpt-4o:v1") == extraction
+assert cache.get(same[2], "gpt-4o:v1") == extraction
+print("✓ Repeat meal served from cache")
+
+# Another deployment or prompt version never sees the entry
+assert cache.get(same[0], "gpt-4o-mini:v1") is None
+assert cache.get(same[0], "gpt-4o:v2") is None
+print("✓ Key includes deployment / prompt version")
+
+# Persisted on disk
+reopened = ExtractionCache(path, ttl_seconds=3600, max_entries=3)
+assert reopened.get(same[0], "gpt-4o:v1") == extraction
+reopened.close()
+print("✓ Entries survive a restart")
+
+# LRU eviction: touching "meal a" keeps it while the oldest entry goes
+cache.clear()
+for meal in ["meal a", "meal b", "meal c"]:
+    cache.put(meal, extraction)
+    time.sleep(0.01)
+cache.get("meal a")
+cache.put("meal d", extraction)
+assert len(cache) == 3
+assert cache.get("meal b") is None
+assert cache.get("meal a") is not None
+print("✓ Least recently used entry evicted at max_entries")
+
+# TTL
+short = ExtractionCache(os.path.join(tempfile.mkdtemp(), "ttl.db"), ttl_seconds=0.05)
+short.put("oatmeal with berries", extraction)
+assert short.get("oatmeal with berries") is not None
+time.sleep(0.1)
+assert short.get("oatmeal with berries") is None
+assert len(short) == 0
+print("✓ Expired entries are treated as misses and removed")
+
+stats = cache.stats()
+print(f"\n  Stats: {stats}")
+assert stats["hits"] == 2 and stats["misses"] == 1 and stats["entries"] == 3
+
+# Analyzer wiring: a given cache is used, None disables caching, the default file lives in DATA_DIR
+assert NutritionAnalyzer("test-key", extraction_cache=cache, image_cache=None).extraction_cache is cache
+analyzer = NutritionAnalyzer("test-key", extraction_cache=None, image_cache=None)
+assert analyzer.extraction_cache is None and analyzer.image_cache is None
+assert os.path.dirname(os.path.abspath(EXTRACTION_CACHE_PATH)) == os.path.abspath(DATA_DIR)
+nested = ExtractionCache(os.path.join(tempfile.mkdtemp(), "data", "cache.db"))  # Missing directory created
+nested.close()
+print(f"✓ Analyzer caches can be disabled with None; default cache file in {DATA_DIR}")
+
+cache.close()
+short.close()
+print("\n✓ Extraction cache validated")
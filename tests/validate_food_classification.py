@@ -0,0 +1,90 @@
+"""
+Validate the one-pass keyword classifier for unknown foods against the original if/elif chain
+"""
+import itertools
+import random
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from nutrition_database import CATEGORY_ESTIMATES, CATEGORY_KEYWORDS, NUTRIENTS, classify_food, estimate_food
+
+print("=" * 70)
+print("VALIDATION: Unknown-food classification")
+print("=" * 70)
+
+
+def original_category(food_name: str) -> str:
+    """NutritionAnalyzer._estimate_match's keyword chain before the precompiled pattern"""
+    category = "vegetable"  # Default
+    food_lower = food_name.lower()
+
+    if any(x in food_lower for x in ["chicken", "beef", "pork", "meat", "turkey", "lamb", "steak"]):
+        category = "meat"
+    elif any(x in food_lower for x in ["fish", "salmon", "tuna", "cod", "shrimp", "seafood"]):
+        category = "fish"
+    elif any(x in food_lower for x in ["apple", "banana", "orange", "fruit", "berry", "grape"]):
+        category = "fruit"
+    elif any(x in food_lower for x in ["rice", "bread", "pasta", "grain", "cereal", "oat"]):
+        category = "grain"
+    elif any(x in food_lower for x in ["bean", "lentil", "chickpea", "legume", "pea"]):
+        category = "legume"
+    elif any(x in food_lower for x in ["cheese", "milk", "yogurt", "butter", "dairy"]):
+        category = "dairy"
+    elif any(x in food_lower for x in ["oil", "fat", "butter", "mayo"]):
+        category = "oil"
+    return category
+
+
+# Names with keywords of several categories: the highest-priority category wins
+OVERLAPS = {
+    "chicken rice": "meat",
+    "fish and chips": "fish",
+    "egg fried rice": "grain",
+    "Chickpea Curry": "legume",
+    "peanut butter": "legume",
+    "buttered oats": "grain",
+    "tuna pasta bake": "fish",
+    "banana bread": "fruit",
+    "codfish": "fish",
+    "beef fat": "meat",
+    "olive oil": "oil",
+    "Greek yogurt with berries": "dairy",  # "berries" does not contain "berry"
+    "goat cheese": "grain",  # "goat" contains "oat"
+    "kale": "vegetable",
+}
+print()
+for name, expected in OVERLAPS.items():
+    category = classify_food(name)
+    print(f"  {name!r:30} -> {category}")
+    assert category == original_category(name) == expected, (name, category, original_category(name))
+print("✓ Keyword-overlap names classified as the original chain did")
+
+# Every keyword alone and every pair of keywords, with and without a separator
+keywords = [keyword for _, words in CATEGORY_KEYWORDS for keyword in words]
+names = keywords + [f"{a}{sep}{b}" for a, b in itertools.permutations(keywords, 2) for sep in ("", " ")]
+mismatches = [name for name in names if classify_food(name) != original_category(name)]
+assert not mismatches, mismatches[:10]
+print(f"✓ {len(names)} keyword combinations agree")
+
+# Random names built from keyword fragments and filler letters
+rng = random.Random(8)
+pieces = keywords + [keyword[:3] for keyword in keywords] + list("aeiou xyz")
+names = ["".join(rng.choice(pieces) for _ in range(rng.randint(1, 6))) for _ in range(20000)]
+mismatches = [name for name in names if classify_food(name) != original_category(name)]
+assert not mismatches, mismatches[:10]
+print(f"✓ {len(names)} random names agree")
+
+# Estimates carry the original per-100g values of the category
+for category, values in CATEGORY_ESTIMATES.items():
+    name = next((words[0] for key, words in CATEGORY_KEYWORDS if key == category), "kale")
+    match = estimate_food(name)
+    assert match.key == category and match.estimated
+    assert [float(v) for v in match.per_100g] == [float(np.float32(values[n])) for n in NUTRIENTS]
+print("✓ Category estimates unchanged")
+
+print("\n✓ Unknown-food classification validated")
@@ -0,0 +1,78 @@
+"""
+Validate the SQLite/FTS5 food store backend
+"""
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import nutrition_database
+from config import DATA_DIR, NUTRITION_SQLITE_PATH
+from food_store import SQLiteFoodStore
+from nutrition_database import NUTRITION_DATABASE, find_food_matches, get_nutrition_for_portion
+
+print("=" * 70)
+print("VALIDATION: SQLite food store backend")
+print("=" * 70)
+
+# The store creates its directory, like the default file under DATA_DIR needs
+assert os.path.dirname(os.path.abspath(NUTRITION_SQLITE_PATH)) == os.path.abspath(DATA_DIR)
+path = os.path.join(tempfile.mkdtemp(), "data", "nutrition.db")
+store = SQLiteFoodStore(path)
+store.upsert_foods(NUTRITION_DATABASE)
+print(f"\nSeeded store with {len(store)} foods")
+
+nutrition_database.set_backend(store)
+
+# Exact names give the same portion math as the built-in catalog
+portion = get_nutrition_for_portion("chicken breast", 150, "g")
+print(f"\n  150g chicken breast: {portion['calories']} cal, {portion['protein']}g protein")
+assert portion["protein"] == 46.5, portion
+
+# Ranked full-text matches for names the substring scan handles poorly
+for query, expected in [
+    ("grilled chicken breast", "chicken breast"),
+    ("Boiled Eggs", "eggs"),
+    ("roasted sweet potatoes", "sweet potato"),
+    ("steamed broccoli florets", "broccoli florets"),
+]:
+    best = find_food_matches(query)[0][0]
+    status = "✓" if best == expected else "✗"
+    print(f"  {status} '{query}' -> '{best}'")
+    assert best == expected, (query, best)
+
+assert find_food_matches("dragon fruit") == []
+assert find_food_matches("!!!") == []
+
+# Updates are visible immediately, without a redeploy
+store.upsert_foods({"dragon fruit": {"calories": 60, "protein": 1.2, "carbs": 13, "fiber": 3}})
+assert find_food_matches("fresh dragon fruit")[0][0] == "dragon fruit"
+assert store.remove_food("dragon fruit")
+print("  ✓ Upserted and removed a food at runtime")
+
+# Each thread gets its own connection
+errors = []
+
+def lookup():
+    try:
+        for _ in range(50):
+            assert get_nutrition_for_portion("brown rice", 1, "cup") is not None
+    except Exception as e:
+        errors.append(e)
+
+threads = [threading.Thread(target=lookup) for _ in range(8)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+assert not errors, errors
+print(f"  ✓ {len(threads)} concurrent threads served from per-thread connections")
+
+nutrition_database.set_backend(None)
+store.close()
+
+print("\n✓ SQLite food store backend working correctly")
@@ -0,0 +1,93 @@
+"""
+Validate the local health-rating and advice engine, and the analyzer's local-scoring mode
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from health_score import MEAL_SHARE, MealScorer, get_nutrition_targets, score_meal
+from meal_analysis import MAX_RATING
+from fake_gateway import FakeGateway, make_analyzer
+
+print("=" * 70)
+print("VALIDATION: Local health scoring")
+print("=" * 70)
+
+# Targets: goal base values, calories and protein scaled by gender
+assert get_nutrition_targets({}) == {"calories": 2000, "protein": 50, "carbs": 225, "fat": 65, "fiber": 25, "sodium": 2300}
+female = get_nutrition_targets({"health_goal": "Weight loss", "gender": "Female"})
+assert (female["calories"], female["protein"], female["sodium"]) == (1275, 102, 2000)
+assert get_nutrition_targets({"health_goal": "Muscle gain", "gender": "Male"})["calories"] == 2750
+print("\n✓ Daily targets by goal and gender")
+
+BALANCED = {"calories": 620, "protein": 42, "carbs": 65, "fat": 18, "fiber": 11, "sodium": 480, "sugar": 7}
+FAST_FOOD = {"calories": 1350, "protein": 38, "carbs": 140, "fat": 68, "fiber": 4, "sodium": 2400, "sugar": 45}
+SALTY_SOUP = {"calories": 420, "protein": 22, "carbs": 45, "fat": 14, "fiber": 6, "sodium": 1400, "sugar": 4}
+
+balanced = score_meal(BALANCED, {})
+fast_food = score_meal(FAST_FOOD, {})
+print(f"\n  Balanced bowl:  {balanced.rating}/{MAX_RATING}  {balanced.advice[0]}")
+print(f"  Fast-food meal: {fast_food.rating}/{MAX_RATING}  {fast_food.advice[0]}")
+assert balanced.rating >= 9 and fast_food.rating <= 3
+assert balanced.summary.startswith("About 620 cal (31% of your 2000 cal daily target)")
+print("✓ Balanced meals rate high, calorie- and sodium-heavy meals low")
+
+# Conditions tighten the limits; the most expensive issue is advised first
+general = score_meal(SALTY_SOUP, {})
+hypertension = score_meal(SALTY_SOUP, {"health_conditions": ["Hypertension"]})
+print(f"\n  Salty soup: {general.rating}/{MAX_RATING} in general, {hypertension.rating}/{MAX_RATING} with hypertension")
+assert hypertension.rating < general.rating
+assert hypertension.advice[0].startswith("Sodium is 1400 mg") and "hypertension" in hypertension.advice[0]
+diabetic = score_meal(FAST_FOOD, {"health_conditions": ["Diabetes"]})
+assert diabetic.score < fast_food.score and any("with diabetes" in tip for tip in diabetic.advice)
+keto = score_meal(BALANCED, {"dietary_preferences": ["Keto"]})
+assert keto.advice[0].startswith("65 g carbs") and keto.rating < balanced.rating
+print("✓ Hypertension, diabetes and keto limits lower the rating; top advice names the biggest issue")
+
+# Ingredient rules from the items
+toast = [{"name": "whole wheat bread"}, {"name": "peanut butter"}, {"name": "oat milk"}]
+assert score_meal(BALANCED, {"health_conditions": ["Celiac"]}, toast).advice[0].startswith("Contains whole wheat bread")
+assert not any("Contains" in tip for tip in score_meal(BALANCED, {"dietary_preferences": ["Vegan"]}, toast).advice)
+vegan = score_meal(BALANCED, {"dietary_preferences": ["Vegan"]}, [{"name": "scrambled eggs"}, {"name": "rice"}])
+assert vegan.advice[0] == "Contains scrambled eggs - not vegan; swap in tofu, tempeh or legumes."
+print("✓ Gluten / dairy / meat rules read the item names (peanut butter and oat milk are not dairy)")
+
+# Deterministic, and cheap enough to re-score a history on every profile change
+profile = {"health_goal": "Heart health", "gender": "Male", "health_conditions": ["Heart Disease"],
+           "dietary_preferences": ["Vegetarian"]}
+history = [(meal, [{"name": "grilled chicken"}, {"name": "brown rice"}]) for meal in (BALANCED, FAST_FOOD, SALTY_SOUP)] * 1000
+start = time.perf_counter()
+scorer = MealScorer(profile)
+ratings = [scorer.score(nutrition, items).rating for nutrition, items in history]
+per_meal = (time.perf_counter() - start) / len(history) * 1e6
+print(f"\n  Re-scored {len(history)} history meals: {per_meal:.1f} µs per meal")
+assert ratings[:3] == ratings[3:6] and scorer.score(*history[0]) == scorer.score(*history[0])
+assert per_meal < 100
+assert abs(scorer._protein - get_nutrition_targets(profile)["protein"] * MEAL_SHARE) < 1e-9
+print("✓ Same meal, same score; microseconds per meal")
+
+
+# Wired into the analyzer: local scoring needs no analysis completion
+gateway = FakeGateway()
+analyzer = make_analyzer(gateway)
+
+simple = "150g chicken breast, 1 cup brown rice, 1 cup broccoli"
+analysis = asyncio.run(analyzer.analyze_text_meal_async(simple, {"health_goal": "Muscle gain"}, local_scoring=True))
+expected = score_meal(analysis.nutrition, {"health_goal": "Muscle gain"}, analysis.items)
+assert gateway.stages == []
+assert (analysis.rating, analysis.advice, analysis.narrative) == (expected.rating, expected.advice, expected.summary)
+print(f"\n✓ Simple meal analyzed with no completion at all: {analysis.rating}/{MAX_RATING}, \"{analysis.advice[0]}\"")
+
+analysis = analyzer.analyze_text_meal("grilled salmon with steamed broccoli", {}, local_scoring=True)
+assert gateway.stages == ["extraction"] and analysis.rating is not None
+stream = analyzer.analyze_text_meal_stream("grilled salmon with steamed broccoli", {}, local_scoring=True)
+narrative = "".join(stream)
+assert narrative == stream.result.narrative == analysis.narrative and stream.result.rating == analysis.rating
+assert gateway.stages == ["extraction", "extraction"]
+print("✓ Vague meals use only the extraction completion; streams yield the templated summary")
+
+print("\n✓ Local health scoring validated")
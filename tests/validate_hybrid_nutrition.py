@@ -0,0 +1,156 @@
+"""
+Validate the vectorized hybrid nutrition totals against the original per-item dict math
+"""
+import sys
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from nutrition_analyzer import NutritionAnalyzer
+from nutrition_database import NUTRITION_DATABASE, PORTION_MULTIPLIERS
+
+TOLERANCE = 0.1  # Per nutrient: the original rounded every item, the matrix math only the total
+
+# Fixed meals: exact and differently cased names, names found by substring,
+# unknown foods (category estimates) and every weight / volume / size unit
+MEALS = {
+    "chicken and rice": [
+        {"name": "chicken breast", "quantity": 150, "unit": "g"},
+        {"name": "brown rice", "quantity": 1, "unit": "cup"},
+        {"name": "broccoli", "quantity": 80, "unit": "g"},
+    ],
+    "salmon dinner": [
+        {"name": "Salmon", "quantity": 6, "unit": "oz"},
+        {"name": "sweet potato", "quantity": 1, "unit": "medium"},
+        {"name": "olive oil", "quantity": 1, "unit": "tbsp"},
+    ],
+    "breakfast": [
+        {"name": "oats", "quantity": 1, "unit": "cup"},
+        {"name": "blueberry", "quantity": 50, "unit": "g"},
+        {"name": "peanut butter", "quantity": 2, "unit": "tbsp"},
+    ],
+    "egg toast": [
+        {"name": "eggs", "quantity": 2, "unit": "large"},
+        {"name": "whole wheat bread", "quantity": 2, "unit": "slice"},
+        {"name": "butter", "quantity": 1, "unit": "tsp"},
+    ],
+    "substring names": [
+        {"name": "grilled chicken breast", "quantity": 120, "unit": "g"},
+        {"name": "steamed broccoli florets", "quantity": 100, "unit": "g"},
+        {"name": "baby spinach", "quantity": 30, "unit": "g"},
+    ],
+    "unknown foods": [
+        {"name": "lamb chop", "quantity": 200, "unit": "g"},
+        {"name": "shrimp", "quantity": 4, "unit": "ounce"},
+        {"name": "dragon fruit", "quantity": 1, "unit": "small"},
+    ],
+    "vegetable plate": [
+        {"name": "cauliflower", "quantity": 100, "unit": "gram"},
+        {"name": "green beans", "quantity": 1, "unit": "cup"},
+        {"name": "tomato", "quantity": 1, "unit": "medium"},
+    ],
+    "snack": [
+        {"name": "Greek Yogurt", "quantity": 170, "unit": "g"},
+        {"name": "almonds", "quantity": 1, "unit": "tablespoon"},
+        {"name": "honey", "quantity": 1, "unit": "teaspoon"},
+    ],
+    "tofu bowl": [
+        {"name": "tofu", "quantity": 150, "unit": "g"},
+        {"name": "quinoa", "quantity": 0.5, "unit": "cup"},
+        {"name": "soy sauce", "quantity": 1, "unit": "tbsp"},
+    ],
+    "fruit": [
+        {"name": "banana", "quantity": 1, "unit": "medium"},
+        {"name": "apple", "quantity": 1, "unit": "large"},
+    ],
+    "empty": [],
+}
+
+print("=" * 70)
+print("VALIDATION: Hybrid nutrition vs original per-item math")
+print("=" * 70)
+
+
+def original_matches(food_name: str) -> list:
+    """find_food_matches as it was: exact name, else substring hits in catalog order"""
+    food_name = food_name.lower().strip()
+    if food_name in NUTRITION_DATABASE:
+        return [(food_name, NUTRITION_DATABASE[food_name])]
+    return [(db_food, NUTRITION_DATABASE[db_food]) for db_food in NUTRITION_DATABASE
+            if food_name in db_food or db_food in food_name]
+
+
+def original_portion(per_100g: dict, quantity: float, unit: str) -> dict:
+    """Per-item nutrition, rounded to one decimal like the original get_nutrition_for_portion"""
+    multiplier = quantity * PORTION_MULTIPLIERS.get(unit.lower().strip(), 1/100)
+    return {nutrient: round(value * multiplier, 1) for nutrient, value in per_100g.items()}
+
+
+def original_estimate(food_name: str) -> dict:
+    """Per-100g category estimate of the original _estimate_nutrition"""
+    estimates = {
+        "meat": {"calories": 200, "protein": 26, "carbs": 0, "fat": 10, "fiber": 0, "sodium": 80, "sugar": 0},
+        "fish": {"calories": 150, "protein": 20, "carbs": 0, "fat": 7, "fiber": 0, "sodium": 50, "sugar": 0},
+        "vegetable": {"calories": 40, "protein": 2, "carbs": 8, "fat": 0.3, "fiber": 2, "sodium": 30, "sugar": 2},
+        "fruit": {"calories": 60, "protein": 0.7, "carbs": 15, "fat": 0.2, "fiber": 2, "sodium": 5, "sugar": 10},
+        "grain": {"calories": 130, "protein": 4, "carbs": 28, "fat": 1, "fiber": 2, "sodium": 5, "sugar": 0.5},
+        "legume": {"calories": 140, "protein": 8, "carbs": 25, "fat": 1, "fiber": 6, "sodium": 10, "sugar": 1},
+        "dairy": {"calories": 150, "protein": 8, "carbs": 5, "fat": 8, "fiber": 0, "sodium": 200, "sugar": 4},
+        "oil": {"calories": 884, "protein": 0, "carbs": 0, "fat": 100, "fiber": 0, "sodium": 0, "sugar": 0},
+    }
+    category = "vegetable"
+    food_lower = food_name.lower()
+    if any(x in food_lower for x in ["chicken", "beef", "pork", "meat", "turkey", "lamb", "steak"]):
+        category = "meat"
+    elif any(x in food_lower for x in ["fish", "salmon", "tuna", "cod", "shrimp", "seafood"]):
+        category = "fish"
+    elif any(x in food_lower for x in ["apple", "banana", "orange", "fruit", "berry", "grape"]):
+        category = "fruit"
+    elif any(x in food_lower for x in ["rice", "bread", "pasta", "grain", "cereal", "oat"]):
+        category = "grain"
+    elif any(x in food_lower for x in ["bean", "lentil", "chickpea", "legume", "pea"]):
+        category = "legume"
+    elif any(x in food_lower for x in ["cheese", "milk", "yogurt", "butter", "dairy"]):
+        category = "dairy"
+    elif any(x in food_lower for x in ["oil", "fat", "butter", "mayo"]):
+        category = "oil"
+    return estimates[category]
+
+
+def original_total(items: list) -> dict:
+    """The original _calculate_hybrid_nutrition: one dict per item, summed, validated, rounded"""
+    total = {"calories": 0, "protein": 0, "carbs": 0, "fat": 0, "fiber": 0, "sodium": 0, "sugar": 0}
+    for item in items:
+        food_name = item.get("name", "").lower()
+        quantity = item.get("quantity", 100)
+        unit = item.get("unit", "g")
+        matches = original_matches(food_name)
+        per_100g = matches[0][1] if matches else original_estimate(food_name)
+        nutrition = original_portion(per_100g, quantity, unit)
+        for nutrient in total:
+            total[nutrient] += nutrition.get(nutrient, 0)
+
+    # validate_nutrition_data's only correction: carbs implied by fiber
+    if total["carbs"] == 0 and total["fiber"] > 0:
+        total["carbs"] = max(3, total["fiber"] * 2)
+    return {nutrient: round(value, 1) for nutrient, value in total.items()}
+
+
+# The hybrid helpers don't touch the API client
+analyzer = NutritionAnalyzer.__new__(NutritionAnalyzer)
+
+worst = 0.0
+print()
+for meal, items in MEALS.items():
+    expected = original_total(items)
+    actual = analyzer._calculate_hybrid_nutrition(items)
+    assert set(actual) == set(expected), (meal, actual)
+    difference = max(abs(actual[nutrient] - expected[nutrient]) for nutrient in expected)
+    worst = max(worst, difference)
+    print(f"  {meal:18} {actual['calories']:7.1f} cal  {actual['protein']:5.1f}g protein  (max difference {difference:.2f})")
+    assert difference <= TOLERANCE + 1e-9, (meal, expected, actual)
+
+print(f"✓ {len(MEALS)} meals within {TOLERANCE} per nutrient of the original totals (worst {worst:.2f})")
+
+print("\n✓ Hybrid nutrition validated")
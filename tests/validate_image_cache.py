@@ -0,0 +1,91 @@
+"""
+Validate the perceptual-hash image detection cache
+"""
+import io
+import random
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from image_cache import ImageDetectionCache, dhash, hamming_distance
+
+
+def plate_photo(seed: int, size=(1600, 1200)) -> Image.Image:
+    """Synthetic 'meal photo': a plate with a few colored food shapes"""
+    rng = random.Random(seed)
+    image = Image.new("RGB", size, (235, 225, 210))
+    draw = ImageDraw.Draw(image)
+    w, h = size
+    draw.ellipse((w * 0.1, h * 0.1, w * 0.9, h * 0.9), fill=(250, 250, 250))
+    for _ in range(5):
+        x, y = w * rng.uniform(0.15, 0.65), h * rng.uniform(0.15, 0.65)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        draw.ellipse((x, y, x + w * rng.uniform(0.1, 0.25), y + h * rng.uniform(0.1, 0.25)), fill=color)
+    return image
+
+
+def encode(image: Image.Image, fmt: str = "JPEG", **options) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **options)
+    return buffer.getvalue()
+
+
+print("=" * 70)
+print("VALIDATION: Perceptual-hash image detection cache")
+print("=" * 70)
+
+original = plate_photo(1)
+photo = encode(original, quality=90)
+variants = {
+    "re-encoded (quality 60)": encode(original, quality=60),
+    "downscaled to 800px": encode(original.resize((800, 600)), quality=85),
+    "PNG copy": encode(original, "PNG"),
+    "slightly brighter": encode(original.point(lambda v: min(255, v + 8)), quality=90),
+}
+different = encode(plate_photo(2), quality=90)
+
+start = time.perf_counter()
+photo_hash = dhash(photo)
+print(f"\n  dHash of 1600x1200 JPEG: {photo_hash:016x} ({(time.perf_counter() - start) * 1000:.1f} ms)")
+
+for name, data in variants.items():
+    distance = hamming_distance(photo_hash, dhash(data))
+    print(f"  {name:<26} distance {distance:>2}")
+    assert distance <= 6, name
+distance = hamming_distance(photo_hash, dhash(different))
+print(f"  {'different meal':<26} distance {distance:>2}")
+assert distance > 6
+assert dhash(b"not an image") is None
+print("✓ Near-identical photos hash close together, different meals don't")
+
+cache = ImageDetectionCache(max_entries=2, max_distance=6)
+detection = {"items": [{"name": "chicken breast", "quantity": 150, "unit": "g"}], "meal_description": "Chicken"}
+
+assert cache.get(photo_hash, "gpt-4o:v1") is None
+cache.put(photo_hash, detection, "gpt-4o:v1")
+for data in variants.values():
+    assert cache.get(dhash(data), "gpt-4o:v1") == detection
+assert cache.get(dhash(different), "gpt-4o:v1") is None
+assert cache.get(photo_hash, "gpt-4o:v2") is None
+assert cache.get(None, "gpt-4o:v1") is None
+print("✓ Re-uploads served from cache; other meals and prompt versions miss")
+
+# Bounded: the least recently used entry is evicted
+cache.put(dhash(different), detection, "gpt-4o:v1")
+cache.get(photo_hash, "gpt-4o:v1")
+cache.put(dhash(encode(plate_photo(3))), detection, "gpt-4o:v1")
+assert len(cache) == 2
+assert cache.get(dhash(different), "gpt-4o:v1") is None
+assert cache.get(photo_hash, "gpt-4o:v1") == detection
+print("✓ Least recently used entry evicted at max_entries")
+
+stats = cache.stats()
+print(f"\n  Stats: {stats}")
+assert stats["entries"] == 2 and stats["hits"] == 6
+
+print("\n✓ Image detection cache validated")
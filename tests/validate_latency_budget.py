@@ -0,0 +1,140 @@
+"""
+Validate per-request latency budgets and the degraded, database-only results they fall back to
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from fake_gateway import FakeGateway, make_analyzer
+from image_preprocessing import PreparedImage
+from latency_budget import BudgetExceeded, latency_budget, remaining, with_deadline, within_budget
+from nutrition_analyzer import DEGRADED_UNKNOWN_MEAL
+
+BUDGET = 0.3
+
+print("=" * 70)
+print("VALIDATION: Latency budget")
+print("=" * 70)
+
+
+# Primitives: the earliest deadline wins, work and streams are cut off at it
+async def primitives():
+    with latency_budget(5):
+        with latency_budget(0.1):
+            assert remaining() <= 0.1
+            start = time.monotonic()
+            try:
+                await within_budget(asyncio.sleep(1))
+                raise AssertionError("expected BudgetExceeded")
+            except BudgetExceeded:
+                assert time.monotonic() - start < 0.15
+        assert 4.5 < remaining() <= 5
+    assert remaining() is None
+
+    async def ticks():
+        for i in range(100):
+            await asyncio.sleep(0.02)
+            yield i
+
+    with latency_budget(0.1):
+        bounded = with_deadline(ticks())
+    received = []
+    try:
+        async for i in bounded:  # Consumed after the block: the deadline still holds
+            received.append(i)
+        raise AssertionError("expected BudgetExceeded")
+    except BudgetExceeded:
+        assert 2 <= len(received) <= 5
+
+
+asyncio.run(primitives())
+print("\n✓ Nested budgets keep the earliest deadline; awaits and streams stop at it")
+
+
+def slow_gateway(extraction=0.0, analysis=0.0, chunk_delay=0.0):
+    """Fake gateway with a delay per stage (photo detection counts as extraction) and per analysis chunk"""
+    delays = {"extraction": extraction, "detection": extraction, "analysis": analysis}
+    return FakeGateway(delays=delays, chunk_delays={"analysis": chunk_delay})
+
+
+def budgeted_analyzer(gateway, budget=BUDGET, coalesce=True):
+    return make_analyzer(gateway, budget_seconds=budget, coalesce=coalesce)
+
+
+def timed(function, *args, **kwargs):
+    start = time.monotonic()
+    result = function(*args, **kwargs)
+    return result, time.monotonic() - start
+
+
+# Healthy gateway: full analysis, nothing degraded
+analysis, elapsed = timed(budgeted_analyzer(slow_gateway()).analyze_text_meal, "grilled salmon with steamed broccoli", {})
+assert not analysis.degraded and analysis.rating == 8 and analysis.narrative == "Omega-3 rich and light."
+print(f"\n  Budget {BUDGET}s")
+print(f"  Healthy gateway:       full analysis in {elapsed * 1000:.0f} ms")
+
+# Slow analysis: the extracted items with database totals and a local rating
+analysis, elapsed = timed(budgeted_analyzer(slow_gateway(analysis=2)).analyze_text_meal, "grilled salmon with steamed broccoli", {})
+assert analysis.degraded and elapsed < BUDGET + 0.1
+assert [item["name"] for item in analysis.items] == ["salmon"] and analysis.nutrition["calories"] > 0
+assert analysis.rating is not None and analysis.narrative.startswith("About ")
+print(f"  Slow analysis:         degraded after {elapsed * 1000:.0f} ms, {analysis.nutrition['calories']:.0f} cal, {analysis.rating}/10")
+
+# Slow extraction: the parts the local parser reads confidently, marked partial
+analysis, elapsed = timed(budgeted_analyzer(slow_gateway(extraction=2)).analyze_text_meal, "150g grilled salmon and a big bowl of ramen", {})
+assert analysis.degraded and analysis.partial and elapsed < BUDGET + 0.1
+assert [item["name"] for item in analysis.items] == ["salmon"] and analysis.nutrition["calories"] > 0
+print(f"  Slow extraction:       degraded after {elapsed * 1000:.0f} ms with the parts parsed locally (partial)")
+
+# No guessed portions: unknown units and bare names are left out instead of inflating the totals
+for meal, most in (("200 ml milk", 0), ("12 almonds", 150), ("350ml orange juice, toast", 0),
+                   ("grilled salmon with steamed broccoli", 0), ("2 eggs and a glass of juice", 300)):
+    analysis = budgeted_analyzer(slow_gateway(extraction=2)).analyze_text_meal(meal, {})
+    assert analysis.degraded and analysis.nutrition["calories"] <= most, (meal, analysis.nutrition["calories"])
+    print(f"  {meal + ':':<38} {analysis.nutrition['calories']:4.0f} cal{'  (partial)' if analysis.partial else ''}")
+assert analysis.partial and [item["name"] for item in analysis.items] == ["eggs"]
+
+analysis = budgeted_analyzer(slow_gateway(extraction=2)).analyze_text_meal("a big bowl of ramen", {})
+assert analysis.degraded and analysis.items == [] and analysis.rating is None and analysis.narrative == DEGRADED_UNKNOWN_MEAL
+print("  Nothing readable:      degraded with an empty meal and a retry hint")
+
+image = PreparedImage(b"jpeg", "image/jpeg", 768, 768, 4)
+analysis, elapsed = timed(budgeted_analyzer(slow_gateway(extraction=2)).detect_food_from_image, image, {})
+assert analysis.degraded and analysis.items == [] and elapsed < BUDGET + 0.1
+analysis = budgeted_analyzer(slow_gateway(analysis=2)).detect_food_from_image(image, {})
+assert analysis.degraded and analysis.items[0]["name"] == "salmon" and analysis.rating is not None
+print("  Photos:                detected items kept when only the analysis is late")
+print("✓ Slow stages return a degraded, database-only result within the budget instead of an error")
+
+# Streams: cut off mid-generation, sync (Streamlit) and async, with and without coalescing
+for coalesce in (True, False):
+    analyzer = budgeted_analyzer(slow_gateway(chunk_delay=0.05), coalesce=coalesce)
+    stream, elapsed = timed(analyzer.analyze_text_meal_stream, "grilled salmon with steamed broccoli", {})
+    start = time.monotonic()
+    shown = "".join(stream)
+    elapsed += time.monotonic() - start
+    assert stream.result.degraded and elapsed < BUDGET + 0.15
+    assert "Omega-3 rich and light.".startswith(shown) and stream.result.narrative.startswith("About ")
+
+
+async def async_stream():
+    analyzer = budgeted_analyzer(slow_gateway(extraction=2))
+    stream = await analyzer.analyze_text_meal_stream_async("grilled salmon with steamed broccoli", {})
+    assert stream.result.degraded  # Extraction timed out: degraded before streaming starts
+    return "".join([chunk async for chunk in stream]), stream.result
+
+
+narrative, result = asyncio.run(async_stream())
+assert result.degraded and narrative == result.narrative
+print("✓ Streams stop at the deadline and end with the degraded result")
+
+# Bulk analyses run in the batch lane and are not budgeted
+results = budgeted_analyzer(slow_gateway(analysis=BUDGET * 1.5)).analyze_meals(["grilled salmon"] * 3, {})
+assert all(not result.degraded and result.rating == 8 for result in results)
+print("✓ Bulk (batch lane) analyses may take longer than the interactive budget")
+
+print("\n✓ Latency budget validated")
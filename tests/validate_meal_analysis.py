@@ -0,0 +1,68 @@
+"""
+Validate the structured MealAnalysis result and streaming narrative decoding
+"""
+import json
+import sys
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from meal_analysis import AnalysisStream, MealAnalysis, StringFieldReader, parse_json_object
+
+NUTRITION = {"calories": 612.4, "protein": 41.2, "carbs": 58.0, "fat": 22.5, "fiber": 9.1, "sodium": 804.3, "sugar": 6.2}
+ITEMS = [{"name": "salmon", "quantity": 150, "unit": "g"}, {"name": "quinoa", "quantity": 1, "unit": "cup"}]
+
+print("=" * 70)
+print("VALIDATION: MealAnalysis result object")
+print("=" * 70)
+
+# JSON-mode response, and the same object wrapped the way older API versions answer
+response = {
+    "narrative": "Rich in omega-3 \"good\" fats.\nSodium is on the high side — watch the sauce.",
+    "rating": 8,
+    "advice": ["Swap soy sauce for lemon", "  ", "Add leafy greens"],
+}
+raw = json.dumps(response)
+assert parse_json_object(raw) == response
+assert parse_json_object(f"Here you go:\n```json\n{raw}\n```") == response
+assert parse_json_object("no json") is None and parse_json_object("[1, 2]") is None
+print("\n✓ Bare and wrapped JSON objects parsed")
+
+analysis = MealAnalysis(ITEMS, NUTRITION, "Salmon with quinoa").with_response(response)
+assert analysis.rating == 8
+assert analysis.advice == ("Swap soy sauce for lemon", "Add leafy greens")
+assert analysis.narrative == response["narrative"]
+assert analysis.nutrition is NUTRITION and analysis.items is ITEMS
+print("✓ Narrative, rating and advice filled in; items and totals untouched")
+
+# Malformed fields are dropped, not guessed
+partial = MealAnalysis(ITEMS, NUTRITION, "Salmon with quinoa")
+assert partial.with_response({"rating": "7.6", "advice": "Drink water"}).rating == 8
+assert partial.with_response({"rating": "7.6", "advice": "Drink water"}).advice == ("Drink water",)
+assert partial.with_response({"rating": 42}).rating is None
+assert partial.with_response({"rating": "great", "narrative": 3}) == partial
+assert partial.with_response(None) == partial
+print("✓ Out-of-range or malformed fields left empty")
+
+markdown = analysis.to_markdown()
+assert "**Calories**: 612 cal" in markdown and "**Health Rating**: 8/10" in markdown
+assert "- Add leafy greens" in markdown
+print("✓ Markdown rendering for history")
+
+# Narrative decoded incrementally, whatever the chunk boundaries (escapes included)
+for chunk_size in (1, 2, 3, 5, 11, len(raw)):
+    reader = StringFieldReader("narrative")
+    decoded = "".join(reader.feed(raw[i:i + chunk_size]) for i in range(0, len(raw), chunk_size))
+    assert decoded == response["narrative"], chunk_size
+    assert reader.done
+print("✓ Streamed narrative decoded across every chunk split")
+
+chunks = [raw[i:i + 4] for i in range(0, len(raw), 4)]
+stream = AnalysisStream(MealAnalysis(ITEMS, NUTRITION, "Salmon with quinoa"), iter(chunks))
+assert stream.nutrition == NUTRITION and stream.result.rating is None
+assert "".join(stream) == response["narrative"]
+assert stream.result == analysis
+print("✓ AnalysisStream: totals first, narrative while streaming, full result at the end")
+
+print("\n✓ MealAnalysis validated")
@@ -0,0 +1,84 @@
+"""
+Validate the rule-based local meal parser and the extraction calls it saves
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from config import LOCAL_PARSER_MIN_CONFIDENCE
+from meal_parser import parse_meal
+from fake_gateway import FakeGateway, make_analyzer
+
+print("=" * 70)
+print("VALIDATION: Local meal parser")
+print("=" * 70)
+
+# (description, expected (name, quantity, unit) items, parsed confidently?)
+CASES = [
+    ("150g chicken breast, 1 cup brown rice, 1 tbsp olive oil",
+     [("chicken breast", 150, "g"), ("brown rice", 1, "cup"), ("olive oil", 1, "tbsp")], True),
+    ("3 oz lean beef and 1/2 cup carrots", [("beef", 3, "oz"), ("carrot", 0.5, "cup")], True),
+    ("1 1/2 cups cooked quinoa with 200 grams grilled salmon", [("quinoa", 1.5, "cup"), ("salmon", 200, "g")], True),
+    ("Half a cup oats + 1 medium banana", [("oats", 0.5, "cup"), ("banana", 1, "medium")], True),
+    ("2 slices whole wheat bread; 2 tbsp peanut butter", [("whole wheat bread", 2, "slice"), ("peanut butter", 2, "tbsp")], True),
+    ("2 eggs", [("eggs", 100, "g")], False),                        # Count: piece weight, model decides
+    ("12 almonds", [("almonds", 14.4, "g")], False),                # Small items weigh grams, not portions
+    ("200ml milk", [], False),                                       # Unit the parser does not know
+    ("200 ml milk", [], False),
+    ("1 can tuna", [], False),
+    ("3 rice", [], False),                                           # Not counted in pieces
+    ("grilled salmon with steamed broccoli", None, False),           # No portions
+    ("1 cup of brocoli", [("broccoli", 1, "cup")], False),           # Misspelling: model decides
+    ("a big bowl of ramen", None, False),                            # Unknown food
+    ("chicken soup", None, False),
+    ("a glass of milk", None, False),                                # Unknown unit
+]
+
+print(f"\n  {'Confidence':>10}  Meal")
+for description, expected, confident in CASES:
+    parsed = parse_meal(description)
+    print(f"  {parsed.confidence:>10.2f}  {description}")
+    assert (parsed.confidence >= LOCAL_PARSER_MIN_CONFIDENCE) == confident, description
+    if expected is not None:
+        assert [(item["name"], item["quantity"], item["unit"]) for item in parsed.items] == expected, parsed.items
+assert parse_meal("200 grams grilled salmon").items[0]["preparation"] == "grilled"
+assert parse_meal("350ml orange juice, 12 almonds", partial=True).items == parse_meal("12 almonds").items
+print(f"✓ Simple meals parsed above the {LOCAL_PARSER_MIN_CONFIDENCE} threshold; vague or unknown ones fall below it")
+
+# Latency of the local path: parse + database totals
+gateway = FakeGateway()
+analyzer = make_analyzer(gateway)
+simple = [description for description, _, confident in CASES if confident]
+timings = []
+for _ in range(200):
+    for description in simple:
+        start = time.perf_counter()
+        extraction = analyzer._known_extraction(description)
+        analyzer._meal_analysis(extraction, description)
+        timings.append(time.perf_counter() - start)
+timings.sort()
+p50, p99 = timings[len(timings) // 2] * 1000, timings[int(len(timings) * 0.99)] * 1000
+print(f"\n  Local extraction + nutrition totals: p50 {p50:.3f} ms, p99 {p99:.3f} ms")
+assert p99 < 10
+print("✓ Simple meals extracted in well under 10 ms")
+
+totals = analyzer._meal_analysis(analyzer._known_extraction(CASES[0][0]), CASES[0][0]).nutrition
+# 1.5 x 165 + 2.4 x 112 + 0.15 x 884
+assert abs(totals["calories"] - (247.5 + 268.8 + 132.6)) < 1
+print(f"✓ Totals from the catalog: {totals['calories']:.0f} cal, {totals['protein']}g protein")
+
+
+# Wired into the analyzer: the extraction completion runs only below the threshold
+analysis = asyncio.run(analyzer.analyze_text_meal_async(CASES[0][0], {}))
+assert gateway.stages == ["analysis"] and analysis.nutrition == totals and analysis.rating == 8
+asyncio.run(analyzer.analyze_text_meal_async("grilled salmon with steamed broccoli", {}))
+assert gateway.stages == ["analysis", "extraction", "analysis"]
+single_call = asyncio.run(analyzer.analyze_text_meal_async(CASES[0][0], {}, single_call=True))
+assert gateway.stages[-1] == "analysis" and single_call.nutrition == totals
+print("✓ Confident parses skip the extraction completion; others still use it")
+
+print("\n✓ Local meal parser validated")
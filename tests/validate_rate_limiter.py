@@ -0,0 +1,197 @@
+"""
+Validate the process-wide gateway rate limiter and its priority lanes
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from fake_gateway import FakeGateway, make_analyzer, server_error
+from rate_limiter import BATCH, INTERACTIVE, GatewayBusyError, GatewayScheduler, TokenBucket, estimate_tokens, priority_lane
+from resilience import ResilientCaller
+
+print("=" * 70)
+print("VALIDATION: Gateway rate limiter")
+print("=" * 70)
+
+# Token estimates: text at ~4 characters per token, images at a fixed cost, max_tokens charged up front
+text = [{"role": "user", "content": "x" * 400}]
+image = [{"role": "user", "content": [{"type": "text", "text": "x" * 400}, {"type": "image_url", "image_url": {"url": "data:"}}]}]
+assert estimate_tokens(text, 500) == 100 + 4 + 500
+assert estimate_tokens(image, 500) > estimate_tokens(text, 500) + 1000
+print("\n✓ Prompt, image and max_tokens counted in the token estimate")
+
+
+class SimulatedAzure:
+    """Deployment quota enforced the way Azure does: 429 once the window's budget is spent"""
+
+    def __init__(self, requests_per_minute: float, burst_seconds: float):
+        self.bucket = TokenBucket(requests_per_minute / 60, requests_per_minute / 60 * burst_seconds)
+        self.accepted = 0
+        self.throttled = 0
+
+    async def complete(self):
+        self.bucket.refill(time.monotonic())
+        if self.bucket.level < 1:
+            self.throttled += 1
+            return 429
+        self.bucket.take(1)
+        self.accepted += 1
+        await asyncio.sleep(0.02)
+        return 200
+
+
+async def burst(scheduler, azure, count):
+    async def one():
+        if scheduler is not None:
+            await scheduler.acquire(100)
+        return await azure.complete()
+    return await asyncio.gather(*(one() for _ in range(count)))
+
+
+# 40 simultaneous requests against a 20 requests/s quota with half a second of burst
+azure = SimulatedAzure(1200, 0.5)
+asyncio.run(burst(None, azure, 40))
+unlimited = azure.throttled
+azure = SimulatedAzure(1200, 0.5)
+scheduler = GatewayScheduler(requests_per_minute=1200, tokens_per_minute=0, burst_seconds=0.5)
+start = time.monotonic()
+asyncio.run(burst(scheduler, azure, 40))
+elapsed = time.monotonic() - start
+print(f"\n  40 simultaneous requests, quota 20/s (burst 10)")
+print(f"  Without limiter: {unlimited} throttled (429)")
+print(f"  With limiter:    {azure.throttled} throttled, all sent within {elapsed:.2f}s")
+assert unlimited >= 25 and azure.throttled == 0
+assert 1.3 < elapsed < 2.5  # 10 at once, then 20/s
+print("✓ Requests paced to the quota instead of being rejected by the gateway")
+
+
+# Token budget: two requests of 600 tokens fit a 1000-token burst one at a time
+async def two_requests():
+    scheduler = GatewayScheduler(requests_per_minute=0, tokens_per_minute=60000, burst_seconds=1)
+    return await asyncio.gather(scheduler.acquire(600), scheduler.acquire(600))
+
+
+waits = asyncio.run(two_requests())
+assert waits[0] < 0.01 and 0.15 < waits[1] < 0.4
+print(f"✓ Token budget enforced (second request waited {waits[1] * 1000:.0f} ms for 600 tokens to refill)")
+
+
+# Priority: interactive requests jump ahead of queued batch work
+async def priority_order():
+    scheduler = GatewayScheduler(requests_per_minute=600, tokens_per_minute=0, burst_seconds=0.1)
+    order = []
+
+    async def request(lane, name):
+        await scheduler.acquire(10, lane)
+        order.append(name)
+
+    batch = [asyncio.ensure_future(request(BATCH, f"b{i}")) for i in range(6)]
+    await asyncio.sleep(0.05)
+    depth = scheduler.stats()["queue_depth"]
+    interactive = [asyncio.ensure_future(request(INTERACTIVE, f"i{i}")) for i in range(2)]
+    await asyncio.gather(*batch, *interactive)
+    return order, depth
+
+
+order, depth = asyncio.run(priority_order())
+print(f"\n  Grant order: {' '.join(order)} (queued when interactive arrived: {depth})")
+assert order[0] == "b0"
+assert max(order.index("i0"), order.index("i1")) < order.index("b3")
+assert depth[BATCH] >= 4
+print("✓ Interactive requests granted before waiting batch requests")
+
+
+# Busy signal: refused immediately rather than queued past the lane's limit
+async def busy():
+    scheduler = GatewayScheduler(requests_per_minute=60, tokens_per_minute=0, burst_seconds=1,
+                                 max_wait={INTERACTIVE: 0.5, BATCH: 5})
+    await scheduler.acquire(10)
+    start = time.monotonic()
+    try:
+        await scheduler.acquire(10)
+        raise AssertionError("expected busy")
+    except GatewayBusyError as e:
+        refused_after = time.monotonic() - start
+        print(f"\n  Busy: {e} (retry_after {e.retry_after:.1f}s, refused in {refused_after * 1000:.1f} ms)")
+        assert 0.5 < e.retry_after <= 1 and refused_after < 0.01
+    # Batch work may wait longer; cancelling it frees its place in the queue
+    waiter = asyncio.ensure_future(scheduler.acquire(10, BATCH))
+    await asyncio.sleep(0.05)
+    assert scheduler.queue_depth() == 1 == scheduler.queue_depth(BATCH)
+    waiter.cancel()
+    await asyncio.sleep(0)
+    assert scheduler.queue_depth() == 0
+    full = GatewayScheduler(requests_per_minute=60, tokens_per_minute=0, burst_seconds=1, max_queue_depth=1)
+    await full.acquire(10)
+    queued = asyncio.ensure_future(full.acquire(10, BATCH))
+    await asyncio.sleep(0.01)
+    try:
+        await full.acquire(10, BATCH)
+        raise AssertionError("expected busy")
+    except GatewayBusyError:
+        pass
+    queued.cancel()
+    return scheduler.stats()
+
+
+stats = asyncio.run(busy())
+assert stats["rejected"][INTERACTIVE] == 1
+print("✓ GatewayBusyError when the wait exceeds the lane limit or the queue is full; cancelled waiters leave the queue")
+
+# Wired into the analyzer: bulk analyses run in the batch lane, single analyses in the interactive one
+EXTRACTION = '{"items": [{"name": "oatmeal", "quantity": 1, "unit": "cup"}], "meal_description": "Oatmeal"}'
+scheduler = GatewayScheduler(requests_per_minute=6000, tokens_per_minute=600000)
+analyzer = make_analyzer(FakeGateway({"extraction": EXTRACTION}), scheduler=scheduler)
+asyncio.run(analyzer.analyze_text_meal_async("a bowl of oatmeal", {}))
+analyzer.analyze_meals([f"oatmeal {i}" for i in range(5)], {})
+stats = scheduler.stats()
+assert stats["granted"] == {INTERACTIVE: 2, BATCH: 10}, stats["granted"]
+with priority_lane(BATCH):
+    asyncio.run(analyzer.get_personalized_coaching_async("Daily nutrition tips", {}))
+assert scheduler.stats()["granted"][BATCH] == 11
+print("✓ Analyzer calls go through the scheduler; analyze_meals uses the batch lane")
+
+# Every attempt is charged: a retried completion takes the quota twice
+scheduler = GatewayScheduler(requests_per_minute=6000, tokens_per_minute=600000)
+analyzer = make_analyzer(FakeGateway({"extraction": EXTRACTION}, errors=[server_error("gpt-4o")]), scheduler=scheduler,
+                         resilience=ResilientCaller(base_delay=0.01, hedge_percentile=0))
+asyncio.run(analyzer.analyze_text_meal_async("a bowl of oatmeal", {}))
+assert scheduler.stats()["granted"][INTERACTIVE] == 3, scheduler.stats()["granted"]
+print("✓ Retries are charged like new requests")
+
+
+# Hedges are charged too, and only sent when the quota has room for them right now
+async def hedged(scheduler):
+    caller = ResilientCaller(hedge_percentile=90, hedge_min_samples=20, hedge_max_ratio=1)
+    for _ in range(20):
+        caller.latency("extraction").record(0.01)
+
+    async def slow():
+        await asyncio.sleep(0.1)
+        return "ok"
+
+    await caller.call(slow, key="extraction", acquire=lambda: scheduler.acquire(10),
+                      acquire_hedge=lambda: scheduler.try_acquire(10))
+    return caller.hedges
+
+
+roomy = GatewayScheduler(requests_per_minute=6000, tokens_per_minute=0)
+assert asyncio.run(hedged(roomy)) == 1 and roomy.stats()["granted"][INTERACTIVE] == 2
+tight = GatewayScheduler(requests_per_minute=60, tokens_per_minute=0, burst_seconds=1)
+assert asyncio.run(hedged(tight)) == 0 and tight.stats()["granted"][INTERACTIVE] == 1
+print("✓ Hedges take the quota when it has room, and are skipped when it has not")
+
+busy_analyzer = make_analyzer(FakeGateway({"extraction": EXTRACTION}),
+                              scheduler=GatewayScheduler(requests_per_minute=1, tokens_per_minute=0,
+                                                         burst_seconds=1, max_wait={INTERACTIVE: 1}))
+try:
+    asyncio.run(busy_analyzer.analyze_text_meal_async("a bowl of oatmeal", {}))
+    raise AssertionError("expected busy")
+except GatewayBusyError as e:
+    print(f"✓ Busy signal reaches the caller unwrapped: {e}")
+
+print("\n✓ Gateway rate limiter validated")
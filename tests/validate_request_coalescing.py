@@ -0,0 +1,175 @@
+"""
+Validate single-flight coalescing of identical in-flight analyses and coaching requests
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from fake_gateway import STAGES, FakeGateway, make_analyzer
+from meal_analysis import MealAnalysis
+from single_flight import SharedStream, SingleFlight
+
+LATENCY = 0.05  # Seconds per simulated completion
+ANALYSIS = '{"narrative": "Fiber-rich and filling.", "rating": 8, "advice": ["Add berries"]}'
+EXTRACTION = '{"items": [{"name": "oatmeal", "quantity": 1, "unit": "cup"}], "meal_description": "Oatmeal"}'
+
+
+def coalescing_analyzer(coalesce: bool = True):
+    completions = FakeGateway({"extraction": EXTRACTION, "analysis": ANALYSIS},
+                              delays=dict.fromkeys(STAGES, LATENCY), chunk_delays=dict.fromkeys(STAGES, 0.002))
+    return make_analyzer(completions, coalesce=coalesce), completions
+
+
+print("=" * 70)
+print("VALIDATION: Request coalescing")
+print("=" * 70)
+
+student = {"age_group": "18-25", "health_goal": "Muscle gain"}
+teacher = {"age_group": "36-45", "health_goal": "Weight loss"}
+
+
+async def classroom(analyzer):
+    # 20 students submit the same meal; the teacher too, with a different profile
+    meals = [analyzer.analyze_text_meal_async("a bowl of oatmeal", student) for _ in range(20)]
+    meals.append(analyzer.analyze_text_meal_async("a bowl of oatmeal", teacher))
+    coaching = [analyzer.get_personalized_coaching_async("Daily nutrition tips", student) for _ in range(10)]
+    return await asyncio.gather(*meals, *coaching)
+
+
+analyzer, completions = coalescing_analyzer(coalesce=False)
+asyncio.run(classroom(analyzer))
+separate = dict(completions.counts())
+
+analyzer, completions = coalescing_analyzer()
+results = asyncio.run(classroom(analyzer))
+print(f"\n  21 identical-meal analyses (2 profiles) + 10 identical coaching requests")
+print(f"  Without coalescing: {separate}")
+print(f"  With coalescing:    {dict(completions.counts())} ({analyzer.in_flight.stats()['coalesced']} calls joined)")
+assert completions.counts() == {"extraction": 1, "analysis": 2, "coaching": 1}
+assert all(isinstance(result, MealAnalysis) and result.rating == 8 for result in results[:21])
+assert results[0] is results[19] and results[20] is not results[0]
+assert set(results[21:]) == {"Eat more vegetables."}
+assert analyzer.in_flight.stats()["in_flight"] == 0
+print("✓ One completion per distinct request; the profile is part of the key, the extraction is shared")
+
+# Not a cache: the same request made after the first finished runs again
+asyncio.run(analyzer.get_personalized_coaching_async("Daily nutrition tips", student))
+assert completions.counts()["coaching"] == 2
+print("✓ Finished calls are not reused")
+
+
+# Local scoring targets depend on gender, which the prompts leave out: still part of the key
+async def local_scoring(analyzer, profiles):
+    return await asyncio.gather(*(
+        analyzer.analyze_text_meal_async("200g chicken breast, 1 cup brown rice", profile, local_scoring=True)
+        for profile in profiles
+    ))
+
+
+female, male = ({"health_goal": "Weight loss", "gender": gender} for gender in ("Female", "Male"))
+analyzer, completions = coalescing_analyzer()
+together = asyncio.run(local_scoring(analyzer, [female, male]))
+apart = [asyncio.run(local_scoring(coalescing_analyzer()[0], [profile]))[0] for profile in (female, male)]
+print(f"\n  Same meal, Female / Male profile: rating {together[0].rating} / {together[1].rating}")
+assert together == apart and together[0] != together[1]
+assert analyzer.in_flight.stats()["coalesced"] == 0
+print("✓ Locally scored analyses for profiles differing only by gender are not coalesced")
+
+
+# A coalesced call runs under its starter's lane and budget: batch and interactive callers keep apart
+async def mixed_lanes(analyzer, batch_first):
+    async def interactive():
+        await asyncio.sleep(0.01 if batch_first else 0)
+        started = time.monotonic()
+        return await analyzer.analyze_text_meal_async("grilled salmon", student), time.monotonic() - started
+
+    async def batch():
+        await asyncio.sleep(0 if batch_first else 0.01)
+        return (await analyzer.analyze_meals_async(["grilled salmon"], student))[0]
+
+    return await asyncio.gather(interactive(), batch())
+
+
+for batch_first in (False, True):
+    analyzer = make_analyzer(FakeGateway(delays={"extraction": 0.5}), budget_seconds=0.2)
+    (fast, elapsed), bulk = asyncio.run(mixed_lanes(analyzer, batch_first))
+    print(f"\n  {'Batch' if batch_first else 'Interactive'} request first: interactive degraded={fast.degraded} "
+          f"in {elapsed:.2f}s, batch degraded={bulk.degraded}")
+    assert fast.degraded and elapsed < 0.4
+    assert isinstance(bulk, MealAnalysis) and not bulk.degraded and bulk.rating == 8
+print("✓ Batch requests never join budgeted interactive ones, nor interactive requests batch ones")
+
+
+# Streams: joiners get the whole narrative replayed, even mid-stream
+async def streaming(analyzer):
+    first = await analyzer.analyze_text_meal_stream_async("a bowl of oatmeal", student)
+    read = [chunk async for chunk in _take(first, 2)]
+    late = await analyzer.analyze_text_meal_stream_async("a bowl of oatmeal", student)
+    rest = "".join([chunk async for chunk in first])
+    return "".join(read) + rest, "".join([chunk async for chunk in late]), first, late
+
+
+async def _take(stream, count):
+    iterator = stream.__aiter__()
+    for _ in range(count):
+        yield await iterator.__anext__()
+
+
+analyzer, completions = coalescing_analyzer()
+first_text, late_text, first, late = asyncio.run(streaming(analyzer))
+assert first_text == late_text == "Fiber-rich and filling."
+assert first.result == late.result and first.result.rating == 8
+assert completions.counts() == {"extraction": 1, "analysis": 1}
+print("✓ A stream joined mid-generation replays from the first chunk; one extraction and one analysis call")
+
+
+# Errors are shared; one caller's cancellation does not affect the others
+async def failures():
+    flight = SingleFlight()
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        raise RuntimeError("503 Service Unavailable")
+
+    outcomes = await asyncio.gather(*(flight.run("key", failing) for _ in range(3)), return_exceptions=True)
+    assert len(calls) == 1 and all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    impatient = asyncio.ensure_future(flight.run("slow", slow))
+    patient = asyncio.ensure_future(flight.run("slow", slow))
+    await asyncio.sleep(0.01)
+    impatient.cancel()
+    assert await patient == "ok"
+
+    # A stream whose readers all leave is closed
+    closed = []
+
+    async def endless():
+        try:
+            while True:
+                await asyncio.sleep(0.005)
+                yield "chunk"
+        finally:
+            closed.append(True)
+
+    shared = SharedStream(endless())
+    reader = shared.subscribe()
+    await reader.__anext__()
+    await reader.aclose()
+    await asyncio.sleep(0.02)
+    assert closed == [True]
+
+
+asyncio.run(failures())
+print("✓ Errors reach every joined caller; cancelling one caller leaves the shared call running; abandoned streams close")
+
+print("\n✓ Request coalescing validated")
@@ -0,0 +1,198 @@
+"""
+Validate retries, hedged requests and the circuit breaker around completion calls
+"""
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import openai
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from fake_gateway import FakeGateway, make_analyzer
+from resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    ResilientCaller,
+    backoff_delay,
+    is_retryable,
+    retry_after_seconds,
+)
+
+REQUEST = httpx.Request("POST", "https://example.azure-api.net/openai/deployments/gpt-4o/chat/completions")
+
+
+def status_error(status: int, headers: dict = None) -> openai.APIStatusError:
+    response = httpx.Response(status, headers=headers or {}, request=REQUEST)
+    error_type = {429: openai.RateLimitError, 400: openai.BadRequestError}.get(status, openai.InternalServerError)
+    return error_type(f"HTTP {status}", response=response, body=None)
+
+
+def scripted(*outcomes):
+    """Request factory returning/raising the given outcomes in order"""
+    outcomes = list(outcomes)
+    calls = []
+
+    async def request():
+        calls.append(time.monotonic())
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+    return request, calls
+
+
+def percentile(samples, percent):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, round(percent / 100 * len(samples)) - 1)]
+
+
+print("=" * 70)
+print("VALIDATION: Resilience layer (retry, hedging, circuit breaker)")
+print("=" * 70)
+
+# Error classification and Retry-After
+assert is_retryable(status_error(429)) and is_retryable(status_error(503))
+assert is_retryable(openai.APITimeoutError(REQUEST)) and is_retryable(openai.APIConnectionError(request=REQUEST))
+assert not is_retryable(status_error(400)) and not is_retryable(ValueError("bad json"))
+assert retry_after_seconds(status_error(429, {"retry-after": "2"})) == 2
+assert retry_after_seconds(status_error(429, {"retry-after-ms": "150"})) == 0.15
+assert retry_after_seconds(status_error(429)) is None
+rng = random.Random(7)
+delays = [backoff_delay(attempt, 0.5, 8, rng) for attempt in range(8) for _ in range(50)]
+assert all(0 <= delay <= 8 for delay in delays) and max(delays[:50]) <= 0.5
+print("\n✓ 429/5xx/timeouts retryable, 4xx not; Retry-After parsed; full-jitter backoff bounded")
+
+# Retry honoring Retry-After
+caller = ResilientCaller(max_attempts=3, base_delay=0.01, max_delay=1, hedge_percentile=0)
+request, calls = scripted(status_error(429, {"retry-after-ms": "200"}), "ok")
+assert asyncio.run(caller.call(request)) == "ok"
+assert len(calls) == 2 and calls[1] - calls[0] >= 0.19
+print(f"✓ 429 retried after the server's Retry-After ({(calls[1] - calls[0]) * 1000:.0f} ms)")
+
+request, calls = scripted(status_error(503), status_error(503), status_error(503))
+try:
+    asyncio.run(caller.call(request))
+    raise AssertionError("expected failure")
+except openai.InternalServerError:
+    pass
+assert len(calls) == 3
+
+request, calls = scripted(status_error(400), "unused")
+try:
+    asyncio.run(caller.call(request))
+    raise AssertionError("expected failure")
+except openai.BadRequestError:
+    pass
+assert len(calls) == 1
+
+request, calls = scripted(status_error(429, {"retry-after": "60"}), "unused")
+try:
+    asyncio.run(caller.call(request))
+    raise AssertionError("expected failure")
+except openai.RateLimitError:
+    pass
+assert len(calls) == 1
+print("✓ Gives up after max_attempts, on 4xx, and when Retry-After exceeds max_delay")
+
+# Circuit breaker
+breaker = CircuitBreaker(failure_threshold=3, reset_seconds=0.2)
+caller = ResilientCaller(max_attempts=1, hedge_percentile=0, breaker=breaker)
+for _ in range(3):
+    request, _ = scripted(status_error(500))
+    try:
+        asyncio.run(caller.call(request))
+    except openai.InternalServerError:
+        pass
+request, calls = scripted("ok")
+try:
+    asyncio.run(caller.call(request))
+    raise AssertionError("expected open circuit")
+except CircuitOpenError as e:
+    print(f"  Open circuit: {e}")
+assert breaker.state == "open" and not calls
+time.sleep(0.25)
+assert breaker.state == "half-open"
+assert asyncio.run(caller.call(request)) == "ok" and breaker.state == "closed"
+print("✓ Opens after consecutive failures, fails fast, closes after a successful probe")
+
+# A cancelled half-open probe (e.g. latency budget ran out) must not wedge the circuit
+breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.1)
+caller = ResilientCaller(max_attempts=1, hedge_percentile=0, breaker=breaker)
+request, _ = scripted(status_error(500))
+try:
+    asyncio.run(caller.call(request))
+except openai.InternalServerError:
+    pass
+time.sleep(0.15)
+
+
+async def slow_probe():
+    await asyncio.sleep(1)
+    return "late"
+
+
+async def cancelled_probe():
+    try:
+        await asyncio.wait_for(caller.call(slow_probe), 0.02)
+        raise AssertionError("expected a timeout")
+    except asyncio.TimeoutError:
+        pass
+
+
+asyncio.run(cancelled_probe())
+assert breaker.state == "open" and breaker.failures == 1  # Back to open, the cancel not counted
+time.sleep(0.15)
+request, calls = scripted("ok")
+assert asyncio.run(caller.call(request)) == "ok" and breaker.state == "closed"
+print("✓ A cancelled probe re-opens the circuit without a failure; the next probe closes it")
+
+# Hedging on a simulated gateway with a slow tail
+rng = random.Random(42)
+
+
+async def gateway():
+    # 6% of responses stall (queueing at the gateway), the rest take 20-40 ms
+    await asyncio.sleep(0.5 if rng.random() < 0.06 else rng.uniform(0.02, 0.04))
+    return "ok"
+
+
+async def timed_calls(caller, count=600, concurrency=15):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.monotonic()
+            await caller.call(gateway, key="analysis")
+            latencies.append(time.monotonic() - start)
+    await asyncio.gather(*(one() for _ in range(count)))
+    return latencies
+
+
+baseline = asyncio.run(timed_calls(ResilientCaller(hedge_percentile=0)))
+hedging = ResilientCaller(hedge_percentile=90, hedge_min_samples=20, hedge_max_ratio=0.15)
+asyncio.run(timed_calls(hedging, count=100))  # Warm-up: no hedging before hedge_min_samples latencies
+hedged = asyncio.run(timed_calls(hedging))
+stats = hedging.stats()
+print(f"\n  {'':<12} {'p50':>8} {'p95':>8} {'p99':>8}")
+for name, latencies in (("No hedging", baseline), ("Hedged", hedged)):
+    print(f"  {name:<12} " + " ".join(f"{percentile(latencies, p) * 1000:>6.0f}ms" for p in (50, 95, 99)))
+print(f"  Hedged requests: {stats['hedges']} of {stats['calls']} ({stats['hedge_wins']} won)")
+assert percentile(hedged, 99) < percentile(baseline, 99) / 2
+assert stats["hedges"] <= 0.15 * stats["calls"]
+print("✓ Hedging cuts p99 while duplicating only a bounded share of requests")
+
+# Wired into the analyzer: a 429 on extraction is retried transparently
+gateway = FakeGateway(errors=[status_error(429, {"retry-after-ms": "10"})])
+analyzer = make_analyzer(gateway, resilience=ResilientCaller(base_delay=0.01, hedge_percentile=0))
+analysis = asyncio.run(analyzer.analyze_text_meal_async("a bowl of oatmeal", {}))
+assert analysis.rating == 8 and gateway.stages == ["extraction", "extraction", "analysis"]
+assert analyzer.resilience.stats()["retries"] == 1
+print("✓ Analyzer completions go through the resilience layer")
+
+print("\n✓ Resilience layer validated")
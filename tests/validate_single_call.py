@@ -0,0 +1,78 @@
+"""
+Validate single-call analysis: one JSON completion with the items and the
+analysis, with database nutrition totals available before the analysis ends
+"""
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from fake_gateway import FakeGateway, make_analyzer
+from nutrition_analyzer import parse_items_prefix
+from meal_analysis import AnalysisStream, parse_json_object
+
+RESPONSE = """{
+    "items": [
+        {"name": "chicken breast", "quantity": 150, "unit": "g", "preparation": "grilled"},
+        {"name": "broccoli", "quantity": 1, "unit": "cup", "preparation": "steamed"}
+    ],
+    "meal_description": "Grilled chicken with broccoli",
+    "narrative": "A lean, high-protein plate.",
+    "rating": 8,
+    "advice": ["Add a whole grain for lasting energy.", "Keep the sauce light."]
+}"""
+
+
+async def run_single_call(chunk_size: int):
+    # RESPONSE replayed as a stream in chunks of chunk_size characters
+    gateway = FakeGateway({"single_call": RESPONSE}, chunk_size=chunk_size)
+    analyzer = make_analyzer(gateway, single_call=True)
+    remembered = []
+    stream = AnalysisStream(*await analyzer._stream_single_call(
+        analyzer._single_call_messages("prompt"), "chicken and broccoli", remembered.append, "Meal analysis error"
+    ))
+    nutrition_before_analysis = stream.nutrition
+    narrative = "".join([chunk async for chunk in stream])
+    return nutrition_before_analysis, narrative, stream.result, remembered, gateway.stages
+
+
+print("=" * 70)
+print("VALIDATION: Single-call analysis")
+print("=" * 70)
+
+# Items are complete (and parseable) as soon as the "narrative" key starts
+head = RESPONSE[:RESPONSE.index('"narrative"') + len('"narrative":')]
+data = parse_items_prefix(head)
+assert [item["name"] for item in data["items"]] == ["chicken breast", "broccoli"]
+assert parse_items_prefix(RESPONSE[:RESPONSE.index('"meal_description"')]) is None
+print("\n✓ Items parsed from the stream before the analysis fields")
+
+expected = make_analyzer(FakeGateway())._calculate_hybrid_nutrition(data["items"])
+
+# Chunk sizes that split the JSON at different points
+for chunk_size in (1, 7, 64, len(RESPONSE)):
+    nutrition, narrative, result, remembered, calls = asyncio.run(run_single_call(chunk_size))
+    assert calls == ["single_call"]
+    assert nutrition == expected == result.nutrition
+    assert remembered[0] == {"items": data["items"], "meal_description": "Grilled chicken with broccoli"}
+    assert narrative == result.narrative == "A lean, high-protein plate."
+    assert result.rating == 8 and len(result.advice) == 2
+
+print(f"✓ One completion; database totals ready before the analysis ({int(expected['calories'])} cal, {expected['protein']}g protein)")
+
+# Items after the analysis fields: read to the end, nothing lost
+reordered = parse_json_object(RESPONSE)
+items = reordered.pop("items")
+reordered["items"] = items
+RESPONSE = json.dumps(reordered)
+nutrition, narrative, result, remembered, calls = asyncio.run(run_single_call(16))
+assert nutrition == expected and result.rating == 8
+print("✓ Items after the analysis fields handled")
+
+print("\n--- Result ---")
+print(result.to_markdown())
+
+print("\n✓ Single-call analysis validated")
@@ -0,0 +1,88 @@
+"""
+Validate per-stage deployment routing, fallback to the primary deployment and per-stage latency stats
+"""
+import sys
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from fake_gateway import FakeGateway, make_analyzer
+from resilience import CircuitBreaker, ResilientCaller
+
+EXTRACTION_KEY = "extraction-stream"  # Extractions are streamed; timed to their first chunk
+MEALS = [f"grilled salmon with steamed broccoli, plate {i}" for i in range(8)]
+
+print("=" * 70)
+print("VALIDATION: Per-stage deployment routing")
+print("=" * 70)
+
+
+def routed_analyzer(gateway, stage_deployments):
+    return make_analyzer(gateway, deployment="gpt-4o", local_parser=False, stage_deployments=stage_deployments,
+                         resilience=ResilientCaller(hedge_percentile=0, base_delay=0.01,
+                                                    breaker=CircuitBreaker(failure_threshold=3)))
+
+
+def milliseconds(seconds):
+    return f"{seconds * 1000:.0f} ms"
+
+
+# Defaults: every stage on the primary deployment
+analyzer = routed_analyzer(FakeGateway(), {})
+assert analyzer.deployment_for("extraction") == analyzer.deployment_for("analysis") == "gpt-4o"
+assert analyzer.extraction_namespace.startswith("gpt-4o:")
+routed = routed_analyzer(FakeGateway(), {"extraction": "gpt-4o-mini"})
+assert routed.deployment_for("extraction") == "gpt-4o-mini" and routed.deployment_for("analysis") == "gpt-4o"
+assert routed.extraction_namespace.startswith("gpt-4o-mini:")  # Its extractions are cached apart
+print("\n✓ Unset stages use the primary deployment; routed extractions get their own cache namespace")
+
+# Extraction on the fast deployment, analysis on the primary one
+DELAYS = {"gpt-4o": 0.12, "gpt-4o-mini": 0.03}
+baseline = routed_analyzer(FakeGateway(deployment_delays=DELAYS), {})
+gateway = FakeGateway(deployment_delays=DELAYS)
+routed = routed_analyzer(gateway, {"extraction": "gpt-4o-mini"})
+for meal in MEALS:
+    assert baseline.analyze_text_meal(meal, {}).rating == 8
+    assert routed.analyze_text_meal(meal, {}).rating == 8
+assert set(gateway.calls) == {("extraction", "gpt-4o-mini"), ("analysis", "gpt-4o")}
+
+before, after = baseline.stage_stats(), routed.stage_stats()
+print(f"\n  {'Stage':<18} {'Deployment':<12} {'p50':>7} {'p95':>7}")
+for label, stats in (("before", before), ("after", after)):
+    for stage in (EXTRACTION_KEY, "analysis"):
+        row = stats[stage]
+        print(f"  {stage:<18} {row['deployment']:<12} {milliseconds(row['p50']):>7} {milliseconds(row['p95']):>7}  ({label})")
+assert after[EXTRACTION_KEY]["deployment"] == "gpt-4o-mini" and after[EXTRACTION_KEY]["calls"] == len(MEALS)
+assert after[EXTRACTION_KEY]["p50"] < before[EXTRACTION_KEY]["p50"] / 2
+assert after[EXTRACTION_KEY]["fallbacks"] == 0
+assert f"{EXTRACTION_KEY}@gpt-4o-mini" in routed.resilience.stats()["latency"]
+print("✓ Extraction runs on the stage deployment; stage_stats() shows the p50/p95 gain")
+
+# Stage deployment down: each call falls back to the primary, then its circuit opens
+gateway = FakeGateway(deployment_delays={"gpt-4o": 0.01, "gpt-4o-mini": 0.01}, failing={"gpt-4o-mini"})
+routed = routed_analyzer(gateway, {"extraction": "gpt-4o-mini"})
+for meal in MEALS:
+    analysis = routed.analyze_text_meal(meal, {})
+    assert analysis.rating == 8 and analysis.items[0]["name"] == "salmon"
+tried = sum(1 for call in gateway.calls if call == ("extraction", "gpt-4o-mini"))
+stats = routed.stage_stats()[EXTRACTION_KEY]
+resilience = routed.resilience.stats()
+print(f"\n  Failing stage deployment: {tried} attempts there, {stats['fallbacks']} fallbacks, "
+      f"its circuit {resilience['circuits']['gpt-4o-mini']}, primary {resilience['circuit']}")
+assert stats["fallbacks"] == len(MEALS) and tried == 3  # No retries there; then short-circuited
+assert resilience["circuits"]["gpt-4o-mini"] == "open" and resilience["circuit"] == "closed"
+print("✓ Failures on the stage deployment fall back to the primary one without retries or errors")
+
+# Failing primary deployment is still an error
+gateway = FakeGateway(failing={"gpt-4o"})
+routed = routed_analyzer(gateway, {"extraction": "gpt-4o-mini"})
+try:
+    routed.analyze_text_meal(MEALS[0], {})
+    raise AssertionError("expected an error")
+except Exception as e:
+    assert "Meal analysis error" in str(e)
+assert [model for stage, model in gateway.calls if stage == "analysis"] == ["gpt-4o"] * 3
+print("✓ Stages on the primary deployment keep their retries and errors")
+
+print("\n✓ Per-stage deployment routing validated")
@@ -0,0 +1,84 @@
+"""
+Validate the incremental items[] reader and the streamed extraction that resolves items while they are generated
+"""
+import json
+import random
+import sys
+from pathlib import Path
+
+# Add src directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from fake_gateway import FakeGateway, make_analyzer
+from meal_analysis import ArrayFieldReader
+
+ITEMS = [
+    {"name": "chicken breast", "quantity": 150, "unit": "g", "preparation": "grilled"},
+    {"name": "brown rice", "quantity": 1, "unit": "cup", "preparation": "steamed"},
+    {"name": "broccoli", "quantity": 1, "unit": "cup", "preparation": "steamed"},
+    {"name": "olive oil", "quantity": 1, "unit": "tbsp", "preparation": "drizzled"},
+    {"name": "avocado", "quantity": 0.5, "unit": "medium", "preparation": "sliced"},
+    {"name": "greek yogurt \"plain\"", "quantity": 100, "unit": "g", "preparation": "topped [with] {honey}"},
+]
+EXTRACTION = json.dumps({"items": ITEMS, "meal_description": "Chicken rice bowl"}, indent=2)
+ANALYSIS = '{"narrative": "Balanced and filling.", "rating": 8, "advice": ["Add fruit"]}'
+CHUNK = 12  # Characters per streamed chunk
+CHUNK_DELAY = 0.01
+
+print("=" * 70)
+print("VALIDATION: Streaming extraction")
+print("=" * 70)
+
+# Reader: same elements as json.loads, whatever the chunking (escapes and brackets inside strings)
+rng = random.Random(7)
+for _ in range(500):
+    reader, elements, pos = ArrayFieldReader("items"), [], 0
+    while pos < len(EXTRACTION):
+        size = rng.randint(1, 9)
+        elements += reader.feed(EXTRACTION[pos:pos + size])
+        pos += size
+    assert elements == ITEMS and reader.done
+fenced = ArrayFieldReader("items").feed('Here you go:\n```json\n{"items": [1, "a,]", [2, {"b": null}], {}]}\n```')
+assert fenced == [1, "a,]", [2, {"b": None}], {}]
+assert ArrayFieldReader("items").feed('{"items": []}') == []
+print("\n✓ Elements emitted as they complete, for any chunking; prose and fences around the JSON ignored")
+
+
+def timed_analysis(stream_extraction):
+    # The extraction is generated in timed chunks (streamed or not); each catalog lookup is logged
+    gateway = FakeGateway({"extraction": EXTRACTION, "analysis": ANALYSIS}, chunk_size=CHUNK,
+                          chunk_delays={"extraction": CHUNK_DELAY})
+    analyzer = make_analyzer(gateway, local_parser=False, stream_extraction=stream_extraction)
+    resolve = analyzer._resolve_portion
+
+    def timed_resolve(item):
+        gateway.log(f"resolved {item['name']}")
+        return resolve(item)
+
+    analyzer._resolve_portion = timed_resolve
+    return analyzer.analyze_text_meal("chicken rice bowl with veggies", {}), dict(gateway.events)
+
+
+results = {streamed: timed_analysis(streamed) for streamed in (True, False)}
+
+(streamed, events), (plain, plain_events) = results[True], results[False]
+assert streamed.items == plain.items == ITEMS and streamed.rating == plain.rating == 8
+assert streamed.nutrition == plain.nutrition
+print(f"\n  {len(ITEMS)} items, extraction streamed over {events['extraction done'] * 1000:.0f} ms")
+for item in ITEMS[:2] + ITEMS[-1:]:
+    key = f"resolved {item['name']}"
+    print(f"  {item['name']:<22} resolved at {events[key] * 1000:4.0f} ms (non-streaming: {plain_events[key] * 1000:4.0f} ms)")
+first = events[f"resolved {ITEMS[0]['name']}"]
+assert first < events["extraction done"] / 2
+assert all(events[f"resolved {item['name']}"] <= events["extraction done"] for item in ITEMS)
+generation = CHUNK_DELAY * len(EXTRACTION) / CHUNK
+assert all(plain_events[f"resolved {item['name']}"] >= generation for item in ITEMS)  # Only after the response
+print("✓ Items resolved against the catalog while the extraction is still being generated")
+
+# Once the stream closes only the totals remain: the analysis request follows at once
+gap = events["analysis request"] - events["extraction done"]
+print(f"  Stream closed -> analysis request: {gap * 1000:.2f} ms")
+assert gap < 0.02
+print("✓ The analysis request starts as soon as the extraction stream closes, with identical totals")
+
+print("\n✓ Streaming extraction validated")